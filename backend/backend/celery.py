@@ -2,6 +2,7 @@ from __future__ import absolute_import
 import os
 from celery import Celery
 from celery.schedules import crontab
+from kombu import Exchange, Queue
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
@@ -9,6 +10,63 @@ app = Celery('backend')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
+# Connects the task signal handlers that carry trace ids into workers
+from . import tracing  # noqa: E402,F401
+
+# --- Queues ---
+# Each workload gets its own queue so a nightly Prophet retrain or a big
+# notification fan-out can't hold up pickup reminders. Anything not routed
+# here stays on the default 'celery' queue.
+TASK_QUEUES = ['celery', 'training', 'notifications', 'reminders', 'online_learning']
+
+app.conf.task_default_queue = 'celery'
+app.conf.task_queues = [Queue(name, Exchange(name), routing_key=name) for name in TASK_QUEUES]
+# Priorities follow the Redis transport: 0 is served first, 9 last
+# (the reverse of RabbitMQ, which would also need x-max-priority on the queues)
+app.conf.task_routes = {
+    'demand.tasks.retrain_demand_models': {'queue': 'training', 'priority': 9},
+    'demand.tasks.fit_city_model_task': {'queue': 'training', 'priority': 9},
+    'demand.tasks.finish_demand_training': {'queue': 'training', 'priority': 9},
+    'foodredistribution.tasks.train_matching_model_task': {'queue': 'training', 'priority': 9},
+    'foodredistribution.tasks.export_training_dataset_task': {'queue': 'training', 'priority': 9},
+    'foodredistribution.tasks.notify_fallback_receivers_task': {'queue': 'notifications', 'priority': 3},
+    'foodredistribution.tasks.send_pickup_reminders': {'queue': 'reminders', 'priority': 0},
+    'foodredistribution.tasks.send_feedback_reminders': {'queue': 'reminders', 'priority': 5},
+    'foodredistribution.tasks.update_online_model_task': {'queue': 'online_learning', 'priority': 2},
+}
+app.conf.task_default_priority = 5
+# Redis emulates priorities with one list per priority step per queue
+app.conf.broker_transport_options = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+}
+
+# Training can run for a long time; the soft limit lets the task stop cleanly first
+app.conf.task_annotations = {
+    'demand.tasks.retrain_demand_models': {'soft_time_limit': 50 * 60, 'time_limit': 60 * 60},
+    'demand.tasks.fit_city_model_task': {'soft_time_limit': 10 * 60, 'time_limit': 15 * 60},
+    'demand.tasks.finish_demand_training': {'soft_time_limit': 20 * 60, 'time_limit': 30 * 60},
+    'foodredistribution.tasks.train_matching_model_task': {'soft_time_limit': 50 * 60, 'time_limit': 60 * 60},
+    'foodredistribution.tasks.export_training_dataset_task': {'soft_time_limit': 20 * 60, 'time_limit': 30 * 60},
+}
+
+# Worker settings per role, used by `manage.py run_worker <role>`.
+# Prefetch and concurrency are worker options in Celery, so each queue
+# gets its own worker process rather than a per-queue setting.
+WORKER_ROLES = {
+    'training': {
+        # One process per core: the nightly demand retrain runs one task per city
+        'queues': ['training'], 'concurrency': os.cpu_count() or 1, 'prefetch_multiplier': 1,
+        'max_tasks_per_child': 1,  # hand Prophet/sklearn memory back after every fit
+    },
+    'notifications': {'queues': ['notifications'], 'concurrency': 4, 'prefetch_multiplier': 4},
+    'reminders': {'queues': ['reminders'], 'concurrency': 2, 'prefetch_multiplier': 1},
+    # OnlineMatchingModel needs a single learner process or checkpoints overwrite each other
+    'online_learning': {'queues': ['online_learning'], 'concurrency': 1, 'prefetch_multiplier': 1},
+    'default': {'queues': ['celery'], 'concurrency': 2, 'prefetch_multiplier': 4},
+}
+
 app.conf.beat_schedule = {
     'retrain-demand-models-every-day': {
         'task': 'demand.tasks.retrain_demand_models',
@@ -25,5 +83,21 @@ app.conf.beat_schedule.update({
         'task': 'foodredistribution.tasks.send_feedback_reminders',
         'schedule': crontab(minute=0, hour='*'),  # every hour
     },
+    'rollup-ai-metrics-every-hour': {
+        'task': 'foodredistribution.tasks.rollup_ai_metrics_task',
+        'schedule': crontab(minute=15, hour='*'),  # every hour
+    },
+    'scan-cancellation-anomalies-every-hour': {
+        'task': 'foodredistribution.tasks.scan_cancellation_anomalies_task',
+        'schedule': crontab(minute=45, hour='*'),  # every hour
+    },
+    'retrain-matching-model-every-week': {
+        'task': 'foodredistribution.tasks.train_matching_model_task',
+        'schedule': crontab(hour=1, minute=0, day_of_week='sunday'),  # full retrain, weekly
+    },
+    'archive-audit-logs-every-day': {
+        'task': 'foodredistribution.tasks.archive_audit_logs_task',
+        'schedule': crontab(hour=2, minute=30),  # after the midnight retrain
+    },
 })
 
@@ -40,6 +40,75 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# MATCHING MODEL
+# 'batch': RandomForest retrained by the weekly job / train_matching_model
+# 'online': SGD model updated from every new Feedback, checkpointed to disk
+MATCHING_MODEL_MODE = os.getenv('MATCHING_MODEL_MODE', 'batch')
+ONLINE_MODEL_CHECKPOINT_EVERY = int(os.getenv('ONLINE_MODEL_CHECKPOINT_EVERY', '10'))
+ONLINE_MODEL_CHECKPOINT_SECONDS = float(os.getenv('ONLINE_MODEL_CHECKPOINT_SECONDS', '60'))
+# Feedback examples the online model needs before it replaces the batch model
+ONLINE_MODEL_MIN_UPDATES = int(os.getenv('ONLINE_MODEL_MIN_UPDATES', '50'))
+# Store per-stage matching timings in AIAuditLog.details['timings'] for each claim
+MATCHING_METRICS_IN_AUDIT_LOG = os.getenv('MATCHING_METRICS_IN_AUDIT_LOG', 'False') == 'True'
+# Append-only .npy training dataset written by export_training_dataset
+MATCHING_DATASET_DIR = os.getenv('MATCHING_DATASET_DIR', os.path.join(BASE_DIR, 'ai_engine', 'dataset'))
+
+# BENCHMARKS
+# JSON results of run_benchmarks, one file per commit
+BENCHMARK_RESULTS_DIR = os.getenv('BENCHMARK_RESULTS_DIR', os.path.join(BASE_DIR, 'benchmark_results'))
+
+# AUDIT LOG BUFFERING
+# Audit rows are flushed with bulk_create once either threshold is hit.
+# Set AUDIT_BUFFER_BACKEND to 'celery' to hand batches to a worker instead.
+AUDIT_BUFFER_MAX_SIZE = int(os.getenv('AUDIT_BUFFER_MAX_SIZE', '50'))
+AUDIT_BUFFER_MAX_AGE = float(os.getenv('AUDIT_BUFFER_MAX_AGE', '5'))
+AUDIT_BUFFER_BACKEND = os.getenv('AUDIT_BUFFER_BACKEND', 'local')
+
+# REQUEST PROFILING
+# Staff requests sent with `X-Profile: 1` (or `cpu`) are profiled and kept under PROFILE_STORE_DIR
+REQUEST_PROFILING_ENABLED = os.getenv('REQUEST_PROFILING_ENABLED', 'False') == 'True'
+PROFILE_STORE_DIR = os.getenv('PROFILE_STORE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_STORE_MAX = int(os.getenv('PROFILE_STORE_MAX', '200'))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+
+# DEMAND FORECASTING
+# Number of loaded Prophet models kept in memory per process
+DEMAND_MODEL_CACHE_SIZE = int(os.getenv('DEMAND_MODEL_CACHE_SIZE', '16'))
+# Processes used to fit per-city models in parallel (default: CPU count)
+DEMAND_TRAINING_WORKERS = int(os.getenv('DEMAND_TRAINING_WORKERS', '0')) or None
+# Cities with less history than this skip Prophet and use the vectorized fast forecaster
+DEMAND_PROPHET_MIN_DAYS = int(os.getenv('DEMAND_PROPHET_MIN_DAYS', '60'))
+# Days of forecast stored per city after each retrain
+DEMAND_FORECAST_HORIZON_DAYS = int(os.getenv('DEMAND_FORECAST_HORIZON_DAYS', '30'))
+# How many of the busiest cities' models the web process preloads at startup (0 = off)
+DEMAND_MODEL_CACHE_WARM = int(os.getenv('DEMAND_MODEL_CACHE_WARM', '0'))
+# Fits reused across backtest_demand_models runs
+DEMAND_BACKTEST_CACHE_DIR = os.getenv('DEMAND_BACKTEST_CACHE_DIR', os.path.join(BENCHMARK_RESULTS_DIR, 'backtest_cache'))
+
+# TRACING
+# Spans from API requests and the Celery tasks they queue, one JSON line each.
+# Off by default; TRACE_DB_QUERIES adds a span per SQL query on top.
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'False') == 'True'
+TRACE_EXPORT_FILE = os.getenv('TRACE_EXPORT_FILE', os.path.join(BASE_DIR, 'traces', 'spans.jsonl'))
+TRACE_DB_QUERIES = os.getenv('TRACE_DB_QUERIES', 'False') == 'True'
+# Spans are written by a background thread every TRACE_FLUSH_INTERVAL seconds or TRACE_BUFFER_SIZE spans
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '500'))
+TRACE_FLUSH_INTERVAL = float(os.getenv('TRACE_FLUSH_INTERVAL', '1.0'))
+
+# AUDIT LOG RETENTION
+# Rows older than this are moved to gzip JSONL files under AUDIT_ARCHIVE_DIR
+AUDIT_RETENTION_DAYS = int(os.getenv('AUDIT_RETENTION_DAYS', '90'))
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', os.path.join(BASE_DIR, 'audit_archive'))
+
+# CACHE
+# Shared across web and worker processes (rolling counters, cached results)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_URL', 'redis://localhost:6379/1'),
+    }
+}
+
 SITE_ID = 1
 AUTH_USER_MODEL = 'foodredistribution.CustomUser'
 
@@ -70,6 +139,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'foodredistribution.middleware.RequestProfilingMiddleware',
+    'backend.tracing.TracingMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,277 @@
+"""
+Lightweight request -> Celery tracing.
+
+A trace id is created at the HTTP edge (or taken from an incoming W3C
+`traceparent` header), carried to Celery tasks in a `traceparent`
+message header, and every span is appended as one JSON line to
+TRACE_EXPORT_FILE. Spans share a trace id, so grepping the file for one
+id follows a donation from the API call to the last notification email.
+
+Both TRACING_ENABLED and TRACE_DB_QUERIES are off by default. Spans are
+buffered in memory and appended to the file in batches by a background
+thread, so finishing a span never touches the disk.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun, worker_process_shutdown
+from django.conf import settings
+from django.db import connection
+
+_current = ContextVar('trace_span', default=None)
+_export_lock = threading.Lock()
+_buffer = []
+_buffer_lock = threading.Lock()
+_flush_now = threading.Event()
+_flusher_pid = None
+_task_spans = {}
+
+
+def enabled():
+    return getattr(settings, 'TRACING_ENABLED', False)
+
+
+def _new_id(length):
+    return uuid.uuid4().hex[:length]
+
+
+class Span:
+    def __init__(self, name, trace_id=None, parent_id=None, **attributes):
+        self.name = name
+        self.trace_id = trace_id or _new_id(32)
+        self.span_id = _new_id(16)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = 'ok'
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def activate(self):
+        self._token = _current.set(self)
+        return self
+
+    def finish(self, error=None):
+        duration = time.perf_counter() - self._start_perf
+        if error is not None:
+            self.status = 'error'
+            self.attributes['error'] = repr(error)
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        export({
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': duration * 1000,
+            'status': self.status,
+            'process': os.getpid(),
+            'attributes': self.attributes,
+        })
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name, traceparent=None, **attributes):
+    """Start and activate a span, as a child of `traceparent` or of the current span"""
+    parent = current_span()
+    trace_id, parent_id = (parent.trace_id, parent.span_id) if parent else (None, None)
+    if traceparent:
+        parsed = parse_traceparent(traceparent)
+        if parsed:
+            trace_id, parent_id = parsed
+    return Span(name, trace_id, parent_id, **attributes).activate()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block as a child span of the current trace (a no-op outside of one)"""
+    if not enabled() or current_span() is None:
+        yield None
+        return
+    current = start_span(name, **attributes)
+    try:
+        yield current
+    except Exception as e:
+        current.finish(error=e)
+        raise
+    current.finish()
+
+
+def traced(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def parse_traceparent(value):
+    parts = value.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def export(record):
+    """Queue a finished span for the background writer"""
+    if not getattr(settings, 'TRACE_EXPORT_FILE', None):
+        return
+    _ensure_flusher()
+    with _buffer_lock:
+        _buffer.append(record)
+        full = len(_buffer) >= getattr(settings, 'TRACE_BUFFER_SIZE', 500)
+    if full:
+        _flush_now.set()
+
+
+def flush():
+    """Append every buffered span to TRACE_EXPORT_FILE; returns the number written"""
+    with _buffer_lock:
+        records = _buffer[:]
+        del _buffer[:]
+    path = getattr(settings, 'TRACE_EXPORT_FILE', None)
+    if not records or not path:
+        return 0
+    lines = ''.join(json.dumps(record, default=str) + '\n' for record in records)
+    with _export_lock:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(lines)
+    return len(records)
+
+
+def _flush_loop():
+    while True:
+        _flush_now.wait(getattr(settings, 'TRACE_FLUSH_INTERVAL', 1.0))
+        _flush_now.clear()
+        try:
+            flush()
+        except Exception as e:
+            print(f"Trace export failed: {e}")
+
+
+def _ensure_flusher():
+    """Start the writer thread once per process (forked workers start their own)"""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _buffer_lock:
+        if _flusher_pid == os.getpid():
+            return
+        # Spans copied from the parent at fork time are the parent's to write
+        del _buffer[:]
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name='trace-export', daemon=True).start()
+
+
+atexit.register(flush)
+
+
+def trace_db_query(execute, sql, params, many, context):
+    """connection.execute_wrapper hook: one span per SQL query"""
+    if current_span() is None:
+        return execute(sql, params, many, context)
+    with span('db.query', sql=sql[:200], many=many):
+        return execute(sql, params, many, context)
+
+
+def _trace_db():
+    return enabled() and getattr(settings, 'TRACE_DB_QUERIES', False)
+
+
+class TracingMiddleware:
+    """Opens the root span for every API request and returns its id in `traceparent`"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+
+        root = start_span(
+            'http.request', traceparent=request.headers.get('traceparent'),
+            method=request.method, path=request.path,
+        )
+        try:
+            if _trace_db():
+                with connection.execute_wrapper(trace_db_query):
+                    response = self.get_response(request)
+            else:
+                response = self.get_response(request)
+        except Exception as e:
+            root.finish(error=e)
+            raise
+
+        root.set(status_code=response.status_code)
+        root.finish()
+        response['traceparent'] = root.traceparent
+        response['X-Trace-Id'] = root.trace_id
+        return response
+
+
+# --- Celery propagation ---
+
+@before_task_publish.connect
+def inject_trace_header(headers=None, **kwargs):
+    current = current_span()
+    if current is not None and headers is not None:
+        headers['traceparent'] = current.traceparent
+
+
+@task_prerun.connect
+def start_task_span(task_id=None, task=None, **kwargs):
+    if not enabled():
+        return
+    request = task.request
+    traceparent = getattr(request, 'traceparent', None) or (request.headers or {}).get('traceparent')
+    current = start_span('celery.task', traceparent=traceparent, task=task.name, task_id=task_id)
+    if _trace_db():
+        connection.execute_wrappers.append(trace_db_query)
+    _task_spans[task_id] = current
+
+
+@task_failure.connect
+def mark_task_failed(task_id=None, exception=None, **kwargs):
+    current = _task_spans.get(task_id)
+    if current is not None:
+        current.status = 'error'
+        current.attributes['error'] = repr(exception)
+
+
+@task_postrun.connect
+def finish_task_span(task_id=None, state=None, **kwargs):
+    current = _task_spans.pop(task_id, None)
+    if current is None:
+        return
+    if trace_db_query in connection.execute_wrappers:
+        connection.execute_wrappers.remove(trace_db_query)
+    current.set(state=state)
+    current.finish()
+
+
+@worker_process_shutdown.connect
+def flush_on_worker_shutdown(**kwargs):
+    flush()
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Preload the busiest cities' demand models so the first forecasts don't pay for loading them
+from django.conf import settings  # noqa: E402
+
+if settings.DEMAND_MODEL_CACHE_WARM:
+    from demand.utils import model_cache
+    model_cache.warm(limit=settings.DEMAND_MODEL_CACHE_WARM)
@@ -0,0 +1,194 @@
+"""
+Rolling-origin backtests of the demand forecasters.
+
+For every city the history is cut at a series of origins; each forecaster
+is fit on the data up to an origin and scored on the `horizon` days after
+it. Cities run in parallel (one process per city, like model training)
+and every (forecaster, training window) fit is cached on disk with
+joblib.Memory, so re-running with more folds or another forecaster only
+fits what is new.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from joblib import Memory
+
+from .fast_forecast import fast_forecast
+
+
+def prophet_forecaster(dates, quantities, horizon):
+    from prophet import Prophet
+
+    start = time.perf_counter()
+    model = Prophet()
+    model.fit(pd.DataFrame({'ds': pd.to_datetime(dates), 'y': quantities}))
+    fitted = time.perf_counter()
+    forecast = model.predict(model.make_future_dataframe(periods=horizon, include_history=False))
+    return forecast['yhat'].to_numpy(), fitted - start, time.perf_counter() - fitted, 'prophet'
+
+
+def holt_winters_forecaster(dates, quantities, horizon):
+    # Fitting and forecasting are one pass here, so it is all fit time. Below
+    # two weeks of history fast_forecast uses seasonal naive, and says so.
+    start = time.perf_counter()
+    forecast = fast_forecast({'city': (dates, quantities)}, horizon)['city']
+    return forecast['yhat'], time.perf_counter() - start, 0.0, forecast['method']
+
+
+def seasonal_naive_forecaster(dates, quantities, horizon):
+    start = time.perf_counter()
+    forecast = fast_forecast({'city': (dates, quantities)}, horizon, min_holt_winters_days=np.inf)['city']
+    return forecast['yhat'], time.perf_counter() - start, 0.0, forecast['method']
+
+
+# name -> f(dates, quantities, horizon)
+#      -> (yhat for the `horizon` days after dates[-1], fit seconds, predict seconds, method actually used)
+FORECASTERS = {
+    'prophet': prophet_forecaster,
+    'holt_winters': holt_winters_forecaster,
+    'seasonal_naive': seasonal_naive_forecaster,
+}
+
+
+def _fit_and_predict(name, dates, quantities, horizon):
+    yhat, fit_seconds, predict_seconds, method = FORECASTERS[name](dates, quantities, horizon)
+    return {
+        'yhat': np.asarray(yhat, dtype=float), 'fit_seconds': fit_seconds,
+        'predict_seconds': predict_seconds, 'method': method,
+    }
+
+
+def errors(actual, predicted):
+    """MAE and MAPE of `predicted` against `actual`; MAPE skips days with no demand (None if all are zero)"""
+    error = np.abs(actual - predicted)
+    nonzero = actual != 0
+    return {
+        'mae': float(error.mean()),
+        'mape': float((error[nonzero] / np.abs(actual[nonzero])).mean()) if nonzero.any() else None,
+    }
+
+
+def origins(dates, horizon, initial, step, max_folds=None):
+    """
+    Indexes of the last training day of each fold: the first origin has at
+    least `initial` days of history, later ones are `step` days apart, and
+    every origin leaves a full `horizon` after it. Keeps the most recent
+    `max_folds`.
+    """
+    candidates = np.arange(dates[0] + initial - 1, dates[-1] - horizon + 1, step).astype('datetime64[D]')
+    # Snap each origin to the last day that actually has data
+    indexes = np.unique(np.searchsorted(dates, candidates, side='right') - 1)
+    indexes = indexes[indexes >= 1]
+    return indexes[-max_folds:] if max_folds else indexes
+
+
+def backtest_city(city, dates, quantities, forecasters, horizon, initial, step, max_folds=None, cache_dir=None):
+    """
+    Score each forecaster over the rolling origins of one city. Runs inside
+    a pool worker, so no Django access here. Errors are pooled over every
+    observed day in every fold's horizon, and `methods` counts the folds by
+    the method a forecaster actually used (holt_winters falls back to
+    seasonal naive on short windows).
+    """
+    start = time.perf_counter()
+    try:
+        fit_and_predict = Memory(cache_dir, verbose=0).cache(_fit_and_predict)
+        folds = origins(dates, horizon, initial, step, max_folds)
+        results = {}
+        for name in forecasters:
+            actual, predicted = [], []
+            fit_seconds = predict_seconds = 0.0
+            cached = 0
+            methods = {}
+            for origin in folds:
+                train_dates, train_quantities = dates[:origin + 1], quantities[:origin + 1]
+                test = (dates > dates[origin]) & (dates <= dates[origin] + horizon)
+                cached += fit_and_predict.check_call_in_cache(name, train_dates, train_quantities, horizon)
+                fit = fit_and_predict(name, train_dates, train_quantities, horizon)
+                steps = (dates[test] - dates[origin]).astype(int) - 1
+                actual.append(quantities[test])
+                predicted.append(fit['yhat'][steps])
+                # Times are the ones measured when the fit ran, so cached runs still compare costs
+                fit_seconds += fit['fit_seconds']
+                predict_seconds += fit['predict_seconds']
+                methods[fit['method']] = methods.get(fit['method'], 0) + 1
+            scores = errors(np.concatenate(actual), np.concatenate(predicted)) if len(folds) else {'mae': None, 'mape': None}
+            results[name] = {
+                **scores, 'fit_seconds': fit_seconds, 'predict_seconds': predict_seconds,
+                'cached_folds': cached, 'methods': methods,
+            }
+        return {
+            'city': city, 'status': 'ok', 'days': len(dates), 'folds': len(folds),
+            'results': results, 'seconds': time.perf_counter() - start,
+        }
+    except Exception as e:
+        return {'city': city, 'status': 'failed', 'error': repr(e), 'seconds': time.perf_counter() - start}
+
+
+def run_backtest(series, forecasters=None, horizon=14, initial=60, step=14, max_folds=None,
+                 workers=None, cache_dir=None, max_mape=None):
+    """
+    Backtest every city in `series` ({city: (dates, quantities)}) across a
+    process pool of `workers`. With `max_mape`, each city also gets the
+    cheapest forecaster (fit + predict time) whose MAPE is within it.
+    """
+    forecasters = list(forecasters or FORECASTERS)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(series) or 1))
+    args = (forecasters, horizon, initial, step, max_folds, cache_dir)
+    start = time.perf_counter()
+    cities = []
+
+    if workers == 1:
+        for city, (dates, quantities) in series.items():
+            cities.append(backtest_city(city, dates, quantities, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(backtest_city, city, dates, quantities, *args): city
+                for city, (dates, quantities) in series.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    cities.append(future.result())
+                except Exception as e:
+                    cities.append({'city': futures[future], 'status': 'failed', 'error': repr(e), 'seconds': None})
+
+    cities.sort(key=lambda result: result['city'])
+    scored = [result for result in cities if result['status'] == 'ok' and result['folds']]
+    for result in scored:
+        result['choice'] = _cheapest(result['results'], max_mape) if max_mape is not None else None
+
+    totals = {}
+    for name in forecasters:
+        rows = [result['results'][name] for result in scored]
+        mapes = [row['mape'] for row in rows if row['mape'] is not None]
+        totals[name] = {
+            'cities': len(rows),
+            'mae': float(np.mean([row['mae'] for row in rows])) if rows else None,
+            'mape': float(np.mean(mapes)) if mapes else None,
+            'fit_seconds': sum(row['fit_seconds'] for row in rows),
+            'predict_seconds': sum(row['predict_seconds'] for row in rows),
+            'within_mape': sum(row['mape'] is not None and row['mape'] <= max_mape for row in rows) if max_mape is not None else None,
+            'chosen': sum(result['choice'] == name for result in scored),
+        }
+
+    return {
+        'workers': workers,
+        'seconds': time.perf_counter() - start,
+        'settings': {'horizon': horizon, 'initial': initial, 'step': step, 'max_folds': max_folds, 'max_mape': max_mape},
+        'cities': cities,
+        'totals': totals,
+        'unscored': sorted(result['city'] for result in cities if result['status'] == 'ok' and not result['folds']),
+        'failed': {result['city']: result['error'] for result in cities if result['status'] != 'ok'},
+    }
+
+
+def _cheapest(results, max_mape):
+    meeting = [
+        (row['fit_seconds'] + row['predict_seconds'], name)
+        for name, row in results.items() if row['mape'] is not None and row['mape'] <= max_mape
+    ]
+    return min(meeting)[1] if meeting else None
@@ -0,0 +1,141 @@
+import itertools
+
+import numpy as np
+
+SEASON = 7  # weekly
+Z_80 = 1.2816  # Prophet's default interval_width is 80%
+
+# Smoothing parameters tried for every city at once; each city keeps its best
+DEFAULT_GRID = {
+    'alpha': [0.1, 0.3, 0.5, 0.8],
+    'beta': [0.0, 0.05, 0.2],
+    'gamma': [0.05, 0.2, 0.5],
+}
+
+
+def build_matrix(series, cities=None, length=None):
+    """
+    Right-align each city's daily series into a (cities x days) matrix
+    ending on that city's own last day. Days before a city's first day are
+    NaN; gaps inside its history are days with no recorded demand (0).
+    """
+    cities = list(cities or sorted(series))
+    spans = [int((series[city][0][-1] - series[city][0][0]).astype(int)) + 1 for city in cities]
+    length = length or max(spans)
+    matrix = np.full((len(cities), length), np.nan)
+    last_dates = []
+    for row, city in enumerate(cities):
+        dates, quantities = series[city]
+        offsets = (dates - dates[-1]).astype(int) + length - 1
+        keep = offsets >= 0
+        matrix[row, max(offsets[keep].min(), 0):] = 0.0
+        matrix[row, offsets[keep]] = quantities[keep]
+        last_dates.append(dates[-1])
+    return cities, matrix, np.array(last_dates, dtype='datetime64[D]')
+
+
+def holt_winters(matrix, horizon, alpha, beta, gamma, season=SEASON):
+    """
+    Additive Holt-Winters over every row of `matrix` and every parameter
+    set at once: state arrays are (parameter sets x cities), so the only
+    Python loop is over days. Returns forecasts (G x C x horizon), the
+    one-step-ahead squared error sum (G x C) and the error count per city.
+    """
+    a, b, g = (np.asarray(values, dtype=float)[:, None] for values in (alpha, beta, gamma))
+    n_sets, (n_cities, n_days) = len(a), matrix.shape
+    level = np.zeros((n_sets, n_cities))
+    trend = np.zeros((n_sets, n_cities))
+    seasonal = np.zeros((n_sets, n_cities, season))
+    sse = np.zeros((n_sets, n_cities))
+    count = np.zeros(n_cities)
+    started = np.zeros(n_cities, dtype=bool)
+
+    for t in range(n_days):
+        x = matrix[:, t]
+        observed = ~np.isnan(x)
+        first = observed & ~started
+        level[:, first] = x[first]
+        started |= first
+        update = observed & ~first
+        if not update.any():
+            continue
+
+        s = seasonal[:, :, t % season]
+        error = x - (level + trend + s)
+        sse += np.where(update, error, 0.0) ** 2
+        count += update
+
+        new_level = a * (x - s) + (1 - a) * (level + trend)
+        new_trend = b * (new_level - level) + (1 - b) * trend
+        new_season = g * (x - new_level) + (1 - g) * s
+        level = np.where(update, new_level, level)
+        trend = np.where(update, new_trend, trend)
+        seasonal[:, :, t % season] = np.where(update, new_season, s)
+
+    steps = np.arange(1, horizon + 1)
+    forecast = level[..., None] + trend[..., None] * steps + seasonal[:, :, (n_days - 1 + steps) % season]
+    return forecast, sse, count
+
+
+def seasonal_naive(matrix, horizon, season=SEASON):
+    """Repeat the last week (or the mean, with less than a week of history) for short series"""
+    n_cities, n_days = matrix.shape
+    forecast = np.zeros((n_cities, horizon))
+    sigma = np.zeros(n_cities)
+    for row in range(n_cities):
+        history = matrix[row][~np.isnan(matrix[row])]
+        if len(history) >= season:
+            forecast[row] = np.resize(history[-season:], horizon)
+            sigma[row] = np.std(history[season:] - history[:-season]) if len(history) > season else np.std(history)
+        else:
+            forecast[row] = history.mean()
+            sigma[row] = np.std(history)
+    return forecast, sigma
+
+
+def fast_forecast(series, horizon, grid=None, min_holt_winters_days=2 * SEASON):
+    """
+    Forecast every city in `series` ({city: (dates, quantities)}) for
+    `horizon` days. Cities with at least `min_holt_winters_days` days get
+    Holt-Winters with per-city parameters picked by one-step-ahead error;
+    shorter ones get seasonal naive.
+
+    Returns {city: {'dates', 'yhat', 'yhat_lower', 'yhat_upper', 'method'}}.
+    """
+    if not series:
+        return {}
+    grid = grid or DEFAULT_GRID
+    cities, matrix, last_dates = build_matrix(series)
+    history_days = (~np.isnan(matrix)).sum(axis=1)
+    yhat = np.zeros((len(cities), horizon))
+    sigma = np.zeros(len(cities))
+    methods = np.where(history_days >= min_holt_winters_days, 'holt_winters', 'seasonal_naive')
+
+    long_rows = np.flatnonzero(methods == 'holt_winters')
+    if len(long_rows):
+        alpha, beta, gamma = zip(*itertools.product(grid['alpha'], grid['beta'], grid['gamma']))
+        forecast, sse, count = holt_winters(matrix[long_rows], horizon, alpha, beta, gamma)
+        best = sse.argmin(axis=0)
+        columns = np.arange(len(long_rows))
+        yhat[long_rows] = forecast[best, columns]
+        sigma[long_rows] = np.sqrt(sse[best, columns] / np.maximum(count, 1))
+
+    short_rows = np.flatnonzero(methods == 'seasonal_naive')
+    if len(short_rows):
+        yhat[short_rows], sigma[short_rows] = seasonal_naive(matrix[short_rows], horizon)
+
+    # Uncertainty grows with the horizon, like a random walk
+    spread = Z_80 * sigma[:, None] * np.sqrt(np.arange(1, horizon + 1))
+    yhat = np.maximum(yhat, 0)
+    steps = np.arange(1, horizon + 1).astype('timedelta64[D]')
+    return {
+        city: {
+            'dates': last_dates[row] + steps,
+            'yhat': yhat[row],
+            'yhat_lower': np.maximum(yhat[row] - spread[row], 0),
+            'yhat_upper': yhat[row] + spread[row],
+            'method': str(methods[row]),
+        }
+        for row, city in enumerate(cities)
+    }
+
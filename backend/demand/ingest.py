@@ -0,0 +1,149 @@
+import codecs
+import io
+import time
+
+import pandas as pd
+from django.db import connection, transaction
+
+from foodredistribution.utils import upsert_options
+from .models import DemandDataPoint
+
+REQUIRED_COLUMNS = ['city', 'date', 'donation_volume', 'request_volume']
+OPTIONAL_COLUMNS = ['special_event']
+FORMATS = ('csv', 'ndjson')
+
+
+class IngestError(ValueError):
+    """The upload as a whole can't be read (unknown format, missing columns)"""
+
+
+def read_chunks(stream, fmt, chunk_size):
+    """Yield DataFrames of up to `chunk_size` rows, every value read as a string"""
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.BytesIO(stream)
+    if fmt == 'csv':
+        return pd.read_csv(stream, chunksize=chunk_size, dtype=str, keep_default_na=False, skipinitialspace=True)
+    if fmt == 'ndjson':
+        # pandas' chunked JSON reader only handles text streams
+        if not isinstance(stream, io.TextIOBase):
+            stream = codecs.getreader('utf-8')(stream)
+        return pd.read_json(stream, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False)
+    raise IngestError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def validate_chunk(df, first_row):
+    """
+    Validate a chunk column by column. Returns the clean rows (typed) and
+    a list of {'row', 'errors'} for the rest; `row` is the 1-based data
+    row number in the upload.
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise IngestError(f"Missing columns: {', '.join(missing)}")
+
+    rows = pd.RangeIndex(first_row, first_row + len(df))
+    df = df.reset_index(drop=True)
+    problems = {}
+
+    def flag(mask, message):
+        for position in mask.to_numpy().nonzero()[0]:
+            problems.setdefault(int(rows[position]), []).append(message)
+
+    city = df['city'].fillna('').astype(str).str.strip()
+    flag(city == '', 'city is required')
+    flag(city.str.len() > 100, 'city is longer than 100 characters')
+
+    date = pd.to_datetime(df['date'].astype(str).str.strip(), format='%Y-%m-%d', errors='coerce')
+    flag(date.isna(), 'date must be YYYY-MM-DD')
+
+    volumes = {}
+    # PositiveIntegerField's range differs per database (unsigned INT on MySQL);
+    # values are parsed as floats, so stay where those are exact
+    max_volume = min(connection.ops.integer_field_range('PositiveIntegerField')[1], 2 ** 53)
+    for column in ('donation_volume', 'request_volume'):
+        value = pd.to_numeric(df[column], errors='coerce')
+        flag(value.isna() | (value < 0) | (value % 1 != 0), f'{column} must be a non-negative integer')
+        flag(value > max_volume, f'{column} is larger than {max_volume}')
+        volumes[column] = value
+
+    if 'special_event' in df.columns:
+        special_event = df['special_event'].fillna('').astype(str).str.strip()
+        flag(special_event.str.len() > 255, 'special_event is longer than 255 characters')
+    else:
+        special_event = pd.Series('', index=df.index)
+
+    bad = pd.Series(rows.isin(list(problems)), index=df.index)
+    clean = pd.DataFrame({
+        'city': city,
+        'date': date.dt.date,
+        'donation_volume': volumes['donation_volume'],
+        'request_volume': volumes['request_volume'],
+        'special_event': special_event.where(special_event != '', None),
+    })[~bad]
+    clean['donation_volume'] = clean['donation_volume'].astype('int64')
+    clean['request_volume'] = clean['request_volume'].astype('int64')
+    # The same city and day twice in one batch would hit the upsert twice; the last one wins
+    clean = clean.drop_duplicates(['city', 'date'], keep='last')
+    errors = [{'row': row, 'errors': messages} for row, messages in sorted(problems.items())]
+    return clean, errors
+
+
+def ingest(stream, fmt, user, chunk_size=50000, batch_size=5000, dry_run=False, max_errors=1000):
+    """
+    Validate and upsert DemandDataPoint rows from a CSV or NDJSON stream
+    for `user`. Existing rows with the same (city, date, submitted_by) are
+    updated. Returns a report with counts, throughput and up to
+    `max_errors` row-level errors (all of them when None).
+
+    Each chunk is committed on its own. If the upload can't be read past
+    the first chunk, the report comes back with an 'error' and the counts
+    of what was already written; an unreadable first chunk raises
+    IngestError, as nothing has been written then.
+    """
+    start = time.perf_counter()
+    report = {'rows': 0, 'valid': 0, 'written': 0, 'error_count': 0, 'errors': [], 'dry_run': dry_run}
+    options = upsert_options(['city', 'date', 'submitted_by'], ['donation_volume', 'request_volume', 'special_event'])
+
+    chunks = iter(read_chunks(stream, fmt, chunk_size))
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            break
+        except ValueError as e:  # pandas' ParserError and malformed JSON lines
+            error = IngestError(f"Could not parse the upload after row {report['rows']}: {e}")
+        else:
+            try:
+                clean, errors = validate_chunk(chunk, report['rows'] + 1)
+                error = None
+            except IngestError as e:  # e.g. an NDJSON chunk without a required key
+                error = e
+        if error is not None:
+            if not report['rows']:
+                raise error
+            report['error'] = str(error)
+            break
+        report['rows'] += len(chunk)
+        report['valid'] += len(chunk) - len(errors)
+        report['error_count'] += len(errors)
+        if max_errors is not None:
+            errors = errors[:max(0, max_errors - len(report['errors']))]
+        report['errors'].extend(errors)
+        if dry_run or clean.empty:
+            continue
+
+        objs = [
+            DemandDataPoint(
+                city=city, date=date, donation_volume=donation_volume, request_volume=request_volume,
+                special_event=special_event, submitted_by_id=user.pk,
+            )
+            for city, date, donation_volume, request_volume, special_event in clean.itertuples(index=False)
+        ]
+        with transaction.atomic():
+            DemandDataPoint.objects.bulk_create(objs, batch_size=batch_size, **options)
+        report['written'] += len(objs)
+
+    report['seconds'] = time.perf_counter() - start
+    report['rows_per_second'] = report['rows'] / report['seconds'] if report['seconds'] else None
+    report['errors_truncated'] = report['error_count'] > len(report['errors'])
+    return report
@@ -0,0 +1,80 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from demand.backtest import FORECASTERS, run_backtest
+from demand.utils import get_training_data
+
+
+class Command(BaseCommand):
+    help = "Rolling-origin backtest of every demand forecaster for every city, with accuracy and cost per city"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forecasters', nargs='+', choices=sorted(FORECASTERS), help='Default: all of them')
+        parser.add_argument('--cities', nargs='+', help='Only these cities')
+        parser.add_argument('--horizon', type=int, default=14, help='Days forecast from each origin')
+        parser.add_argument('--initial', type=int, default=60, help='Days of history before the first origin')
+        parser.add_argument('--step', type=int, default=14, help='Days between origins')
+        parser.add_argument('--max-folds', type=int, help='Keep only the most recent origins per city')
+        parser.add_argument('--max-mape', type=float, default=0.25,
+                            help='Accuracy bar; each city gets the cheapest forecaster within it')
+        parser.add_argument('--workers', type=int, help='Processes (default: DEMAND_TRAINING_WORKERS or CPU count)')
+        parser.add_argument('--no-cache', action='store_true', help='Refit everything instead of reusing cached fits')
+        parser.add_argument('--output', help='Also write the full report to this JSON file')
+
+    def handle(self, *args, **options):
+        series = get_training_data(cities=options['cities'])
+        if not series:
+            raise CommandError("No demand data to backtest on")
+
+        report = run_backtest(
+            series,
+            forecasters=options['forecasters'],
+            horizon=options['horizon'],
+            initial=options['initial'],
+            step=options['step'],
+            max_folds=options['max_folds'],
+            workers=options['workers'] or getattr(settings, 'DEMAND_TRAINING_WORKERS', None),
+            cache_dir=None if options['no_cache'] else getattr(settings, 'DEMAND_BACKTEST_CACHE_DIR', None),
+            max_mape=options['max_mape'],
+        )
+
+        self.stdout.write(
+            f"{'city':<20} {'forecaster':<15} {'folds':>5} {'mae':>8} {'mape':>7} {'fit s':>7} {'predict s':>9} {'cached':>6}"
+        )
+        for result in report['cities']:
+            if result['status'] != 'ok' or not result['folds']:
+                continue
+            for name, row in result['results'].items():
+                marker = ' *' if name == result['choice'] else ''
+                # e.g. holt_winters falling back to seasonal naive on short windows
+                marker += ''.join(f" ({method} {n}/{result['folds']})" for method, n in row['methods'].items() if method != name)
+                self.stdout.write(
+                    f"{result['city']:<20} {name:<15} {result['folds']:>5} {_num(row['mae']):>8} {_pct(row['mape']):>7} "
+                    f"{row['fit_seconds']:>7.2f} {row['predict_seconds']:>9.2f} {row['cached_folds']:>6}{marker}"
+                )
+
+        self.stdout.write(f"\n* cheapest forecaster within {_pct(options['max_mape'])} MAPE for that city")
+        for name, totals in report['totals'].items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {totals['cities']} cities, mean MAE {_num(totals['mae'])}, mean MAPE {_pct(totals['mape'])}, "
+                f"fit {totals['fit_seconds']:.1f}s, predict {totals['predict_seconds']:.1f}s, "
+                f"within bar {totals['within_mape']}, cheapest for {totals['chosen']}"
+            ))
+        if report['unscored']:
+            self.stdout.write(self.style.WARNING(f"Too little history for one fold: {report['unscored']}"))
+        for city, error in report['failed'].items():
+            self.stdout.write(self.style.ERROR(f"{city}: {error}"))
+        self.stdout.write(f"Finished in {report['seconds']:.1f}s with {report['workers']} workers")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+
+def _num(value):
+    return f"{value:.2f}" if value is not None else '-'
+
+
+def _pct(value):
+    return f"{value * 100:.1f}%" if value is not None else '-'
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from demand.backtest import run_backtest
+from demand.utils import get_training_data
+
+
+class Command(BaseCommand):
+    help = "Compare the fast forecaster with Prophet on each city's most recent days (one backtest fold)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--holdout', type=int, default=14, help='Days held out at the end of each series')
+        parser.add_argument('--prophet-cities', type=int, default=10,
+                            help='Also fit Prophet for this many of the longest series (0 to skip)')
+
+    def handle(self, *args, **options):
+        series = get_training_data()
+        if not series:
+            raise CommandError("No demand data to backtest on")
+
+        # One fold whose origin is `holdout` days before each city's last day
+        fold = {
+            'horizon': options['holdout'], 'initial': 2, 'step': 1, 'max_folds': 1,
+            'workers': getattr(settings, 'DEMAND_TRAINING_WORKERS', None),
+            'cache_dir': getattr(settings, 'DEMAND_BACKTEST_CACHE_DIR', None),
+        }
+        reports = [run_backtest(series, forecasters=['holt_winters'], **fold)]
+        longest = sorted(series, key=lambda city: len(series[city][0]), reverse=True)[:options['prophet_cities']]
+        if longest:
+            reports.append(run_backtest({city: series[city] for city in longest}, forecasters=['prophet'], **fold))
+
+        results, totals = {}, {}
+        for report in reports:
+            for result in report['cities']:
+                if result['status'] == 'ok' and result['folds']:
+                    results.setdefault(result['city'], {}).update(result['results'])
+            totals.update(report['totals'])
+
+        self.stdout.write(f"{'city':<20} {'fast method':<15} {'fast mae':>9} {'fast mape':>9} {'prophet mae':>11} {'prophet mape':>12}")
+        for city, result in sorted(results.items()):
+            fast, prophet = result.get('holt_winters', {}), result.get('prophet', {})
+            self.stdout.write(
+                f"{city:<20} {', '.join(fast.get('methods', [])):<15} {_num(fast.get('mae')):>9} {_pct(fast.get('mape')):>9} "
+                f"{_num(prophet.get('mae')):>11} {_pct(prophet.get('mape')):>12}"
+            )
+        for name, total in totals.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {total['cities']} cities, fit {total['fit_seconds'] + total['predict_seconds']:.2f}s, "
+                f"mean MAE {_num(total['mae'])}, mean MAPE {_pct(total['mape'])}"
+            ))
+        for report in reports:
+            for city, error in report['failed'].items():
+                self.stdout.write(self.style.ERROR(f"{city}: {error}"))
+
+
+def _num(value):
+    return f"{value:.2f}" if value is not None else '-'
+
+
+def _pct(value):
+    return f"{value * 100:.1f}%" if value is not None else '-'
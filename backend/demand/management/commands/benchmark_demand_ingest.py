@@ -0,0 +1,71 @@
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from demand.ingest import ingest
+from demand.models import DemandDataPoint
+from demand.serializers import DemandDataPointSerializer
+
+
+class Command(BaseCommand):
+    help = 'Measure bulk ingestion throughput on a synthetic CSV (rows are deleted afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--cities', type=int, default=500)
+        parser.add_argument('--invalid', type=float, default=0.01, help='Fraction of rows with a bad value')
+        parser.add_argument('--chunk-size', type=int, default=50000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--baseline-rows', type=int, default=2000,
+                            help='Rows saved one at a time through the serializer, for comparison (0 to skip)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(username='synthetic_ingest_benchmark')
+        try:
+            with tempfile.NamedTemporaryFile(suffix='.csv') as f:
+                self._write_csv(f.name, options['rows'], options['cities'], options['invalid'])
+                for label, dry_run in (('validate only', True), ('insert', False), ('upsert existing', False)):
+                    f.seek(0)
+                    report = ingest(f, 'csv', user, options['chunk_size'], options['batch_size'], dry_run=dry_run)
+                    self.stdout.write(
+                        f"{label:<16} {report['rows']} rows, {report['written']} written, "
+                        f"{report['error_count']} errors, {report['seconds']:.1f}s, "
+                        f"{report['rows_per_second']:,.0f} rows/s"
+                    )
+            if options['baseline_rows']:
+                self._baseline(user, options['baseline_rows'])
+        finally:
+            DemandDataPoint.objects.filter(submitted_by=user).delete()
+            user.delete()
+
+    def _write_csv(self, path, rows, cities, invalid):
+        rng = np.random.default_rng(0)
+        days = -(-rows // cities)
+        frame = pd.DataFrame({
+            'city': np.repeat([f"synthetic_{i}" for i in range(cities)], days)[:rows],
+            'date': np.tile(np.datetime64('2020-01-01') + np.arange(days), cities)[:rows].astype(str),
+            'donation_volume': rng.poisson(40, rows).astype(str),
+            'request_volume': rng.poisson(50, rows).astype(str),
+            'special_event': '',
+        })
+        bad = rng.random(rows) < invalid
+        frame.loc[bad, 'request_volume'] = '-1'
+        start = time.perf_counter()
+        frame.to_csv(path, index=False)
+        self.stdout.write(f"Wrote {rows} rows for {cities} cities ({bad.sum()} invalid) in {time.perf_counter() - start:.1f}s")
+
+    def _baseline(self, user, rows):
+        start = time.perf_counter()
+        for i in range(rows):
+            serializer = DemandDataPointSerializer(data={
+                'city': 'synthetic_baseline', 'date': str(np.datetime64('2020-01-01') + i),
+                'donation_volume': 40, 'request_volume': 50,
+            })
+            serializer.is_valid(raise_exception=True)
+            serializer.save(submitted_by=user)
+        seconds = time.perf_counter() - start
+        self.stdout.write(f"{'serializer':<16} {rows} rows one at a time, {seconds:.1f}s, {rows / seconds:,.0f} rows/s")
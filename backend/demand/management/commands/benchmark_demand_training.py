@@ -0,0 +1,99 @@
+import os
+import tempfile
+import time
+
+from celery import group
+from celery.contrib.testing.worker import start_worker
+from django.core.management.base import BaseCommand, CommandError
+from backend.celery import app
+from demand.tasks import fit_city_model_task
+from demand.utils import city_histories, get_training_data, history_to_json, summarize_fits, train_city_models
+
+
+class Command(BaseCommand):
+    help = "Time per-city demand model training at different worker counts, directly and through Celery"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, nargs='+',
+            help='Worker counts to try (default: 1, 2, 4, ... up to the CPU count)',
+        )
+        parser.add_argument(
+            '--path', choices=['direct', 'celery', 'both'], default='both',
+            help="'direct': train_city_models' process pool; 'celery': one fit task per city "
+                 "on an in-process prefork worker, as the nightly retrain runs",
+        )
+        parser.add_argument(
+            '--local-broker', action='store_true',
+            help='Run the Celery path on a temporary filesystem broker instead of CELERY_BROKER_URL',
+        )
+        parser.add_argument('--timeout', type=float, default=3600, help='Seconds to wait for the Celery fits')
+
+    def handle(self, *args, **options):
+        histories, _ = city_histories(get_training_data())
+        if not histories:
+            raise CommandError("No city has enough demand data; try generate_synthetic_data first")
+
+        counts = options['workers'] or self._default_counts()
+        paths = ['direct', 'celery'] if options['path'] == 'both' else [options['path']]
+        self.stdout.write(f"Training {len(histories)} cities with {counts} workers via {', '.join(paths)}")
+
+        with tempfile.TemporaryDirectory() as scratch:
+            if 'celery' in paths and options['local_broker']:
+                self._use_local_broker(scratch)
+
+            rows = []
+            for path in paths:
+                baseline = None
+                for workers in counts:
+                    # Train into a scratch directory so the live models are untouched
+                    with tempfile.TemporaryDirectory(dir=scratch) as model_dir:
+                        if path == 'direct':
+                            summary = train_city_models(histories, workers=workers, model_dir=model_dir)
+                        else:
+                            summary = self._train_via_celery(histories, workers, model_dir, options['timeout'])
+                    baseline = baseline or summary['seconds']
+                    rows.append((
+                        path, workers, summary['workers'], summary['seconds'],
+                        baseline / summary['seconds'], len(summary['failed']),
+                    ))
+
+        self.stdout.write(f"{'path':>6} {'workers':>7} {'used':>4} {'seconds':>8} {'speedup':>8} {'failed':>6}")
+        for path, workers, used, seconds, speedup, failed in rows:
+            self.stdout.write(f"{path:>6} {workers:>7} {used:>4} {seconds:>8.2f} {speedup:>7.2f}x {failed:>6}")
+
+    def _train_via_celery(self, histories, workers, model_dir, timeout):
+        """Fan the cities out as fit tasks to a prefork worker with `workers` processes"""
+        with start_worker(
+            app, pool='prefork', concurrency=workers, queues=['training'], prefetch_multiplier=1,
+            perform_ping_check=False, hostname=f"benchmark-{workers}@localhost",
+        ):
+            start = time.perf_counter()
+            results = group(
+                fit_city_model_task.s(city, history_to_json(history), None, model_dir)
+                for city, history in histories.items()
+            ).apply_async().get(timeout=timeout)
+            seconds = time.perf_counter() - start
+        return summarize_fits(results, len({result['process'] for result in results}), seconds)
+
+    def _use_local_broker(self, scratch):
+        # Settings come from Django with the CELERY_ namespace, so override those keys.
+        # The filesystem transport and file results work across the prefork children.
+        broker_dir = os.path.join(scratch, 'broker')
+        os.makedirs(broker_dir)
+        app.conf.update(
+            CELERY_BROKER_URL='filesystem://',
+            CELERY_RESULT_BACKEND=f"file://{os.path.join(scratch, 'results')}",
+            CELERY_TASK_ALWAYS_EAGER=False,
+        )
+        os.makedirs(os.path.join(scratch, 'results'))
+        app.conf.broker_transport_options = {
+            'data_folder_in': broker_dir, 'data_folder_out': broker_dir, 'polling_interval': 0.05,
+        }
+
+    def _default_counts(self):
+        counts, workers = [], 1
+        while workers < (os.cpu_count() or 1):
+            counts.append(workers)
+            workers *= 2
+        return counts + [os.cpu_count() or 1]
@@ -0,0 +1,64 @@
+import os
+import statistics
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from prophet import Prophet
+from demand.utils import city_histories, get_training_data, load_model_file, serialize_model
+
+
+class Command(BaseCommand):
+    help = "Compare file size and load time of full joblib pickles and the compact JSON model format"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--cities', type=int, default=10, help='Fit and compare this many cities')
+
+    def handle(self, *args, **options):
+        histories, _ = city_histories(get_training_data())
+        cities = sorted(histories)[:options['cities']]
+        if not cities:
+            raise CommandError("No city has enough demand data to fit a model")
+
+        self.stdout.write(f"{'city':<20} {'pkl KB':>8} {'json KB':>8} {'pkl load ms':>11} {'json load ms':>12} {'max |dyhat|':>11}")
+        totals = np.zeros(4)
+        with tempfile.TemporaryDirectory() as tmp:
+            for city in cities:
+                # Fit fresh so the pickle is what train_and_save_models used to write
+                model = Prophet()
+                model.fit(histories[city])
+                pkl_path = os.path.join(tmp, 'model.pkl')
+                json_path = os.path.join(tmp, 'model.json')
+                joblib.dump(model, pkl_path)
+                with open(json_path, 'w') as f:
+                    f.write(serialize_model(model))
+
+                pkl_ms = self._load_ms(pkl_path, options['repeat'])
+                json_ms = self._load_ms(json_path, options['repeat'])
+                drift = self._yhat_drift(load_model_file(pkl_path), load_model_file(json_path))
+                sizes = (os.path.getsize(pkl_path) / 1024, os.path.getsize(json_path) / 1024)
+                totals += (*sizes, pkl_ms, json_ms)
+                self.stdout.write(
+                    f"{city:<20} {sizes[0]:>8.1f} {sizes[1]:>8.1f} {pkl_ms:>11.2f} {json_ms:>12.2f} {drift:>11.2g}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {totals[0]:.1f} KB pickled vs {totals[1]:.1f} KB compact "
+            f"({totals[1] / totals[0]:.0%}); load time (sum of medians) {totals[2]:.1f} ms vs {totals[3]:.1f} ms"
+        ))
+
+    def _load_ms(self, path, repeat):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            load_model_file(path)
+            times.append((time.perf_counter() - start) * 1000)
+        return statistics.median(times)
+
+    def _yhat_drift(self, original, compact):
+        future = original.make_future_dataframe(periods=30, include_history=False)
+        original.uncertainty_samples = compact.uncertainty_samples = 0
+        return float(np.abs(original.predict(future)['yhat'].values - compact.predict(future)['yhat'].values).max())
@@ -0,0 +1,52 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from demand.ingest import FORMATS, IngestError, ingest
+
+
+class Command(BaseCommand):
+    help = 'Bulk import demand data points from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username the rows are submitted as')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows validated per pandas chunk')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only')
+        parser.add_argument('--errors-out', help='Write the full row-level error report to this JSON file')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['user']!r}")
+
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        max_errors = None if options['errors_out'] else 20
+        try:
+            with open(path, 'rb') as f:
+                report = ingest(
+                    f, fmt, user, chunk_size=options['chunk_size'], batch_size=options['batch_size'],
+                    dry_run=options['dry_run'], max_errors=max_errors,
+                )
+        except (OSError, IngestError) as e:
+            raise CommandError(str(e))
+
+        if options['errors_out']:
+            with open(options['errors_out'], 'w') as f:
+                json.dump(report['errors'], f, indent=2)
+        else:
+            for error in report['errors']:
+                self.stdout.write(self.style.WARNING(f"row {error['row']}: {'; '.join(error['errors'])}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['rows']} rows, {report['valid']} valid, {report['written']} written, "
+            f"{report['error_count']} with errors in {report['seconds']:.1f}s "
+            f"({report['rows_per_second']:.0f} rows/s)" + (' [dry run]' if options['dry_run'] else '')
+        ))
+        if 'error' in report:
+            raise CommandError(f"Stopped early, the rows above were written: {report['error']}")
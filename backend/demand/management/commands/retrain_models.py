@@ -4,7 +4,11 @@ from demand.utils import train_and_save_models
 class Command(BaseCommand):
     help = "Retrains demand prediction models using Prophet for each city"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Retrain cities whose data hasn't changed too")
+        parser.add_argument('--workers', type=int, help='Training processes (default: DEMAND_TRAINING_WORKERS)')
+
     def handle(self, *args, **kwargs):
         self.stdout.write("🔁 Starting weekly demand model retraining...")
-        train_and_save_models()
+        train_and_save_models(workers=kwargs['workers'], force=kwargs['force'])
         self.stdout.write("✅ Model retraining completed successfully.")
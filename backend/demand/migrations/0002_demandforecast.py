@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demand', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('yhat', models.FloatField()),
+                ('yhat_lower', models.FloatField()),
+                ('yhat_upper', models.FloatField()),
+                ('generated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['city', 'date'],
+                'unique_together': {('city', 'date')},
+            },
+        ),
+    ]
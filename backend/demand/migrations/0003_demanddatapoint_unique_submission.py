@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:14
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def drop_duplicate_submissions(apps, schema_editor):
+    """Keep the latest row for each (city, date, submitted_by) so the constraint can be added"""
+    DemandDataPoint = apps.get_model('demand', 'DemandDataPoint')
+    duplicates = (
+        DemandDataPoint.objects.values('city', 'date', 'submitted_by')
+        .annotate(rows=Count('id'), keep=Max('id')).filter(rows__gt=1)
+    )
+    for group in duplicates:
+        DemandDataPoint.objects.filter(
+            city=group['city'], date=group['date'], submitted_by=group['submitted_by'],
+        ).exclude(id=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demand', '0002_demandforecast'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_submissions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='demanddatapoint',
+            unique_together={('city', 'date', 'submitted_by')},
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 CustomUser = get_user_model()
@@ -11,5 +12,25 @@ class DemandDataPoint(models.Model):
     special_event = models.CharField(max_length=255, blank=True, null=True)
     submitted_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='demand_data')
 
+    class Meta:
+        # One figure per city and day from each submitter; bulk uploads upsert on this
+        unique_together = ['city', 'date', 'submitted_by']
+
     def __str__(self):
         return f"{self.city} - {self.date}"
+
+class DemandForecast(models.Model):
+    """Forecast rows precomputed right after each retrain, one per city per future day"""
+    city = models.CharField(max_length=100)
+    date = models.DateField()
+    yhat = models.FloatField()
+    yhat_lower = models.FloatField()
+    yhat_upper = models.FloatField()
+    generated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['city', 'date']
+        ordering = ['city', 'date']
+
+    def __str__(self):
+        return f"{self.city} - {self.date}: {self.yhat:.1f}"
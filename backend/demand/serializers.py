@@ -1,8 +1,15 @@
 from rest_framework import serializers
-from .models import DemandDataPoint
+from .models import DemandDataPoint, DemandForecast
 
 class DemandDataPointSerializer(serializers.ModelSerializer):
     class Meta:
         model = DemandDataPoint
         fields = '__all__'
         read_only_fields = ['submitted_by']
+
+class DemandForecastSerializer(serializers.ModelSerializer):
+    ds = serializers.DateField(source='date')
+
+    class Meta:
+        model = DemandForecast
+        fields = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
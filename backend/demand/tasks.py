@@ -1,8 +1,61 @@
-from celery import shared_task
+import os
+import time
+
+from celery import chord, shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+
+@shared_task
+def retrain_demand_models(force=False):
+    """
+    Plan the nightly retrain and fan the changed cities out as one
+    fit_city_model_task each on the training queue, so the fits spread
+    over every training worker process (prefork children can't start a
+    process pool of their own). finish_demand_training writes the manifest
+    and forecasts once every fit has reported.
+    """
+    from .utils import history_to_json, plan_training  # lazy import
+    try:
+        plan = plan_training(force)
+    except SoftTimeLimitExceeded:
+        print("⚠ Demand retrain hit its soft time limit while planning, stopping early")
+        return "Demand retrain stopped at soft time limit"
+    if plan is None:
+        return "No demand data to train on"
+
+    context = {
+        'fingerprints': plan['fingerprints'],
+        'unchanged': plan['unchanged'],
+        'skipped': plan['skipped'],
+        'fast': sorted(plan['fast_series']),
+        'started': time.time(),
+    }
+    fits = [
+        fit_city_model_task.s(city, history_to_json(history), plan['inits'].get(city))
+        for city, history in plan['changed'].items()
+    ]
+    if not fits:
+        return finish_demand_training([], context)
+    chord(fits)(finish_demand_training.s(context))
+    return {'dispatched': sorted(plan['changed']), 'unchanged': plan['unchanged'], 'fast': context['fast']}
+
+@shared_task(bind=True)
+def fit_city_model_task(self, city, history, init=None, model_dir=None):
+    """Fit and save one city's Prophet model; failures are reported, not raised, so the chord completes"""
+    from .utils import fit_city_model, history_from_json  # lazy import
+    try:
+        result = fit_city_model(city, history_from_json(history), model_dir, init)
+    except SoftTimeLimitExceeded:
+        result = {'city': city, 'status': 'failed', 'error': 'soft time limit exceeded', 'seconds': None}
+    result['process'] = f"{self.request.hostname}:{os.getpid()}"
+    return result
 
 @shared_task
-def retrain_demand_models():
-    from .utils import train_and_save_models  # lazy import
-    train_and_save_models()
-    return "Retrained demand prediction models" # using Prophet for each city"
-# This task can be scheduled to run weekly using Celery Beat or any other scheduler.
\ No newline at end of file
+def finish_demand_training(results, context):
+    from .utils import finish_training, get_training_data, summarize_fits  # lazy import
+    summary = summarize_fits(
+        results, len({result.get('process') for result in results}), time.time() - context['started'],
+    )
+    fast_series = get_training_data(cities=context['fast']) if context['fast'] else {}
+    summary = finish_training(summary, context['fingerprints'], context['unchanged'], context['skipped'], fast_series)
+    return {key: summary[key] for key in ('trained', 'warm_started', 'unchanged', 'fast', 'failed', 'skipped', 'seconds', 'workers')}
+# This task can be scheduled to run weekly using Celery Beat or any other scheduler.
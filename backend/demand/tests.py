@@ -1,3 +1,430 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from foodredistribution.models import FoodRequest, Location
+
+from . import utils
+from .backtest import errors, run_backtest
+from .ingest import IngestError, ingest, validate_chunk
+from .models import DemandDataPoint, DemandForecast
+
+
+class SubmitDemandDataTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='ngo', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit(self, **overrides):
+        data = {'city': 'Indore', 'date': '2024-01-01', 'donation_volume': 10, 'request_volume': 12, **overrides}
+        return self.client.post('/api/demand/submit/', data, format='json')
+
+    def test_resubmission_updates_the_existing_row(self):
+        self.assertEqual(self.submit().status_code, 201)
+        response = self.submit(request_volume=20)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['request_volume'], 20)
+        self.assertEqual(DemandDataPoint.objects.filter(city='Indore', submitted_by=self.user).count(), 1)
+
+    def test_submission_after_bulk_upload_of_the_same_day(self):
+        DemandDataPoint.objects.create(
+            city='Indore', date='2024-01-01', donation_volume=1, request_volume=1, submitted_by=self.user,
+        )
+        self.assertEqual(self.submit().status_code, 200)
+        self.assertEqual(DemandDataPoint.objects.get().donation_volume, 10)
+
+
+class ValidateChunkTests(TestCase):
+    def test_volumes_beyond_the_column_range_are_row_errors(self):
+        df = pd.DataFrame({
+            'city': ['Indore', 'Indore'], 'date': ['2024-01-01', '2024-01-02'],
+            'donation_volume': ['1', str(10 ** 20)], 'request_volume': ['1', '1'],
+        })
+        clean, errors = validate_chunk(df, first_row=1)
+        self.assertEqual(len(clean), 1)
+        self.assertEqual(errors[0]['row'], 2)
+        self.assertIn('donation_volume is larger than', errors[0]['errors'][0])
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='ngo', password='x')
+
+    def test_reupload_updates_rows_and_reports_bad_ones(self):
+        first = b"city,date,donation_volume,request_volume\nIndore,2024-01-01,1,2\nIndore,2024-01-02,3,4\n"
+        self.assertEqual(ingest(first, 'csv', self.user)['written'], 2)
+
+        second = b"city,date,donation_volume,request_volume\nIndore,2024-01-02,5,6\nIndore,2024-13-01,1,1\n"
+        report = ingest(second, 'csv', self.user)
+        self.assertEqual((report['rows'], report['valid'], report['written']), (2, 1, 1))
+        self.assertEqual(report['errors'], [{'row': 2, 'errors': ['date must be YYYY-MM-DD']}])
+        volumes = dict(DemandDataPoint.objects.values_list('date', 'request_volume'))
+        self.assertEqual(volumes, {date(2024, 1, 1): 2, date(2024, 1, 2): 6})
+
+    BROKEN = (
+        b"city,date,donation_volume,request_volume\n"
+        b"Indore,2024-01-01,1,1\nIndore,2024-01-02,1,1\n"
+        b"Indore,2024-01-03,1,1\nIndore,2024-01-04,1,1,stray,fields\n"
+    )
+
+    def test_malformed_line_after_the_first_chunk_reports_what_was_written(self):
+        report = ingest(self.BROKEN, 'csv', self.user, chunk_size=2)
+        self.assertIn('Could not parse the upload after row 2', report['error'])
+        self.assertEqual((report['rows'], report['written']), (2, 2))
+        self.assertEqual(DemandDataPoint.objects.count(), 2)
+
+    def test_malformed_first_chunk_raises(self):
+        with self.assertRaises(IngestError):
+            ingest(self.BROKEN, 'csv', self.user)
+        self.assertFalse(DemandDataPoint.objects.exists())
+
+    def test_upload_view_returns_the_partial_report(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('demand.views.ingest', lambda *args, **kwargs: ingest(*args, chunk_size=2, **kwargs)):
+            response = client.generic('POST', '/api/demand/bulk/', self.BROKEN, content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['written'], 2)
+        self.assertIn('error', response.data)
+
+    def test_dry_run_writes_nothing(self):
+        report = ingest(b'{"city": "Indore", "date": "2024-01-01", "donation_volume": 1, "request_volume": 2}\n',
+                        'ndjson', self.user, dry_run=True)
+        self.assertEqual((report['valid'], report['written']), (1, 0))
+        self.assertFalse(DemandDataPoint.objects.exists())
+
+
+class DedupeMigrationTests(TransactionTestCase):
+    before = [('demand', '0002_demandforecast')]
+    after = [('demand', '0003_demanddatapoint_unique_submission')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_keeps_the_latest_row_per_submission(self):
+        apps = self.migrate(self.before)
+        User = apps.get_model('foodredistribution', 'CustomUser')
+        DemandDataPoint = apps.get_model('demand', 'DemandDataPoint')
+        user = User.objects.create(username='ngo')
+        other = User.objects.create(username='other')
+        rows = [('Indore', 1, user, 1), ('Indore', 1, user, 2), ('Indore', 1, other, 3), ('Indore', 2, user, 4)]
+        for city, day, submitter, volume in rows:
+            DemandDataPoint.objects.create(
+                city=city, date=date(2024, 1, day), donation_volume=volume, request_volume=volume, submitted_by=submitter,
+            )
+
+        apps = self.migrate(self.after)
+        DemandDataPoint = apps.get_model('demand', 'DemandDataPoint')
+        self.assertEqual(sorted(DemandDataPoint.objects.values_list('request_volume', flat=True)), [2, 3, 4])
+
+
+class GetTrainingDataTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.users = [get_user_model().objects.create(username=f'user{i}') for i in range(2)]
+        self.pune = Location.objects.create(city='Pune', state='MH')
+
+    def request(self, quantity, days_ago=0, status='fulfilled'):
+        request = FoodRequest.objects.create(requester=self.users[0], quantity=quantity, location=self.pune, status=status)
+        noon = timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(12)))
+        FoodRequest.objects.filter(pk=request.pk).update(request_date=noon)  # request_date is auto_now_add
+
+    def point(self, city, volume, days_ago=0, user=0):
+        DemandDataPoint.objects.create(
+            city=city, date=self.today - timedelta(days=days_ago), donation_volume=0,
+            request_volume=volume, submitted_by=self.users[user],
+        )
+
+    def test_sources_are_summed_per_city_day(self):
+        self.request(3)
+        self.request(4)
+        self.request(50, status='pending')
+        self.request(50, days_ago=utils.REQUEST_HISTORY_DAYS + 5)  # older than the request window
+        self.point('Pune', 10)
+        self.point('Pune', 20, user=1)
+        self.point('Pune', 5, days_ago=100)
+        self.point('Delhi', 8, days_ago=1)
+
+        series = utils.get_training_data()
+        dates, quantities = series['Pune']
+        self.assertEqual(list(dates), [np.datetime64(self.today - timedelta(days=100)), np.datetime64(self.today)])
+        self.assertEqual(list(quantities), [5.0, 37.0])
+        self.assertEqual(list(series['Delhi'][1]), [8.0])
+
+        self.assertEqual(list(utils.get_training_data(cities=['Delhi'])), ['Delhi'])
+        self.assertEqual(utils.get_training_data(cities=['Nowhere']), {})
+
+
+class BacktestTests(TestCase):
+    def series(self, days):
+        dates = np.datetime64('2024-01-01') + np.arange(days)
+        return dates, 10 + np.arange(days, dtype=float) % 7
+
+    def test_holt_winters_reports_its_seasonal_naive_fallback(self):
+        report = run_backtest(
+            {'Long': self.series(60), 'Short': self.series(20)},
+            forecasters=['holt_winters'], horizon=14, initial=2, step=1, max_folds=1, workers=1,
+        )
+        methods = {result['city']: result['results']['holt_winters']['methods'] for result in report['cities']}
+        self.assertEqual(methods, {'Long': {'holt_winters': 1}, 'Short': {'seasonal_naive': 1}})
+
+    def test_one_fold_holds_out_the_last_days(self):
+        report = run_backtest(
+            {'City': self.series(30)}, forecasters=['seasonal_naive'],
+            horizon=14, initial=2, step=1, max_folds=1, workers=1,
+        )
+        self.assertEqual(report['cities'][0]['folds'], 1)
+        # A weekly pattern is forecast exactly by repeating the last week
+        self.assertEqual(report['totals']['seasonal_naive']['mae'], 0.0)
+
+    def test_errors_skip_zero_days_for_mape(self):
+        self.assertEqual(errors(np.array([0.0, 10.0]), np.array([2.0, 5.0])), {'mae': 3.5, 'mape': 0.5})
+        self.assertIsNone(errors(np.array([0.0]), np.array([1.0]))['mape'])
+
+
+def add_history(city, days):
+    user, _ = get_user_model().objects.get_or_create(username='history')
+    start = date(2024, 1, 1)
+    DemandDataPoint.objects.bulk_create([
+        DemandDataPoint(city=city, date=start + timedelta(days=i), donation_volume=5,
+                        request_volume=10 + i, submitted_by=user)
+        for i in range(days)
+    ])
+
+
+class ModelDirTestCase(TestCase):
+    """Points the model store at an empty temporary directory"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.model_dir = Path(tmp.name)
+        for patch in (
+            mock.patch.object(utils, 'MODEL_DIR', self.model_dir),
+            mock.patch.object(utils, 'MANIFEST_PATH', self.model_dir / 'manifest.json'),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+
+class ModelCacheTests(ModelDirTestCase):
+    def setUp(self):
+        super().setUp()
+        patch = mock.patch.object(utils, 'load_model_file', side_effect=lambda path: object())
+        self.load = patch.start()
+        self.addCleanup(patch.stop)
+
+    def save(self, city, mtime_ns):
+        path = utils.model_path(city)
+        path.write_text('{}')
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_a_newer_model_file_replaces_the_cached_one(self):
+        cache = utils.ModelCache()
+        self.save('Pune', 1_000_000_000)
+        first = cache.get('Pune')
+        self.assertIs(cache.get('Pune'), first)
+        self.save('Pune', 2_000_000_000)  # retrained
+        self.assertIsNot(cache.get('Pune'), first)
+        self.assertEqual((cache.hits, cache.misses, self.load.call_count), (1, 2, 2))
+
+        utils.model_path('Pune').unlink()
+        self.assertIsNone(cache.get('Pune'))
+        self.assertEqual(cache.stats()['cities'], [])
+
+    def test_least_recently_used_model_is_evicted(self):
+        cache = utils.ModelCache(max_size=2)
+        for city in ('Pune', 'Delhi', 'Indore'):
+            self.save(city, 1_000_000_000)
+        cache.get('Pune')
+        cache.get('Delhi')
+        cache.get('Pune')  # Delhi is now the least recently used
+        cache.get('Indore')
+        self.assertEqual(cache.stats()['cities'], ['Pune', 'Indore'])
+        self.assertEqual(cache.evictions, 1)
+        cache.get('Delhi')
+        self.assertEqual(cache.stats()['cities'], ['Indore', 'Delhi'])
+        self.assertEqual(self.load.call_count, 4)
+
+
+class ModelStoreTests(ModelDirTestCase):
+    def history(self, days=30):
+        ds = pd.date_range('2024-01-01', periods=days)
+        return pd.DataFrame({'ds': ds, 'y': 10 + (np.arange(days) % 7) * 2.0})
+
+    def test_compact_file_forecasts_like_the_fitted_model(self):
+        from prophet import Prophet
+
+        fitted = Prophet().fit(self.history())
+        path = self.model_dir / 'Pune.json'
+        path.write_text(utils.serialize_model(fitted))
+        self.assertEqual(len(fitted.history), 30)  # the fitted model keeps its history
+        self.assertNotIn('trend', json.loads(path.read_text())['params'])
+
+        model = utils.load_model_file(path)
+        self.assertEqual(len(model.history), 1)
+        future = model.make_future_dataframe(periods=7, include_history=False)
+        self.assertEqual(str(future['ds'].iloc[0].date()), '2024-01-31')
+        np.testing.assert_allclose(
+            model.predict(future)['yhat'].to_numpy(), fitted.predict(future)['yhat'].to_numpy(), rtol=1e-6,
+        )
+
+    def test_legacy_pickles_are_still_read_but_json_wins(self):
+        joblib.dump({'model': 'legacy'}, utils.legacy_model_path('Pune'))
+        utils.write_manifest({})
+        self.assertEqual(utils.trained_cities(), ['Pune'])
+        self.assertEqual(utils.load_model_file(utils.existing_model_path('Pune')), {'model': 'legacy'})
+        utils.model_path('Pune').write_text('{}')
+        self.assertEqual(utils.existing_model_path('Pune'), utils.model_path('Pune'))
+
+    def test_unchanged_cities_are_not_refitted(self):
+        add_history('Bhopal', days=20)
+        with self.settings(DEMAND_PROPHET_MIN_DAYS=10):
+            first = utils.train_and_save_models(workers=1)
+            with mock.patch.object(utils, 'fit_city_model') as fit_city_model:
+                second = utils.train_and_save_models(workers=1)
+        self.assertEqual((first['trained'], second['unchanged']), (['Bhopal'], ['Bhopal']))
+        fit_city_model.assert_not_called()
+        entry = utils.read_manifest()['Bhopal']
+        self.assertEqual(entry['fingerprint']['rows'], 20)
+
+
+class FastForecastCityTests(ModelDirTestCase):
+    def test_old_prophet_model_is_removed_when_a_city_moves_to_the_fast_forecaster(self):
+        add_history('Bhopal', days=10)
+        utils.model_path('Bhopal').write_text('{}')
+        utils.write_manifest({'Bhopal': {'file': 'Bhopal.json'}})
+        utils.model_cache._models['Bhopal'] = (0, object())
+
+        summary = utils.train_and_save_models(workers=1)
+
+        self.assertEqual(summary['retired'], ['Bhopal'])
+        self.assertFalse(utils.model_path('Bhopal').exists())
+        self.assertNotIn('Bhopal', json.loads(utils.MANIFEST_PATH.read_text()))
+        self.assertNotIn('Bhopal', utils.model_cache.stats()['cities'])
+        self.assertTrue(DemandForecast.objects.filter(city='Bhopal').exists())
+
+
+class RetrainTaskTests(ModelDirTestCase):
+    def setUp(self):
+        super().setUp()
+        from backend.celery import app
+        eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', eager)
+
+    def test_cities_are_fitted_as_separate_tasks_and_recorded_once_all_finish(self):
+        from .tasks import retrain_demand_models
+
+        add_history('Bhopal', days=20)
+        add_history('Indore', days=5)
+        with self.settings(DEMAND_PROPHET_MIN_DAYS=10):
+            dispatched = retrain_demand_models.delay().get()
+        self.assertEqual(dispatched, {'dispatched': ['Bhopal'], 'unchanged': [], 'fast': ['Indore']})
+        manifest = json.loads(utils.MANIFEST_PATH.read_text())
+        self.assertEqual(sorted(manifest), ['Bhopal'])
+        self.assertTrue(utils.model_path('Bhopal').exists())
+        self.assertEqual(DemandForecast.objects.filter(city='Indore').count(), 30)
+
+
+class GetForecastTests(ModelDirTestCase):
+    def test_miss_computes_and_stores_the_full_horizon(self):
+        add_history('Bhopal', days=20)
+        with self.settings(DEMAND_FORECAST_HORIZON_DAYS=30):
+            rows = utils.get_forecast('Bhopal', days=7)
+        self.assertEqual([row.date for row in rows], [date(2024, 1, 21) + timedelta(days=i) for i in range(7)])
+        self.assertEqual(DemandForecast.objects.filter(city='Bhopal').count(), 30)
+
+    def test_hit_reads_the_stored_rows(self):
+        DemandForecast.objects.bulk_create([
+            DemandForecast(city='Bhopal', date=date(2024, 2, 1) + timedelta(days=i), yhat=123,
+                           yhat_lower=100, yhat_upper=150, generated_at=timezone.now())
+            for i in range(7)
+        ])
+        with mock.patch.object(utils, 'store_forecast') as store_forecast:
+            rows = utils.get_forecast('Bhopal', days=7)
+        store_forecast.assert_not_called()
+        self.assertEqual({row.yhat for row in rows}, {123})
+
+    def test_city_without_data_or_model(self):
+        self.assertIsNone(utils.get_forecast('Nowhere', days=7))
+
+    def test_refresh_replaces_stale_rows(self):
+        add_history('Bhopal', days=20)
+        stale = timezone.now() - timedelta(days=3)
+        DemandForecast.objects.bulk_create([
+            DemandForecast(city='Bhopal', date=date(2023, 1, 1) + timedelta(days=i), yhat=123,
+                           yhat_lower=100, yhat_upper=150, generated_at=stale)
+            for i in range(40)
+        ])
+        utils.refresh_forecasts(['Bhopal'], days=14)
+        rows = utils.get_forecast('Bhopal', days=14)
+        self.assertEqual(rows[0].date, date(2024, 1, 21))
+        self.assertEqual(DemandForecast.objects.filter(city='Bhopal').count(), 14)
+        self.assertFalse(DemandForecast.objects.filter(generated_at=stale).exists())
+
+
+class ForecastBatchApiTests(ModelDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='ngo', password='x'))
+        DemandForecast.objects.bulk_create([
+            DemandForecast(city='Bhopal', date=date(2024, 2, 1) + timedelta(days=i), yhat=123.456,
+                           yhat_lower=100, yhat_upper=150, generated_at=timezone.now())
+            for i in range(30)
+        ])
+
+    def get(self, **params):
+        return self.client.get('/api/demand/forecast/batch/', params)
+
+    def test_stored_computed_and_missing_cities(self):
+        add_history('Pune', days=20)
+        response = self.get(cities='Bhopal, Pune,Nowhere,Bhopal', days=7)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['forecasts']), ['Bhopal', 'Pune'])
+        self.assertEqual(response.data['missing'], ['Nowhere'])
+        bhopal = response.data['forecasts']['Bhopal']
+        self.assertEqual(bhopal['ds'][0], '2024-02-01')
+        self.assertEqual(len(bhopal['ds']), 7)
+        self.assertEqual(set(bhopal['yhat']), {123.46})
+        self.assertEqual(response.data['forecasts']['Pune']['ds'][0], '2024-01-21')
+
+    def test_all_cities(self):
+        response = self.get(cities='all')
+        self.assertEqual(response.data['days'], 7)
+        self.assertEqual(list(response.data['forecasts']), ['Bhopal'])
+        self.assertEqual(response.data['missing'], [])
+
+    def test_days_bounds(self):
+        for days in ('0', '366', 'week'):
+            self.assertEqual(self.get(cities='Bhopal', days=days).status_code, 400, days)
+        self.assertEqual(len(self.get(cities='Bhopal', days=1).data['forecasts']['Bhopal']['ds']), 1)
+        with mock.patch.object(utils, 'store_forecast', return_value=False):
+            response = self.get(cities='Bhopal', days=365)
+        # No model to compute a longer horizon with: the stored rows are returned as they are
+        self.assertEqual((response.status_code, response.data['missing']), (200, []))
+        self.assertEqual(len(response.data['forecasts']['Bhopal']['ds']), 30)
+
+    def test_cities_are_required(self):
+        self.assertEqual(self.get(cities=' , ').status_code, 400)
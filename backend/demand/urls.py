@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import demand_forecast_api, submit_demand_data
+from .views import demand_forecast_api, demand_forecast_batch_api, submit_demand_data, bulk_demand_upload
 
 urlpatterns = [
     path('forecast/', demand_forecast_api),
+    path('forecast/batch/', demand_forecast_batch_api),
     path('submit/', submit_demand_data),  # ✅ New endpoint
+    path('bulk/', bulk_demand_upload),
 ]
\ No newline at end of file
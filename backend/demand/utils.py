@@ -1,100 +1,624 @@
+import hashlib
+import json
+import multiprocessing
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from celery.exceptions import SoftTimeLimitExceeded
+import numpy as np
 import pandas as pd
 import joblib
+import prophet
 from prophet import Prophet
+from prophet.serialize import model_from_json, model_to_json
 from pathlib import Path
+from django.conf import settings
+from backend.tracing import span
+from foodredistribution.ai_engine.instrumentation import metrics
+from .fast_forecast import fast_forecast
 
 # ✅ Directory to store model files
 MODEL_DIR = Path(__file__).resolve().parent / "model_store"
 MODEL_DIR.mkdir(exist_ok=True)
 
+# ✅ Model files: compact Prophet JSON, with joblib pickles still readable
+MODEL_FORMAT = 'prophet-json'
+MODEL_FORMAT_VERSION = 1
+
+def model_path(city, model_dir=None):
+    return Path(model_dir or MODEL_DIR) / f"{city.replace(' ', '_')}.json"
+
+def legacy_model_path(city, model_dir=None):
+    return Path(model_dir or MODEL_DIR) / f"{city.replace(' ', '_')}.pkl"
+
+def existing_model_path(city, model_dir=None):
+    """The city's model file, preferring the compact format; None when there is none"""
+    for path in (model_path(city, model_dir), legacy_model_path(city, model_dir)):
+        if path.exists():
+            return path
+    return None
+
+def trained_cities(model_dir=None):
+    root = Path(model_dir or MODEL_DIR)
+    return sorted({path.stem.replace('_', ' ') for pattern in ('*.json', '*.pkl') for path in root.glob(pattern)}
+                  - {MANIFEST_PATH.stem})
+
+def serialize_model(model):
+    """
+    Prophet JSON without the training history: prediction only needs the
+    last history date, the scaling constants and the fitted parameters,
+    so one history row is kept and the per-row fitted trend is dropped.
+    """
+    history, history_dates = model.history, model.history_dates
+    try:
+        model.history, model.history_dates = history.tail(1), history_dates.tail(1)
+        data = json.loads(model_to_json(model))
+    finally:
+        model.history, model.history_dates = history, history_dates
+    data['params'].pop('trend', None)
+    return json.dumps(data)
+
+def load_model_file(path):
+    path = Path(path)
+    if path.suffix == '.pkl':
+        return joblib.load(path)
+    with open(path) as f:
+        return model_from_json(f.read())
+
 # ✅ Get training data from both fulfilled requests AND user-submitted data
-def get_training_data():
+REQUEST_HISTORY_DAYS = 30
+
+def get_training_data(cities=None):
+    """
+    Daily demand per city from fulfilled requests plus submitted data
+    points, summed per city and day in the database and returned as
+    {city: (dates, quantities)} numpy arrays sorted by date.
+
+    Requests cover the last REQUEST_HISTORY_DAYS days and data points all
+    of history. `cities` limits the result to those cities.
+    """
     from foodredistribution.models import FoodRequest  # lazy import
     from demand.models import DemandDataPoint  # ✅ custom user submissions
+    from django.db.models import Sum
+    from django.db.models.functions import TruncDate
     from django.utils import timezone
     from datetime import timedelta
 
     # --- Source 1: Fulfilled FoodRequests ---
-    request_qs = FoodRequest.objects.select_related('location').filter(
-        status='fulfilled',
-        location_city_isnull=False,
-        request_date__gte=timezone.now() - timedelta(days=30)
-    ).values('location__city', 'request_date', 'quantity')
-
-    request_df = pd.DataFrame(request_qs)
-    if not request_df.empty:
-        request_df['source'] = 'foodrequest'
-        request_df['city'] = request_df['location__city']
-        request_df['date'] = pd.to_datetime(request_df['request_date']).dt.date
-        request_df['quantity'] = request_df['quantity']
-        request_df = request_df[['city', 'date', 'quantity', 'source']]
+    requests = FoodRequest.objects.filter(
+        status='fulfilled', location__city__isnull=False,
+        request_date__gte=timezone.now() - timedelta(days=REQUEST_HISTORY_DAYS),
+    )
+    if cities is not None:
+        requests = requests.filter(location__city__in=cities)
+    requests = (
+        requests.annotate(day=TruncDate('request_date'))
+        .values('location__city', 'day').annotate(quantity=Sum('quantity'))
+        .values_list('location__city', 'day', 'quantity').order_by()
+    )
 
     # --- Source 2: DemandDataPoint (manual) ---
-    custom_qs = DemandDataPoint.objects.all().values('city', 'date', 'request_volume')
-    custom_df = pd.DataFrame(custom_qs)
-    if not custom_df.empty:
-        custom_df['source'] = 'manual'
-        custom_df['quantity'] = custom_df['request_volume']
-        custom_df = custom_df[['city', 'date', 'quantity', 'source']]
-
-    # --- Merge both sources ---
-    if not request_df.empty and not custom_df.empty:
-        combined_df = pd.concat([request_df, custom_df])
-    elif not request_df.empty:
-        combined_df = request_df
-    elif not custom_df.empty:
-        combined_df = custom_df
+    points = DemandDataPoint.objects.all()
+    if cities is not None:
+        points = points.filter(city__in=cities)
+    points = (
+        points.values('city', 'date').annotate(quantity=Sum('request_volume'))
+        .values_list('city', 'date', 'quantity').order_by()
+    )
+
+    # --- Merge both sources: one round trip, already one row per city-day per source ---
+    per_city = {}
+    for city, day, quantity in requests.union(points, all=True).iterator(chunk_size=2000):
+        dates, quantities = per_city.setdefault(city, ([], []))
+        dates.append(day)
+        quantities.append(quantity or 0)
+
+    series = {}
+    for city, (dates, quantities) in per_city.items():
+        # A city-day can appear once per source; add them together
+        days, index = np.unique(np.array(dates, dtype='datetime64[D]'), return_inverse=True)
+        series[city] = (days, np.bincount(index, weights=np.array(quantities, dtype=float), minlength=len(days)))
+    return series
+
+# ✅ Per-city training histories
+def city_histories(series):
+    """Prophet (ds, y) frames per city; cities with fewer than 2 days are skipped"""
+    histories, skipped = {}, {}
+    for city, (dates, quantities) in series.items():
+        if len(dates) >= 2:
+            histories[city] = pd.DataFrame({'ds': pd.to_datetime(dates), 'y': quantities})
+        else:
+            skipped[city] = len(dates)
+    return histories, skipped
+
+# ✅ Training manifest: per-city data fingerprint and fitted parameters
+MANIFEST_PATH = MODEL_DIR / "manifest.json"
+
+def read_manifest():
+    if not MANIFEST_PATH.exists():
+        return {}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+def write_manifest(manifest):
+    tmp_path = MANIFEST_PATH.with_suffix('.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def fingerprint(history):
+    """Row count, last date and a content checksum of a city's (ds, y) series"""
+    checksum = hashlib.sha1(pd.util.hash_pandas_object(history[['ds', 'y']], index=False).values.tobytes())
+    return {
+        'rows': len(history),
+        'max_date': str(pd.Timestamp(history['ds'].max()).date()),
+        'checksum': checksum.hexdigest(),
+    }
+
+def warm_start_params(model):
+    """Fitted parameters of a Prophet model in the form `fit(init=...)` takes"""
+    return {
+        'k': float(model.params['k'][0][0]),
+        'm': float(model.params['m'][0][0]),
+        'sigma_obs': float(model.params['sigma_obs'][0][0]),
+        'delta': [float(value) for value in model.params['delta'][0]],
+        'beta': [float(value) for value in model.params['beta'][0]],
+    }
+
+# ✅ Fit one city (runs inside a pool worker, so no Django access here)
+def fit_city_model(city, history, model_dir=None, init=None):
+    start = time.perf_counter()
+    try:
+        warm_started = False
+        model = Prophet()
+        if init:
+            # Start the optimizer from last run's parameters. If the shapes no
+            # longer line up (e.g. more changepoints now), fit from scratch.
+            try:
+                model.fit(history, init={
+                    name: np.array(value) if isinstance(value, list) else value for name, value in init.items()
+                })
+                warm_started = True
+            except SoftTimeLimitExceeded:
+                raise
+            except Exception:
+                model = Prophet()
+        if not warm_started:
+            model.fit(history)
+        path = model_path(city, model_dir)
+        # Write then rename, so the model cache never sees a half-written file
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(serialize_model(model))
+        os.replace(tmp_path, path)
+        return {
+            'city': city, 'status': 'ok', 'rows': len(history), 'seconds': time.perf_counter() - start,
+            'warm_started': warm_started, 'params': warm_start_params(model),
+            'training_window': [str(history['ds'].min().date()), str(history['ds'].max().date())],
+            'size_bytes': path.stat().st_size,
+        }
+    except SoftTimeLimitExceeded:
+        # Let the task stop at its soft limit instead of moving on to the next city
+        raise
+    except Exception as e:
+        return {'city': city, 'status': 'failed', 'error': repr(e), 'seconds': time.perf_counter() - start}
+
+def train_city_models(histories, workers=None, model_dir=None, inits=None):
+    """
+    Fit every city's model across a process pool of `workers` processes
+    (1 trains inline), warm-starting from `inits[city]` where given. A
+    failing city is reported in the summary and doesn't stop the others.
+    """
+    inits = inits or {}
+    workers = workers or getattr(settings, 'DEMAND_TRAINING_WORKERS', None) or os.cpu_count()
+    workers = max(1, min(workers, len(histories) or 1))
+    if multiprocessing.current_process().daemon:
+        # Celery prefork children are daemonic and can't start a pool of their own;
+        # the nightly task fans cities out as Celery tasks instead, see demand.tasks
+        workers = 1
+    start = time.perf_counter()
+    results = []
+
+    if workers == 1:
+        for city, history in histories.items():
+            print(f"🚀 Training model for: {city}")
+            results.append(fit_city_model(city, history, model_dir, inits.get(city)))
     else:
-        return pd.DataFrame()
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                pool.submit(fit_city_model, city, history, model_dir, inits.get(city)): city
+                for city, history in histories.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except SoftTimeLimitExceeded:
+                    raise
+                except Exception as e:
+                    # The worker process itself died (e.g. out of memory)
+                    results.append({'city': futures[future], 'status': 'failed', 'error': repr(e), 'seconds': None})
+        except BaseException:
+            # e.g. SoftTimeLimitExceeded: drop the fits that haven't started instead of waiting for them
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+    return summarize_fits(results, workers, time.perf_counter() - start)
+
+def summarize_fits(results, workers, seconds):
+    """Print and summarize fit_city_model results, however they were run"""
+    for result in sorted(results, key=lambda result: result['city']):
+        if result['status'] == 'ok':
+            mode = 'warm' if result['warm_started'] else 'cold'
+            print(f"✅ {result['city']}: {result['rows']} days, {result['seconds']:.1f}s ({mode} start)")
+        else:
+            print(f"❌ {result['city']}: {result['error']}")
+
+    return {
+        'workers': workers,
+        'seconds': seconds,
+        'trained': sorted(result['city'] for result in results if result['status'] == 'ok'),
+        'warm_started': sorted(result['city'] for result in results if result.get('warm_started')),
+        'failed': {result['city']: result['error'] for result in results if result['status'] != 'ok'},
+        'results': results,
+    }
 
-    return combined_df
+def history_to_json(history):
+    """A (ds, y) frame as JSON-safe lists, for sending to a fit task"""
+    return {'ds': [str(day.date()) for day in history['ds']], 'y': [float(value) for value in history['y']]}
+
+def history_from_json(data):
+    return pd.DataFrame({'ds': pd.to_datetime(data['ds']), 'y': data['y']})
+
+def remove_city_model(city, manifest):
+    """Delete the city's model files, manifest entry and cached model; True if there was any"""
+    removed = manifest.pop(city, None) is not None
+    for path in (model_path(city), legacy_model_path(city)):
+        if path.exists():
+            path.unlink()
+            removed = True
+    model_cache.evict(city)
+    return removed
 
 # ✅ Train & save models for each city
-def train_and_save_models():
-    df = get_training_data()
+def plan_training(force=False):
+    """
+    What a retrain has to do: the cities short enough for the fast
+    forecaster, the Prophet histories, and which of those changed since
+    the manifest was written (all of them with force=True), with their
+    warm-start parameters. None when there is no data.
+    """
+    series = get_training_data()
 
-    if df.empty:
+    if not series:
         print("❌ No data to train on!")
-        return
-
-    print("✅ Training data loaded:")
-    print(df.head())
-
-    unique_cities = df['city'].dropna().unique()
-    print("📍 Found cities:", unique_cities)
-
-    for city in unique_cities:
-        print(f"\n🚀 Training model for: {city}")
-        city_df = df[df['city'] == city].copy()
-        grouped = city_df.groupby('date')['quantity'].sum().reset_index()
-        grouped.columns = ['ds', 'y']
-
-        print(f"🧪 {len(grouped)} rows in grouped data:")
-        print(grouped.head())
-
-        if len(grouped) >= 2:
-            model = Prophet()
-            model.fit(grouped)
-            filename = f"{city.replace(' ', '_')}.pkl"
-            model_path = MODEL_DIR / filename
-            joblib.dump(model, model_path)
-            print(f"✅ Model saved at: {model_path}")
-        else:
-            print(f"⚠ Not enough data for {city} (need ≥ 2 days, got {len(grouped)})")
+        return None
+
+    min_days = getattr(settings, 'DEMAND_PROPHET_MIN_DAYS', 60)
+    fast_series = {city: data for city, data in series.items() if len(data[0]) < min_days}
+    histories, skipped = city_histories({city: data for city, data in series.items() if city not in fast_series})
+    print("📍 Found cities:", list(histories))
+    if fast_series:
+        print(f"⚡ Fewer than {min_days} days of history, using the fast forecaster: {sorted(fast_series)}")
+    for city, days in skipped.items():
+        print(f"⚠ Not enough data for {city} (need ≥ 2 days, got {days})")
+
+    manifest = read_manifest()
+    fingerprints = {city: fingerprint(history) for city, history in histories.items()}
+    unchanged = sorted(
+        city for city in histories
+        if not force
+        and manifest.get(city, {}).get('fingerprint') == fingerprints[city]
+        and model_path(city).exists()
+    )
+    changed = {city: history for city, history in histories.items() if city not in unchanged}
+    if unchanged:
+        print(f"⏭ Unchanged since last run, skipping: {unchanged}")
+
+    return {
+        'fast_series': fast_series,
+        'changed': changed,
+        'inits': {city: manifest.get(city, {}).get('params') for city in changed},
+        'fingerprints': fingerprints,
+        'unchanged': unchanged,
+        'skipped': skipped,
+    }
+
+def finish_training(summary, fingerprints, unchanged, skipped, fast_series):
+    """
+    Record the fits in `summary` in the manifest, retire the Prophet models
+    of cities now on the fast forecaster and store fresh forecasts.
+    """
+    manifest = read_manifest()
+    for result in summary['results']:
+        if result['status'] == 'ok':
+            manifest[result['city']] = {
+                'file': model_path(result['city']).name,
+                'format': MODEL_FORMAT,
+                'format_version': MODEL_FORMAT_VERSION,
+                'prophet_version': prophet.__version__,
+                'training_window': result['training_window'],
+                'size_bytes': result['size_bytes'],
+                'fingerprint': fingerprints[result['city']],
+                'params': result['params'],
+                'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+            # The compact file replaces any old pickle
+            legacy_model_path(result['city']).unlink(missing_ok=True)
+    # A city that dropped below min_days would otherwise keep serving its old Prophet model
+    retired = sorted(city for city in fast_series if remove_city_model(city, manifest))
+    if retired:
+        print(f"🗑 Removed Prophet models now replaced by the fast forecaster: {retired}")
+    write_manifest(manifest)
+
+    summary['skipped'] = skipped
+    summary['unchanged'] = unchanged
+    summary['fast'] = sorted(fast_series)
+    summary['retired'] = retired
+    print(
+        f"🏁 Trained {len(summary['trained'])} cities in {summary['seconds']:.1f}s "
+        f"with {summary['workers']} workers ({len(summary['warm_started'])} warm-started); "
+        f"{len(unchanged)} unchanged, {len(summary['failed'])} failed, {len(skipped)} skipped, "
+        f"{len(fast_series)} on the fast forecaster"
+    )
+
+    # ✅ Forecasts only change when the models do, so compute them once here
+    refresh_forecasts(summary['trained'])
+    store_fast_forecasts(fast_series)
+    return summary
+
+def train_and_save_models(workers=None, force=False):
+    """
+    Retrain the cities whose data changed since the last run (all of them
+    with force=True) in this process, warm-starting each from its previous
+    parameters. Cities with less than DEMAND_PROPHET_MIN_DAYS of history
+    skip Prophet and are forecast by the vectorized fast forecaster
+    instead. The nightly Celery task runs the same steps with the fits
+    spread over the training workers.
+    """
+    plan = plan_training(force)
+    if plan is None:
+        return None
+
+    with span('demand.train', cities=len(plan['changed'])) as trace:
+        summary = train_city_models(plan['changed'], workers, inits=plan['inits'])
+        if trace:
+            trace.set(workers=summary['workers'], failed=len(summary['failed']), unchanged=len(plan['unchanged']))
+
+    return finish_training(summary, plan['fingerprints'], plan['unchanged'], plan['skipped'], plan['fast_series'])
+
+# ✅ Cache of loaded models
+class ModelCache:
+    """
+    Bounded LRU of loaded Prophet models keyed by city. Each lookup stats
+    the model file, so a retrain that writes a new file is picked up on
+    the next request without any explicit invalidation.
+    """
+
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self._models = OrderedDict()  # city -> (mtime_ns, model)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, city):
+        path = existing_model_path(city)
+        try:
+            if path is None:
+                raise FileNotFoundError(city)
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._models.pop(city, None)
+            return None
+
+        with self._lock:
+            entry = self._models.get(city)
+            if entry and entry[0] == mtime:
+                self._models.move_to_end(city)
+                self.hits += 1
+                metrics.inc('demand_model_cache_total', result='hit')
+                return entry[1]
+            self.misses += 1
+        metrics.inc('demand_model_cache_total', result='stale' if entry else 'miss')
+
+        # Load outside the lock; two threads may both load on a cold miss, which is harmless
+        model = load_model_file(path)
+        with self._lock:
+            self._models[city] = (mtime, model)
+            self._models.move_to_end(city)
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+                self.evictions += 1
+                metrics.inc('demand_model_cache_evictions_total')
+        return model
+
+    def warm(self, cities=None, limit=None):
+        """Preload models, by default for the cities with the most recent demand data"""
+        cities = cities if cities is not None else top_cities(limit or self.max_size)
+        loaded = [city for city in cities[:self.max_size] if self.get(city) is not None]
+        print(f"🔥 Warmed demand model cache: {loaded}")
+        return loaded
+
+    def evict(self, city):
+        with self._lock:
+            self._models.pop(city, None)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        with self._lock:
+            cached = list(self._models)
+        lookups = self.hits + self.misses
+        return {
+            'size': len(cached),
+            'max_size': self.max_size,
+            'cities': cached,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else None,
+        }
+
+def top_cities(limit, days=30):
+    """Cities with a trained model, busiest first by recent demand data points"""
+    from django.db.models import Count
+    from django.utils import timezone
+    from datetime import timedelta
+    from demand.models import DemandDataPoint
+
+    ranked = (
+        DemandDataPoint.objects.filter(date__gte=timezone.localdate() - timedelta(days=days))
+        .values('city').annotate(points=Count('id')).order_by('-points')
+    )
+    return [row['city'] for row in ranked if existing_model_path(row['city'])][:limit]
+
+model_cache = ModelCache(max_size=getattr(settings, 'DEMAND_MODEL_CACHE_SIZE', 16))
 
 # ✅ Load model for prediction
 def load_model(city):
-    path = MODEL_DIR / f"{city}.pkl"
-    if os.path.exists(path):
-        return joblib.load(path)
-    return None
+    return model_cache.get(city)
 
 # ✅ Forecast demand
 def forecast_demand(city, days=7):
-    model = load_model(city)
-    if not model:
+    with span('demand.forecast', city=city, days=days):
+        model = load_model(city)
+        if not model:
+            # No Prophet model (short history or not trained yet): use the fast forecaster
+            return fast_forecast_frame(city, days)
+        # Only the future rows are needed; predicting over the history as well is wasted work
+        future = model.make_future_dataframe(periods=days, include_history=False)
+        forecast = model.predict(future)
+        return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+
+def fast_forecast_frame(city, days):
+    series = get_training_data(cities=[city])
+    if city not in series:
         return []
-    future = model.make_future_dataframe(periods=days)
-    forecast = model.predict(future)
-    return forecast[['ds', 'yhat']].tail(days)
\ No newline at end of file
+    forecast = fast_forecast(series, days)[city]
+    return pd.DataFrame({
+        'ds': pd.to_datetime(forecast['dates']),
+        'yhat': forecast['yhat'],
+        'yhat_lower': forecast['yhat_lower'],
+        'yhat_upper': forecast['yhat_upper'],
+    })
+
+# ✅ Precomputed forecasts
+def store_forecast(city, days):
+    """Replace the stored forecast rows for `city` with a fresh `days`-day forecast"""
+    from django.db import transaction
+    from django.utils import timezone
+    from demand.models import DemandForecast
+
+    forecast = forecast_demand(city, days)
+    if len(forecast) == 0:
+        return 0
+    generated_at = timezone.now()
+    rows = [
+        DemandForecast(
+            city=city, date=row.ds.date(), yhat=row.yhat,
+            yhat_lower=row.yhat_lower, yhat_upper=row.yhat_upper, generated_at=generated_at,
+        )
+        for row in forecast.itertuples(index=False)
+    ]
+    with transaction.atomic():
+        DemandForecast.objects.filter(city=city).delete()
+        DemandForecast.objects.bulk_create(rows)
+    return len(rows)
+
+def store_fast_forecasts(series, days=None):
+    """Forecast every city in `series` in one vectorized pass and store the rows"""
+    from django.db import transaction
+    from django.utils import timezone
+    from demand.models import DemandForecast
+
+    if not series:
+        return {}
+    days = days or getattr(settings, 'DEMAND_FORECAST_HORIZON_DAYS', 30)
+    with span('demand.fast_forecast', cities=len(series)):
+        forecasts = fast_forecast(series, days)
+    generated_at = timezone.now()
+    rows = [
+        DemandForecast(
+            city=city, date=day.item(), yhat=float(yhat),
+            yhat_lower=float(lower), yhat_upper=float(upper), generated_at=generated_at,
+        )
+        for city, forecast in forecasts.items()
+        for day, yhat, lower, upper in zip(
+            forecast['dates'], forecast['yhat'], forecast['yhat_lower'], forecast['yhat_upper']
+        )
+    ]
+    with transaction.atomic():
+        DemandForecast.objects.filter(city__in=list(forecasts)).delete()
+        DemandForecast.objects.bulk_create(rows, batch_size=5000)
+    print(f"⚡ Stored {days}-day fast forecasts for {len(forecasts)} cities")
+    return {city: forecast['method'] for city, forecast in forecasts.items()}
+
+def refresh_forecasts(cities=None, days=None):
+    """Store forecasts for every city with a model, over the maximum served horizon"""
+    days = days or getattr(settings, 'DEMAND_FORECAST_HORIZON_DAYS', 30)
+    if cities is None:
+        cities = trained_cities()
+    stored = {city: store_forecast(city, days) for city in cities}
+    print(f"📈 Stored {days}-day forecasts: {stored}")
+    return stored
+
+def get_forecast(city, days=7):
+    """
+    First `days` stored forecast rows for `city`, computed (and stored) on
+    demand only when the table doesn't cover the request. Returns None
+    when the city has no model.
+    """
+    from demand.models import DemandForecast
+
+    rows = list(DemandForecast.objects.filter(city=city).order_by('date')[:days])
+    if len(rows) < days:
+        metrics.inc('demand_forecast_reads_total', result='miss')
+        if not store_forecast(city, max(days, getattr(settings, 'DEMAND_FORECAST_HORIZON_DAYS', 30))):
+            return None
+        rows = list(DemandForecast.objects.filter(city=city).order_by('date')[:days])
+    else:
+        metrics.inc('demand_forecast_reads_total', result='hit')
+    return rows
+
+def get_forecasts(cities, days=7):
+    """
+    Batch form of get_forecast: the first `days` forecast rows for each
+    city from one query, computing only the cities the table doesn't
+    cover. `cities='all'` means every city with a stored forecast or a
+    model. Returns ({city: [(date, yhat, lower, upper), ...]}, missing cities).
+    """
+    from demand.models import DemandForecast
+
+    if cities == 'all':
+        cities = sorted(set(DemandForecast.objects.values_list('city', flat=True).distinct()) | set(trained_cities()))
+
+    def read(names):
+        found = {}
+        rows = (
+            DemandForecast.objects.filter(city__in=names).order_by('city', 'date')
+            .values_list('city', 'date', 'yhat', 'yhat_lower', 'yhat_upper')
+        )
+        for city, *row in rows.iterator(chunk_size=5000):
+            city_rows = found.setdefault(city, [])
+            if len(city_rows) < days:
+                city_rows.append(tuple(row))
+        return found
+
+    found = read(cities)
+    short = [city for city in cities if len(found.get(city, [])) < days]
+    metrics.inc('demand_forecast_reads_total', len(cities) - len(short), result='hit')
+    if short:
+        metrics.inc('demand_forecast_reads_total', len(short), result='miss')
+        horizon = max(days, getattr(settings, 'DEMAND_FORECAST_HORIZON_DAYS', 30))
+        computed = [city for city in short if store_forecast(city, horizon)]
+        found.update(read(computed))
+    missing = [city for city in cities if city not in found]
+    return {city: found[city] for city in cities if city in found}, missing
\ No newline at end of file
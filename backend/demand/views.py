@@ -1,43 +1,120 @@
 from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from .utils import forecast_demand
+from .utils import get_forecast, get_forecasts
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from .models import DemandDataPoint
-from .serializers import DemandDataPointSerializer 
+from .ingest import IngestError, ingest, FORMATS
+from .serializers import DemandDataPointSerializer, DemandForecastSerializer
+
+def _parse_days(request):
+    try:
+        days = int(request.GET.get('days', 7))
+    except ValueError:
+        return None, Response({'error': 'days must be an integer'}, status=400)
+    if not 1 <= days <= 365:
+        return None, Response({'error': 'days must be between 1 and 365'}, status=400)
+    return days, None
 
 @api_view(['GET'])
 def demand_forecast_api(request):
     city = request.GET.get('city', 'Indore')
-    days = int(request.GET.get('days', 7))
-
-    forecast = forecast_demand(city, days)
+    days, error = _parse_days(request)
+    if error:
+        return error
 
-    # ✅ FIXED check
-    if forecast is None or forecast.empty:
+    # ✅ Indexed read of the precomputed forecast
+    forecast = get_forecast(city, days)
+    if not forecast:
         return Response({'error': 'Model not found or no data available'}, status=404)
 
-    return Response(forecast.to_dict(orient='records'))
-
+    return Response(DemandForecastSerializer(forecast, many=True).data)
 
 @api_view(['GET'])
-def demand_forecast_api(request):
-    city = request.GET.get('city', 'Indore')
-    days = int(request.GET.get('days', 7))
-   
-    forecast = forecast_demand(city, days)
+def demand_forecast_batch_api(request):
+    """
+    Forecasts for many cities in one call: ?cities=Indore,Bhopal (or
+    ?cities=all)&days=7. Columnar payload, one set of arrays per city;
+    cities without data are listed under "missing".
+    """
+    days, error = _parse_days(request)
+    if error:
+        return error
+    cities = request.GET.get('cities', '')
+    if cities.strip().lower() != 'all':
+        cities = list(dict.fromkeys(city.strip() for city in cities.split(',') if city.strip()))
+        if not cities:
+            return Response({'error': 'cities must be a comma-separated list or "all"'}, status=400)
+    else:
+        cities = 'all'
 
-    # ✅ FIXED check
-    if forecast is None or forecast.empty:
-        return Response({'error': 'Model not found or no data available'}, status=404)
+    forecasts, missing = get_forecasts(cities, days)
+    payload = {}
+    for city, rows in forecasts.items():
+        dates, yhat, lower, upper = zip(*rows)
+        payload[city] = {
+            'ds': [day.isoformat() for day in dates],
+            'yhat': [round(value, 2) for value in yhat],
+            'yhat_lower': [round(value, 2) for value in lower],
+            'yhat_upper': [round(value, 2) for value in upper],
+        }
+    return Response({'days': days, 'forecasts': payload, 'missing': missing})
 
-    return Response(forecast.to_dict(orient='records')) 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def submit_demand_data(request):
     serializer = DemandDataPointSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(submitted_by=request.user)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        # One row per city, day and submitter: a resubmission updates it
+        values = dict(serializer.validated_data)
+        point, created = DemandDataPoint.objects.update_or_create(
+            city=values.pop('city'), date=values.pop('date'), submitted_by=request.user, defaults=values,
+        )
+        return Response(
+            DemandDataPointSerializer(point).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+def _upload_format(request, name=''):
+    # Not ?format=, which DRF reserves for picking the response renderer
+    fmt = request.GET.get('input_format', '').lower()
+    if fmt:
+        return fmt
+    if name.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.lower().endswith('.csv'):
+        return 'csv'
+    content_type = request.content_type or ''
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    return 'csv'
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_demand_upload(request):
+    """
+    Upload many data points at once as CSV or NDJSON, either as a multipart
+    "file" or as the raw request body (Content-Type text/csv or
+    application/x-ndjson, or ?input_format=csv|ndjson). Rows are upserted on
+    (city, date, submitter); ?dry_run=1 only validates. If the upload
+    breaks off after the first chunk, the 400 response still carries the
+    report of the rows already written.
+    """
+    upload = request.FILES.get('file') if request.content_type.startswith('multipart/') else None
+    if upload is not None:
+        stream, fmt = upload, _upload_format(request, upload.name)
+    else:
+        stream, fmt = request.stream, _upload_format(request)
+    if stream is None:
+        return Response({'error': 'Send a CSV/NDJSON body or a multipart "file"'}, status=400)
+    if fmt not in FORMATS:
+        return Response({'error': f"input_format must be one of {', '.join(FORMATS)}"}, status=400)
+
+    dry_run = request.GET.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    try:
+        report = ingest(stream, fmt, request.user, dry_run=dry_run)
+    except IngestError as e:
+        return Response({'error': str(e)}, status=400)
+    return Response(report, status=400 if 'error' in report else 200)
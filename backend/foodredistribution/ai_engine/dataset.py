@@ -0,0 +1,162 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from foodredistribution.models import ClaimedDonation, Feedback
+from .training import collect_user_stats, request_from_claim
+
+# Arrays stored per partition, one .npy file each
+COLUMNS = ['features', 'target', 'claim_ids', 'feedback_ids', 'claim_ts', 'feedback_ts']
+
+
+class TrainingDataset:
+    """
+    Append-only columnar store of matching training rows on local disk.
+
+    Each export writes new partitions (one .npy file per column) for
+    feedback newer than the stored high-water mark, so training can scan
+    the data with memory-mapped reads instead of going to the database.
+    Features are rebuilt from each claim rather than read from
+    ClaimedDonation.ml_match_features, which the store no longer uses.
+
+        <root>/manifest.json
+        <root>/part-00001/features.npy  (rows x len(feature_names), float64)
+        <root>/part-00001/target.npy    (rating scaled to 0-1)
+        <root>/part-00001/claim_ids.npy, feedback_ids.npy (int64)
+        <root>/part-00001/claim_ts.npy, feedback_ts.npy   (epoch seconds, int64)
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root or getattr(
+            settings, 'MATCHING_DATASET_DIR', Path(settings.BASE_DIR) / 'ai_engine' / 'dataset'
+        ))
+
+    @property
+    def manifest_path(self):
+        return self.root / 'manifest.json'
+
+    def read_manifest(self):
+        if not self.manifest_path.exists():
+            return {'high_water_mark': 0, 'feature_names': None, 'partitions': []}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def export(self, feature_extractor, partition_rows=50000, chunk_size=2000):
+        """
+        Append rows for every Feedback with an id above the high-water mark.
+        Features are always rebuilt with request_from_claim, exactly as
+        build_training_matrix does, so every row comes from the same source
+        whether or not the claim stored the features it was scored with.
+        Returns the number of rows exported.
+        """
+        feature_names = feature_extractor.feature_names
+        manifest = self.read_manifest()
+        if manifest['feature_names'] not in (None, feature_names):
+            raise ValueError("Feature names changed since the last export; start a new dataset directory")
+        new_feedback = Feedback.objects.filter(id__gt=manifest['high_water_mark'])
+        if not new_feedback.exists():
+            return 0  # skip the user stats aggregate when there is nothing to append
+        manifest['feature_names'] = feature_names
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        feedback_qs = (
+            new_feedback
+            .select_related(
+                'claimed_donation__donation__donor', 'claimed_donation__donation__category',
+                'claimed_donation__donation__location', 'claimed_donation__claimed_by',
+            )
+            .order_by('id')
+            .iterator(chunk_size=chunk_size)
+        )
+
+        donor_stats, requester_stats, _ = collect_user_stats()
+        buffer = {column: [] for column in COLUMNS}
+        exported = 0
+
+        for feedback in feedback_qs:
+            claim = feedback.claimed_donation
+            features = feature_extractor.extract_features(
+                claim.donation,
+                request_from_claim(claim),
+                donor_stats.get(claim.donation.donor_id),
+                requester_stats.get(claim.claimed_by_id),
+            )
+
+            buffer['features'].append([features[name] for name in feature_names])
+            buffer['target'].append((feedback.rating - 1) / 4.0)
+            buffer['claim_ids'].append(claim.id)
+            buffer['feedback_ids'].append(feedback.id)
+            buffer['claim_ts'].append(int(claim.claim_date.timestamp()))
+            buffer['feedback_ts'].append(int(feedback.submitted_at.timestamp()))
+
+            if len(buffer['target']) >= partition_rows:
+                exported += self._write_partition(manifest, buffer)
+                buffer = {column: [] for column in COLUMNS}
+
+        if buffer['target']:
+            exported += self._write_partition(manifest, buffer)
+        return exported
+
+    def _write_partition(self, manifest, buffer):
+        name = f"part-{len(manifest['partitions']) + 1:05d}"
+        partition_dir = self.root / name
+        partition_dir.mkdir(exist_ok=True)
+
+        arrays = {
+            'features': np.asarray(buffer['features'], dtype=np.float64),
+            'target': np.asarray(buffer['target'], dtype=np.float64),
+            'claim_ids': np.asarray(buffer['claim_ids'], dtype=np.int64),
+            'feedback_ids': np.asarray(buffer['feedback_ids'], dtype=np.int64),
+            'claim_ts': np.asarray(buffer['claim_ts'], dtype=np.int64),
+            'feedback_ts': np.asarray(buffer['feedback_ts'], dtype=np.int64),
+        }
+        for column, array in arrays.items():
+            np.save(partition_dir / f"{column}.npy", array)
+
+        # The manifest is only advanced once the partition is fully on disk
+        rows = len(arrays['target'])
+        manifest['partitions'].append({
+            'name': name,
+            'rows': rows,
+            'min_feedback_id': int(arrays['feedback_ids'][0]),
+            'max_feedback_id': int(arrays['feedback_ids'][-1]),
+        })
+        manifest['high_water_mark'] = int(arrays['feedback_ids'][-1])
+        self._write_manifest(manifest)
+
+        ClaimedDonation.objects.filter(id__in=arrays['claim_ids'].tolist()).update(ml_training_flag=True)
+        return rows
+
+    def partitions(self, columns=('features', 'target')):
+        """Yield each partition as a dict of memory-mapped arrays"""
+        for partition in self.read_manifest()['partitions']:
+            partition_dir = self.root / partition['name']
+            yield {
+                column: np.load(partition_dir / f"{column}.npy", mmap_mode='r')
+                for column in columns
+            }
+
+    def load(self):
+        """Return (X, y) for training, filled partition by partition into one array"""
+        manifest = self.read_manifest()
+        n_rows = sum(partition['rows'] for partition in manifest['partitions'])
+        n_features = len(manifest['feature_names'] or [])
+
+        X = np.empty((n_rows, n_features), dtype=np.float64)
+        y = np.empty(n_rows, dtype=np.float64)
+        offset = 0
+        for partition in self.partitions():
+            rows = len(partition['target'])
+            X[offset:offset + rows] = partition['features']
+            y[offset:offset + rows] = partition['target']
+            offset += rows
+        return X, y
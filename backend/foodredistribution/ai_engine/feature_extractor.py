@@ -1,8 +1,37 @@
+import itertools
+import numpy as np
 import pandas as pd
 from geopy.distance import geodesic
 from datetime import datetime, timedelta
 from django.utils import timezone
 import json
+from .instrumentation import metrics
+from foodredistribution.models import Tag
+
+
+def _popcount(words):
+    """Set bits per row of a (rows x words) uint64 array"""
+    if hasattr(np, 'bitwise_count'):  # numpy >= 2.0
+        return np.bitwise_count(words).sum(axis=1)
+    return np.unpackbits(words.view(np.uint8), axis=1).sum(axis=1)
+
+
+def tag_bitsets(id_lists):
+    """
+    Pack lists of tag ids into a (len(id_lists) x words) uint64 bitset
+    matrix, one bit per distinct id. Ids are renumbered densely within the
+    call, so the width follows the number of tags present, not the largest
+    tag id.
+    """
+    lengths = np.fromiter(map(len, id_lists), dtype=np.int64, count=len(id_lists))
+    ids = np.fromiter(itertools.chain.from_iterable(id_lists), dtype=np.int64, count=int(lengths.sum()))
+    ids = np.unique(ids, return_inverse=True)[1].reshape(-1)
+    n_words = int(ids.max()) // 64 + 1 if len(ids) else 1
+    bits = np.zeros((len(id_lists), n_words), dtype=np.uint64)
+    rows = np.repeat(np.arange(len(id_lists)), lengths)
+    np.bitwise_or.at(bits, (rows, ids // 64), np.left_shift(np.uint64(1), (ids % 64).astype(np.uint64)))
+    return bits
+
 
 class FeatureExtractor:
     def __init__(self):
@@ -17,8 +46,12 @@ class FeatureExtractor:
             'tag_similarity'
         ]
     
-    def extract_features(self, donation, request, donor_stats=None, requester_stats=None):
-        """Extract features for donation-request pair"""
+    def extract_features(self, donation, request, donor_stats=None, requester_stats=None, now=None, tag_similarity=None):
+        """
+        Extract features for donation-request pair (as of `now`, default:
+        current time). `tag_similarity` takes a value precomputed with
+        tag_similarities() for a whole candidate list.
+        """
         features = {}
         
         # 1. Distance feature
@@ -31,15 +64,17 @@ class FeatureExtractor:
         features['category_match'] = self._calculate_category_match(donation, request)
         
         # 4. Freshness/urgency
-        features['freshness_score'] = self._calculate_freshness_score(donation)
-        features['time_urgency'] = self._calculate_time_urgency(donation)
+        features['freshness_score'] = self._calculate_freshness_score(donation, now)
+        features['time_urgency'] = self._calculate_time_urgency(donation, now)
         
         # 5. User reliability scores
         features['donor_reliability'] = self._calculate_donor_reliability(donation.donor, donor_stats)
         features['requester_priority'] = self._calculate_requester_priority(request.requester, requester_stats)
         
         # 6. Tag similarity
-        features['tag_similarity'] = self._calculate_tag_similarity(donation, request)
+        if tag_similarity is None:
+            tag_similarity = self._calculate_tag_similarity(donation, request)
+        features['tag_similarity'] = tag_similarity
         
         return features
     
@@ -55,7 +90,8 @@ class FeatureExtractor:
         donor_coords = (float(donation.location.latitude), float(donation.location.longitude))
         requester_coords = (float(request.location.latitude), float(request.location.longitude))
         
-        return geodesic(donor_coords, requester_coords).kilometers
+        with metrics.stage('geodesic', count_queries=False):
+            return geodesic(donor_coords, requester_coords).kilometers
     
     def _calculate_quantity_match(self, donation, request):
         """Score how well quantities match (0-1)"""
@@ -73,12 +109,12 @@ class FeatureExtractor:
             return 1.0 if donation.category == request.category else 0.3
         return 0.5  # Default for missing categories
     
-    def _calculate_freshness_score(self, donation):
+    def _calculate_freshness_score(self, donation, now=None):
         """Calculate freshness based on expiry (0-1)"""
         if not donation.expiry_date:
             return 0.8  # Default good score for no expiry
         
-        now = timezone.now()
+        now = now or timezone.now()
         time_to_expiry = donation.expiry_date - now
         
         if time_to_expiry.total_seconds() <= 0:
@@ -92,12 +128,12 @@ class FeatureExtractor:
         else:
             return 0.3  # Urgent
     
-    def _calculate_time_urgency(self, donation):
+    def _calculate_time_urgency(self, donation, now=None):
         """Higher score for more urgent donations"""
         if not donation.expiry_date:
             return 0.5
         
-        time_to_expiry = donation.expiry_date - timezone.now()
+        time_to_expiry = donation.expiry_date - (now or timezone.now())
         if time_to_expiry.total_seconds() <= 0:
             return 1.0  # Most urgent (expired)
         elif time_to_expiry.total_seconds() <= 6 * 3600:  # 6 hours
@@ -141,16 +177,39 @@ class FeatureExtractor:
     
     def _calculate_tag_similarity(self, donation, request):
         """Calculate similarity between tags"""
-        donation_tags = set(tag.strip().lower() for tag in donation.tags.split(',') if tag.strip())
-        request_tags = set(tag.strip().lower() for tag in request.preferred_tags.split(',') if tag.strip())
-        
-        if not donation_tags and not request_tags:
-            return 0.5  # No tags on either side
-        
-        if not donation_tags or not request_tags:
-            return 0.3  # One side has no tags
-        
-        intersection = donation_tags.intersection(request_tags)
-        union = donation_tags.union(request_tags)
-        
-        return len(intersection) / len(union) if union else 0.0
\ No newline at end of file
+        return float(self.tag_similarities([donation], request)[0])
+
+    def _tag_ids(self, obj, text_field):
+        """(tag ids, count of names outside the vocabulary) for a donation or request"""
+        if getattr(obj, 'pk', None) and hasattr(obj, 'tag_ids'):
+            return obj.tag_ids, 0
+        # Unsaved or stand-in objects only have the text
+        return Tag.resolve(getattr(obj, text_field, ''))
+
+    def tag_similarities(self, donations, request):
+        """
+        Jaccard similarity of the request's preferred tags with every
+        donation's tags in one pass, over popcounts of packed tag-id bitsets.
+        Scores 0.5 when neither side has tags and 0.3 when only one does.
+        """
+        if not donations:
+            return np.zeros(0)
+        request_ids, request_unknown = self._tag_ids(request, 'preferred_tags')
+        # Saved donations carry their ids already; only unsaved ones need a lookup
+        donation_ids = [donation.tag_ids if donation.pk else None for donation in donations]
+        donation_unknown = np.zeros(len(donations), dtype=np.int64)
+        for row in [row for row, ids in enumerate(donation_ids) if ids is None]:
+            donation_ids[row], donation_unknown[row] = self._tag_ids(donations[row], 'tags')
+
+        bits = tag_bitsets([request_ids, *donation_ids])
+        request_bits, donation_bits = bits[:1], bits[1:]
+
+        # Names outside the vocabulary can't be shared, but they still count towards the union
+        donation_counts = _popcount(donation_bits) + donation_unknown
+        request_count = len(request_ids) + request_unknown
+        intersection = _popcount(donation_bits & request_bits)
+        union = donation_counts + request_count - intersection
+
+        similarity = intersection / np.maximum(union, 1)
+        similarity = np.where((donation_counts == 0) | (request_count == 0), 0.3, similarity)
+        return np.where((donation_counts == 0) & (request_count == 0), 0.5, similarity)
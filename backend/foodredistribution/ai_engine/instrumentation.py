@@ -0,0 +1,108 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+class MetricsRegistry:
+    """
+    In-process counters and timers for the matching pipeline, rendered in
+    Prometheus text format. Values are per process, like a default
+    prometheus_client registry; scrape every worker to see the full picture.
+    """
+
+    def __init__(self, prefix='foodredistribution_'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+        self._local = threading.local()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            count, total = self._timers.get(key, (0, 0.0))
+            self._timers[key] = (count + 1, total + seconds)
+
+    @contextmanager
+    def stage(self, name, count_queries=True):
+        """
+        Time a pipeline stage (and count its DB queries) into
+        matching_stage_seconds{stage=name}. Also adds to the breakdown of
+        any surrounding collect() block.
+        """
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            if count_queries:
+                with connection.execute_wrapper(count):
+                    yield
+            else:
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe('matching_stage_seconds', elapsed, stage=name)
+            if queries[0]:
+                self.inc('matching_stage_db_queries_total', queries[0], stage=name)
+
+            breakdown = getattr(self._local, 'breakdown', None)
+            if breakdown is not None:
+                entry = breakdown.setdefault(name, {'seconds': 0.0, 'calls': 0, 'db_queries': 0})
+                entry['seconds'] += elapsed
+                entry['calls'] += 1
+                entry['db_queries'] += queries[0]
+
+    @contextmanager
+    def collect(self):
+        """Yield a dict that fills with per-stage totals for this thread until the block exits"""
+        previous = getattr(self._local, 'breakdown', None)
+        breakdown = {}
+        self._local.breakdown = breakdown
+        try:
+            yield breakdown
+        finally:
+            self._local.breakdown = previous
+
+    def render_prometheus(self):
+        with self._lock:
+            counters = dict(self._counters)
+            timers = dict(self._timers)
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {self.prefix}{name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{self.prefix}{name}{_format_labels(labels)} {value}")
+        for name in sorted({name for name, _ in timers}):
+            lines.append(f"# TYPE {self.prefix}{name} summary")
+            for (metric, labels), (count, total) in sorted(timers.items()):
+                if metric == name:
+                    lines.append(f"{self.prefix}{name}_count{_format_labels(labels)} {count}")
+                    lines.append(f"{self.prefix}{name}_sum{_format_labels(labels)} {total:.6f}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+# Global registry
+metrics = MetricsRegistry()
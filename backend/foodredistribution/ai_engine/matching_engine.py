@@ -1,20 +1,29 @@
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
-import pandas as pd
 import numpy as np
 import pickle
+import json
 import os
+import time
 from django.conf import settings
+from backend.tracing import span, traced
 from .feature_extractor import FeatureExtractor
+from .training import build_training_matrix, request_from_claim
+from .online_learning import OnlineMatchingModel
+from .dataset import TrainingDataset
+from .instrumentation import metrics
 from foodredistribution.models import FoodDonation, FoodRequest, ClaimedDonation, Feedback
 
 class SmartMatchingEngine:
-    def __init__(self):
+    def __init__(self, model_path=None, scaler_path=None):
         self.feature_extractor = FeatureExtractor()
         self.model = None
         self.scaler = StandardScaler()
-        self.model_path = os.path.join(settings.BASE_DIR, 'ai_engine', 'models', 'matching_model.pkl')
-        self.scaler_path = os.path.join(settings.BASE_DIR, 'ai_engine', 'models', 'scaler.pkl')
+        self.last_training_timings = {}
+        self.model_path = model_path or os.path.join(settings.BASE_DIR, 'ai_engine', 'models', 'matching_model.pkl')
+        self.scaler_path = scaler_path or os.path.join(settings.BASE_DIR, 'ai_engine', 'models', 'scaler.pkl')
+        self.params_path = os.path.join(settings.BASE_DIR, 'ai_engine', 'models', 'matching_model_params.json')
+        self.online_model = OnlineMatchingModel()
         self._load_or_initialize_model()
     
     def _load_or_initialize_model(self):
@@ -33,47 +42,79 @@ class SmartMatchingEngine:
             self._initialize_model()
     
     def _initialize_model(self):
-        """Initialize new model with default parameters"""
-        self.model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42,
-            min_samples_split=5,
-            min_samples_leaf=2
-        )
+        """Initialize new model with default parameters, or the promoted tuning result"""
+        params = {
+            'n_estimators': 100,
+            'max_depth': 10,
+            'random_state': 42,
+            'min_samples_split': 5,
+            'min_samples_leaf': 2,
+            'n_jobs': 1
+        }
+        if os.path.exists(self.params_path):
+            with open(self.params_path) as f:
+                params.update(json.load(f))
+        self.model = RandomForestRegressor(**params)
         print("Initialized new matching model")
+
+    def promote_params(self, params, source='store'):
+        """Save tuned hyperparameters as the default and retrain the model with them"""
+        os.makedirs(os.path.dirname(self.params_path), exist_ok=True)
+        with open(self.params_path, 'w') as f:
+            json.dump(params, f, indent=2)
+        self._initialize_model()
+        return self.train_model_from_feedback(source=source)
     
-    def find_best_donations(self, request, top_k=3):
-        """Find best matching donations for a request - NEW METHOD"""
-        # Get all available (pending) donations
-        available_donations = FoodDonation.objects.filter(status='pending')
-        
-        if not available_donations.exists():
-            return []
-        
-        matches = []
-        
-        for donation in available_donations:
-            # Extract features
-            features = self.feature_extractor.extract_features(
-                donation, request,
-                self._get_donor_stats(donation.donor),
-                self._get_requester_stats(request.requester)
-            )
-            
-            # Calculate match score
-            match_score = self._calculate_match_score(features)
-            
-            matches.append({
-                'donation': donation,
-                'score': match_score,
-                'features': features,
-                'distance_km': features['distance_km']
-            })
-        
-        # Sort by score (higher is better) and return top k
-        matches.sort(key=lambda x: x['score'], reverse=True)
-        return matches[:top_k]
+    def find_best_donations(self, request, top_k=3, candidates=None, now=None):
+        """
+        Find best matching donations for a request. `candidates` overrides the
+        pending-donation queryset and `now` the scoring time (used by replay);
+        top_k=None returns the full ranking.
+        """
+        metrics.inc('matching_calls_total')
+        with span('matching.find_best_donations', request_id=getattr(request, 'id', None)), \
+                metrics.stage('find_best_donations'):
+            # Get all available (pending) donations
+            with metrics.stage('candidate_query'):
+                available_donations = candidates if candidates is not None else FoodDonation.objects.filter(status='pending')
+                available_donations = list(available_donations)
+
+            if not available_donations:
+                return []
+            metrics.inc('matching_candidates_total', len(available_donations))
+
+            matches = []
+
+            # Tag overlap with every candidate at once, from the precomputed tag ids
+            with metrics.stage('tag_similarity'):
+                tag_similarities = self.feature_extractor.tag_similarities(available_donations, request)
+
+            for donation, tag_similarity in zip(available_donations, tag_similarities):
+                with metrics.stage('stats'):
+                    donor_stats = self._get_donor_stats(donation.donor)
+                    requester_stats = self._get_requester_stats(request.requester)
+
+                # Extract features
+                with metrics.stage('feature_extraction', count_queries=False):
+                    features = self.feature_extractor.extract_features(
+                        donation, request, donor_stats, requester_stats, now=now,
+                        tag_similarity=float(tag_similarity),
+                    )
+
+                # Calculate match score
+                with metrics.stage('scoring', count_queries=False):
+                    match_score = self._calculate_match_score(features)
+
+                matches.append({
+                    'donation': donation,
+                    'score': match_score,
+                    'features': features,
+                    'distance_km': features['distance_km']
+                })
+
+            # Sort by score (higher is better) and return top k
+            matches.sort(key=lambda x: x['score'], reverse=True)
+            return matches[:top_k]
     
     def _calculate_match_score(self, features):
         """Calculate match score using ML model or rule-based approach"""
@@ -81,18 +122,29 @@ class SmartMatchingEngine:
             # Prepare features for model
             feature_vector = [features[name] for name in self.feature_extractor.feature_names]
             feature_array = np.array(feature_vector).reshape(1, -1)
+
+            # Online mode: use the incrementally trained model once it has seen feedback
+            if self.online_model.enabled:
+                self.online_model.refresh()
+                if self.online_model.is_fitted:
+                    score = self.online_model.predict(feature_array)[0]
+                    metrics.inc('matching_scores_total', model='online')
+                    return max(0, min(1, score))
             
             # Use ML model if trained
-            if hasattr(self.model, 'predict') and len(self.scaler.scale_) > 0:
+            if hasattr(self.model, 'predict') and hasattr(self.scaler, 'scale_'):
                 scaled_features = self.scaler.transform(feature_array)
                 score = self.model.predict(scaled_features)[0]
+                metrics.inc('matching_scores_total', model='batch')
                 return max(0, min(1, score))  # Clamp between 0 and 1
             else:
                 # Fallback to rule-based scoring
+                metrics.inc('matching_fallback_total', reason='untrained')
                 return self._rule_based_scoring(features)
         
         except Exception as e:
             print(f"Error in ML prediction: {e}")
+            metrics.inc('matching_fallback_total', reason='error')
             return self._rule_based_scoring(features)
     
     def _rule_based_scoring(self, features):
@@ -148,74 +200,84 @@ class SmartMatchingEngine:
             'successful_requests': successful_requests
         }
     
-    def train_model_from_feedback(self):
-        """Train/retrain model using feedback data"""
-        print("Training matching model from feedback data...")
-        
-        # Collect training data
-        training_data = []
-        claimed_donations = ClaimedDonation.objects.filter(
-            feedback__isnull=False
-        ).select_related('donation', 'claimed_by', 'feedback')
-        
-        if claimed_donations.count() < 10:
+    @traced('matching.train')
+    def train_model_from_feedback(self, source='db'):
+        """
+        Train/retrain model using feedback data, read either from the
+        database ('db') or from the exported training dataset ('store')
+        """
+        print(f"Training matching model from feedback data ({source})...")
+
+        if source == 'store':
+            dataset = TrainingDataset()
+            if dataset.read_manifest()['feature_names'] not in (None, self.feature_extractor.feature_names):
+                print("Exported dataset was built with different features; re-export it")
+                return False
+            start = time.perf_counter()
+            X, y = dataset.load()
+            timings = {'load': time.perf_counter() - start}
+        else:
+            X, y, timings = build_training_matrix(self.feature_extractor)
+
+        if len(y) < 10:
             print("Not enough feedback data for training (minimum 10 required)")
+            metrics.inc('matching_training_runs_total', result='insufficient_data')
             return False
-        
-        for claim in claimed_donations:
-            # Create a dummy request based on the claim
-            features = self.feature_extractor.extract_features(
-                claim.donation,
-                self._create_dummy_request_from_claim(claim),
-                self._get_donor_stats(claim.donation.donor),
-                self._get_requester_stats(claim.claimed_by)
-            )
-            
-            # Use feedback rating as target (normalize to 0-1)
-            target_score = (claim.feedback.rating - 1) / 4.0  # 1-5 scale to 0-1
-            
-            feature_vector = [features[name] for name in self.feature_extractor.feature_names]
-            training_data.append(feature_vector + [target_score])
-        
-        if len(training_data) < 10:
-            print("Insufficient training data after processing")
-            return False
-        
-        # Convert to DataFrame
-        columns = self.feature_extractor.feature_names + ['target']
-        df = pd.DataFrame(training_data, columns=columns)
-        
-        # Prepare features and targets
-        X = df[self.feature_extractor.feature_names].values
-        y = df['target'].values
-        
+
         # Scale features
+        start = time.perf_counter()
         X_scaled = self.scaler.fit_transform(X)
-        
-        # Train model
+        timings['scale'] = time.perf_counter() - start
+
+        # Train model on every core, then go back to one job so single-row
+        # predictions on the request path don't pay thread start-up costs
+        start = time.perf_counter()
+        self.model.set_params(n_jobs=-1)
         self.model.fit(X_scaled, y)
-        
+        self.model.set_params(n_jobs=1)
+        timings['fit'] = time.perf_counter() - start
+
         # Save model
+        start = time.perf_counter()
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
         with open(self.model_path, 'wb') as f:
             pickle.dump(self.model, f)
         with open(self.scaler_path, 'wb') as f:
             pickle.dump(self.scaler, f)
-        
-        print(f"Model trained successfully with {len(training_data)} samples")
+        timings['save'] = time.perf_counter() - start
+
+        # Restart the online model from the same batch so it doesn't drift for ever
+        if self.online_model.enabled:
+            self.online_model.fit_full(X, y)
+
+        self.last_training_timings = timings
+        for phase, seconds in timings.items():
+            metrics.observe('matching_training_phase_seconds', seconds, phase=phase)
+        metrics.inc('matching_training_runs_total', result='success')
+        metrics.inc('matching_training_rows_total', len(y))
+        print(f"Model trained successfully with {len(y)} samples")
+        print("Training phase timings: " + ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in timings.items()))
         return True
-    
-    def _create_dummy_request_from_claim(self, claim):
-        """Create a dummy request object from claimed donation for training"""
-        class DummyRequest:
-            def __init__(self, claim):
-                self.requester = claim.claimed_by
-                self.category = claim.donation.category
-                self.quantity = claim.donation.quantity  # Assume they wanted similar quantity
-                self.location = None  # We'll use distance from claim if available
-                self.preferred_tags = ""
-        
-        return DummyRequest(claim)
+
+    def learn_from_feedback(self, feedback):
+        """
+        Update the online model with a single new Feedback. Features are
+        rebuilt with request_from_claim, as build_training_matrix does for
+        fit_full, rather than taken from claim.ml_match_features, so online
+        updates and full refits learn from the same feature distribution.
+        """
+        claim = feedback.claimed_donation
+        features = self.feature_extractor.extract_features(
+            claim.donation,
+            request_from_claim(claim),
+            self._get_donor_stats(claim.donation.donor),
+            self._get_requester_stats(claim.claimed_by)
+        )
+
+        feature_vector = [features[name] for name in self.feature_extractor.feature_names]
+        target_score = (feedback.rating - 1) / 4.0  # 1-5 scale to 0-1
+        self.online_model.partial_fit(feature_vector, target_score)
+        return self.online_model.n_updates
 
 # Global instance
 matching_engine = SmartMatchingEngine()
\ No newline at end of file
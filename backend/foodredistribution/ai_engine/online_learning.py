@@ -0,0 +1,136 @@
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import StandardScaler
+
+
+class OnlineMatchingModel:
+    """
+    Matching model that learns from one Feedback at a time.
+
+    An SGDRegressor and StandardScaler are updated with partial_fit on the
+    same feature vector as the batch model, and checkpointed to disk every
+    `checkpoint_every` updates or `checkpoint_seconds` seconds. Web
+    processes pick up new checkpoints through refresh(), and the learner
+    reloads before each update so a full refit from the training worker is
+    not overwritten by its own stale copy. Predictions are only used once
+    the model has seen `min_updates` examples.
+
+    Updates should be consumed by a single worker process; concurrent
+    learners would overwrite each other's checkpoints.
+    """
+
+    def __init__(self, path=None, checkpoint_every=None, checkpoint_seconds=None):
+        self.path = path or os.path.join(settings.BASE_DIR, 'ai_engine', 'models', 'online_model.pkl')
+        self.checkpoint_every = checkpoint_every or getattr(settings, 'ONLINE_MODEL_CHECKPOINT_EVERY', 10)
+        self.checkpoint_seconds = checkpoint_seconds or getattr(settings, 'ONLINE_MODEL_CHECKPOINT_SECONDS', 60)
+        self.refresh_seconds = getattr(settings, 'ONLINE_MODEL_REFRESH_SECONDS', 30)
+        self.min_updates = getattr(settings, 'ONLINE_MODEL_MIN_UPDATES', 50)
+        self.disabled = False  # set per engine, e.g. to replay without the online model
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._last_refresh_check = 0.0
+        self._reset()
+        self.load()
+
+    @property
+    def enabled(self):
+        return not self.disabled and getattr(settings, 'MATCHING_MODEL_MODE', 'batch') == 'online'
+
+    @property
+    def is_fitted(self):
+        return self.n_updates >= self.min_updates
+
+    def _reset(self):
+        self.model = SGDRegressor(
+            loss='squared_error',
+            penalty='l2',
+            alpha=1e-4,
+            learning_rate='invscaling',
+            eta0=0.01,
+            random_state=42,
+        )
+        self.scaler = StandardScaler()
+        self.n_updates = 0
+        self._pending_updates = 0
+        self._last_checkpoint = time.monotonic()
+
+    def partial_fit(self, feature_vector, target):
+        """Learn from one labelled example and checkpoint when due"""
+        x = np.asarray(feature_vector, dtype=np.float64).reshape(1, -1)
+        self.refresh(force=True)
+        with self._lock:
+            self.scaler.partial_fit(x)
+            self.model.partial_fit(self.scaler.transform(x), [target])
+            self.n_updates += 1
+            self._pending_updates += 1
+            due = (
+                self._pending_updates >= self.checkpoint_every
+                or time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds
+            )
+        if due:
+            self.save()
+
+    def fit_full(self, X, y):
+        """Restart from a full batch (used by the slow scheduled retrain)"""
+        with self._lock:
+            self._reset()
+            self.scaler.fit(X)
+            self.model.fit(self.scaler.transform(X), y)
+            self.n_updates = len(y)
+        self.save()
+
+    def predict(self, feature_array):
+        with self._lock:
+            return self.model.predict(self.scaler.transform(feature_array))
+
+    def save(self):
+        """Atomically write a checkpoint"""
+        with self._lock:
+            state = {'model': self.model, 'scaler': self.scaler, 'n_updates': self.n_updates}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f)
+            os.replace(tmp_path, self.path)
+            self._loaded_mtime = os.path.getmtime(self.path)
+            self._pending_updates = 0
+            self._last_checkpoint = time.monotonic()
+
+    def load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False
+        with self._lock:
+            self.model = state['model']
+            self.scaler = state['scaler']
+            self.n_updates = state['n_updates']
+            self._pending_updates = 0
+            self._loaded_mtime = mtime
+        return True
+
+    def refresh(self, force=False):
+        """
+        Reload if another process wrote a newer checkpoint (checked at most
+        every refresh_seconds). With `force` the check is not throttled and
+        a newer checkpoint replaces any updates not yet saved.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_refresh_check < self.refresh_seconds:
+            return False
+        self._last_refresh_check = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime != self._loaded_mtime and (force or not self._pending_updates):
+            return self.load()
+        return False
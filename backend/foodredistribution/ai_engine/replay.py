@@ -0,0 +1,129 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from foodredistribution.models import ClaimedDonation, FoodDonation, FoodRequest
+
+
+def build_replay_cases(since=None, until=None, limit=None):
+    """
+    Reconstruct one match query per historical claim.
+
+    The query is the claimer's latest FoodRequest made before the claim (or
+    a stand-in built from the claimed donation if they never filed one) and
+    the moment is the claim time. The actually-claimed donation and its
+    feedback rating, if any, are the ground truth.
+    """
+    claims = ClaimedDonation.objects.select_related(
+        'donation__category', 'claimed_by', 'feedback'
+    ).order_by('claim_date')
+    if since:
+        claims = claims.filter(claim_date__gte=since)
+    if until:
+        claims = claims.filter(claim_date__lt=until)
+    if limit:
+        claims = claims[:limit]
+
+    cases = []
+    for claim in claims:
+        request = (
+            FoodRequest.objects
+            .select_related('requester', 'category', 'location')
+            .filter(requester=claim.claimed_by, request_date__lte=claim.claim_date)
+            .order_by('-request_date')
+            .first()
+        )
+        if request is None:
+            request = SimpleNamespace(
+                requester=claim.claimed_by,
+                category=claim.donation.category,
+                quantity=claim.donation.quantity,
+                location=None,
+                preferred_tags='',
+            )
+
+        feedback = getattr(claim, 'feedback', None)
+        cases.append({
+            'claim_id': claim.id,
+            'moment': claim.claim_date,
+            'request': request,
+            'claimed_donation_id': claim.donation_id,
+            'rating': feedback.rating if feedback else None,
+        })
+    return cases
+
+
+def candidates_at(moment):
+    """
+    Donations that were open at `moment`: already posted, not expired and
+    not claimed earlier. Status history isn't stored, so donations that
+    are cancelled now are left out.
+    """
+    return (
+        FoodDonation.objects
+        .filter(donation_date__lte=moment)
+        .filter(Q(expiry_date__isnull=True) | Q(expiry_date__gt=moment))
+        .exclude(status='cancelled')
+        .exclude(claims__claim_date__lt=moment)
+        .select_related('category', 'location', 'donor')
+    )
+
+
+def replay(engine, cases, top_k=3):
+    """
+    Run every case through engine.find_best_donations and report
+    throughput, latency percentiles, DB queries per call and ranking
+    quality against what was actually claimed (hit@k, MRR) and how it was
+    rated (share of total rating mass recovered in the top k).
+    """
+    latencies = []
+    query_counts = []
+    reciprocal_ranks = []
+    hits = 0
+    rated_total = 0.0
+    rated_hit = 0.0
+
+    started = time.perf_counter()
+    for case in cases:
+        candidates = candidates_at(case['moment'])
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            ranking = engine.find_best_donations(case['request'], top_k=None, candidates=candidates, now=case['moment'])
+            latencies.append(time.perf_counter() - start)
+        query_counts.append(len(queries))
+
+        ranked_ids = [match['donation'].id for match in ranking]
+        rank = ranked_ids.index(case['claimed_donation_id']) + 1 if case['claimed_donation_id'] in ranked_ids else None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        hit = rank is not None and rank <= top_k
+        hits += hit
+
+        if case['rating'] is not None:
+            weight = (case['rating'] - 1) / 4.0
+            rated_total += weight
+            rated_hit += weight if hit else 0.0
+    elapsed = time.perf_counter() - started
+
+    if not cases:
+        return {'cases': 0}
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'cases': len(cases),
+        'top_k': top_k,
+        'queries_per_sec': len(cases) / elapsed if elapsed else None,
+        'latency_ms': {
+            'p50': float(np.percentile(latencies_ms, 50)),
+            'p95': float(np.percentile(latencies_ms, 95)),
+            'p99': float(np.percentile(latencies_ms, 99)),
+            'max': float(latencies_ms.max()),
+        },
+        'db_queries_per_call': float(np.mean(query_counts)),
+        f'hit_rate_at_{top_k}': hits / len(cases),
+        'mrr': float(np.mean(reciprocal_ranks)),
+        f'rating_weighted_hit_rate_at_{top_k}': rated_hit / rated_total if rated_total else None,
+    }
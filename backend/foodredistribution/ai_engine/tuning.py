@@ -0,0 +1,111 @@
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import KFold, cross_val_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+DEFAULT_GRID = {
+    'n_estimators': [10, 20, 50, 100],
+    'max_depth': [5, 10, None],
+    'min_samples_leaf': [1, 2, 5],
+}
+
+# Set per worker process by _init_worker so the data is pickled once per process
+_X = None
+_y = None
+
+
+def _init_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+
+
+def candidate_grid(grid=None):
+    grid = grid or DEFAULT_GRID
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def build_model(params):
+    """RandomForest with the engine's fixed defaults plus the tuned params"""
+    options = {'random_state': 42, 'min_samples_split': 5, 'n_jobs': 1}
+    options.update(params)
+    return RandomForestRegressor(**options)
+
+
+def evaluate_candidate(params, folds=5, latency_rows=200, batch_rows=1000):
+    """
+    Cross-validated MAE for one configuration, plus inference latency of a
+    model fitted on all rows: median single-row predict time and the time
+    to score `batch_rows` rows in one call.
+    """
+    X, y = _X, _y
+    pipeline = make_pipeline(StandardScaler(), build_model(params))
+    cv = KFold(n_splits=folds, shuffle=True, random_state=42)
+
+    start = time.perf_counter()
+    scores = cross_val_score(pipeline, X, y, cv=cv, scoring='neg_mean_absolute_error')
+    cv_seconds = time.perf_counter() - start
+
+    pipeline.fit(X, y)
+    scaler, model = pipeline[0], pipeline[1]
+
+    # Time the model the way the engine calls it: scale then predict one row
+    sample = X[np.random.RandomState(0).randint(0, len(X), size=min(latency_rows, len(X)))]
+    row_times = []
+    for row in sample:
+        row = row.reshape(1, -1)
+        start = time.perf_counter()
+        model.predict(scaler.transform(row))
+        row_times.append(time.perf_counter() - start)
+
+    batch = np.resize(X, (batch_rows, X.shape[1]))
+    start = time.perf_counter()
+    model.predict(scaler.transform(batch))
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'params': params,
+        'mae': float(-scores.mean()),
+        'mae_std': float(scores.std()),
+        'cv_seconds': cv_seconds,
+        'row_latency_ms': float(np.median(row_times) * 1000),
+        'batch_latency_ms': batch_seconds * 1000,
+        'batch_rows': batch_rows,
+    }
+
+
+def run_search(X, y, grid=None, folds=5, workers=None):
+    """Evaluate every candidate in a process pool; results are sorted by MAE"""
+    candidates = candidate_grid(grid)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as pool:
+        results = list(pool.map(evaluate_candidate, candidates, itertools.repeat(folds)))
+
+    results.sort(key=lambda result: result['mae'])
+    for candidate_id, result in enumerate(results):
+        result['id'] = candidate_id
+    mark_pareto_front(results)
+    return results
+
+
+def mark_pareto_front(results):
+    """Flag candidates no other candidate beats on both MAE and row latency"""
+    for result in results:
+        result['pareto'] = not any(
+            other['mae'] <= result['mae']
+            and other['row_latency_ms'] <= result['row_latency_ms']
+            and (other['mae'] < result['mae'] or other['row_latency_ms'] < result['row_latency_ms'])
+            for other in results
+        )
+    return [result for result in results if result['pareto']]
+
+
+def pick_fastest_within(results, tolerance):
+    """Cheapest Pareto candidate whose MAE is within `tolerance` of the best"""
+    best_mae = min(result['mae'] for result in results)
+    eligible = [r for r in results if r['pareto'] and r['mae'] <= best_mae + tolerance]
+    return min(eligible, key=lambda result: result['row_latency_ms'])
@@ -0,0 +1,127 @@
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Audit tables that may be moved to cold storage, keyed by a short name
+ARCHIVABLE_MODELS = {
+    'aiauditlog': 'foodredistribution.AIAuditLog',
+    'donationlog': 'foodredistribution.DonationLog',
+}
+
+
+def get_archive_dir():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'audit_archive'))
+
+
+def archive_old_rows(name, days, batch_size=1000, dry_run=False):
+    """
+    Move rows older than `days` days from an audit table into gzip JSONL
+    files partitioned by month, deleting them in batches of `batch_size`.
+
+    Each batch is written and fsynced before its rows are deleted, so an
+    interrupted run never loses data; at worst a batch is archived twice.
+    """
+    model = apps.get_model(ARCHIVABLE_MODELS[name])
+    cutoff = timezone.now() - timedelta(days=days)
+    old_rows = model.objects.filter(timestamp__lt=cutoff).order_by('pk')
+
+    if dry_run:
+        return {'archived': old_rows.count(), 'files': []}
+
+    archived = 0
+    files = []
+    while True:
+        pks = list(old_rows.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+
+        by_month = {}
+        for row in model.objects.filter(pk__in=pks).order_by('pk').values():
+            by_month.setdefault(row['timestamp'].strftime('%Y-%m'), []).append(row)
+
+        for month, rows in by_month.items():
+            files.append(_write_partition(name, month, rows))
+
+        model.objects.filter(pk__in=pks).delete()
+        archived += len(pks)
+
+    return {'archived': archived, 'files': files}
+
+
+def _write_partition(name, month, rows):
+    partition_dir = get_archive_dir() / name / month
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    path = partition_dir / f"part-{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz"
+
+    tmp_path = path.with_suffix('.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return str(path)
+
+
+def read_archive(name, start=None, end=None, **filters):
+    """
+    Yield archived rows of an audit table between `start` and `end`
+    (dates or datetimes, inclusive start / exclusive end), optionally
+    matching exact field values, e.g. read_archive('aiauditlog', action='donation_claimed').
+
+    Only month partitions overlapping the range are opened.
+    """
+    start = _as_datetime(start)
+    end = _as_datetime(end)
+    table_dir = get_archive_dir() / name
+    if not table_dir.exists():
+        return
+
+    for partition_dir in sorted(p for p in table_dir.iterdir() if p.is_dir()):
+        if not _month_overlaps(partition_dir.name, start, end):
+            continue
+        for path in sorted(partition_dir.glob('part-*.jsonl.gz')):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    row = json.loads(line)
+                    timestamp = parse_datetime(row['timestamp'])
+                    if start and timestamp < start:
+                        continue
+                    if end and timestamp >= end:
+                        continue
+                    if any(str(row.get(key)) != str(value) for key, value in filters.items()):
+                        continue
+                    yield row
+
+
+def _as_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        pass
+    elif isinstance(value, date):
+        value = datetime(value.year, value.month, value.day)
+    else:
+        value = parse_datetime(value) or datetime.fromisoformat(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _month_overlaps(month, start, end):
+    year, mon = (int(part) for part in month.split('-'))
+    month_start = datetime(year, mon, 1, tzinfo=dt_timezone.utc)
+    month_end = datetime(year + mon // 12, mon % 12 + 1, 1, tzinfo=dt_timezone.utc)
+    if start and month_end <= start:
+        return False
+    if end and month_start >= end:
+        return False
+    return True
@@ -0,0 +1,133 @@
+import atexit
+import logging
+import threading
+import time
+
+from celery.signals import worker_process_shutdown
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedAuditWriter:
+    """
+    Collects audit rows in-process and writes them with one bulk_create
+    when the buffer reaches `max_size` rows or `max_age` seconds.
+
+    Rows are plain dicts of model field values (use `<fk>_id` keys for
+    relations) so they can also be shipped to a Celery task unchanged.
+    """
+
+    def __init__(self, model_label, max_size=None, max_age=None, backend=None):
+        self.model_label = model_label
+        self.max_size = max_size or getattr(settings, 'AUDIT_BUFFER_MAX_SIZE', 50)
+        self.max_age = max_age or getattr(settings, 'AUDIT_BUFFER_MAX_AGE', 5.0)
+        self.backend = backend or getattr(settings, 'AUDIT_BUFFER_BACKEND', 'local')
+        self._rows = []
+        self._first_added = None
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def add(self, **fields):
+        """Queue one audit row; flushes when a size or time threshold is hit"""
+        fields.setdefault('timestamp', timezone.now())
+        with self._lock:
+            self._rows.append(fields)
+            if self._first_added is None:
+                self._first_added = time.monotonic()
+                self._schedule_timer()
+            due = (
+                len(self._rows) >= self.max_size
+                or time.monotonic() - self._first_added >= self.max_age
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered row; returns the number of rows flushed"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._first_added = None
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+        if not rows:
+            return 0
+
+        try:
+            if self.backend == 'celery':
+                from .tasks import write_audit_records_task
+                write_audit_records_task.delay(self.model_label, _to_json_rows(rows))
+            else:
+                write_audit_records(self.model_label, rows)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(rows)} {self.model_label} rows: {e}")
+        return len(rows)
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # Each timer is a fresh thread; nothing else would close the connection it opened
+            connections.close_all()
+
+    def _schedule_timer(self):
+        # Make sure a quiet process still flushes within max_age
+        self._timer = threading.Timer(self.max_age, self._flush_on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+
+def write_audit_records(model_label, rows):
+    """
+    Insert audit rows for the given model in a single bulk_create. If the
+    batch fails, rows are retried one at a time so only the bad ones are
+    dropped. Returns the number of rows written.
+    """
+    model = apps.get_model(model_label)
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create([model(**row) for row in rows], batch_size=500)
+        return len(rows)
+    except Exception as e:
+        logger.warning(f"Bulk insert of {len(rows)} {model_label} rows failed, retrying row by row: {e}")
+
+    written = 0
+    for row in rows:
+        try:
+            with transaction.atomic():
+                model.objects.create(**row)
+            written += 1
+        except Exception as e:
+            logger.error(f"Dropped {model_label} row {row!r}: {e}")
+    return written
+
+
+def _to_json_rows(rows):
+    """Make timestamps JSON-safe for the Celery serializer"""
+    json_rows = []
+    for row in rows:
+        row = dict(row)
+        if hasattr(row.get('timestamp'), 'isoformat'):
+            row['timestamp'] = row['timestamp'].isoformat()
+        json_rows.append(row)
+    return json_rows
+
+
+# Shared writer for the AI audit table
+ai_audit_log = BufferedAuditWriter('foodredistribution.AIAuditLog')
+
+
+@worker_process_shutdown.connect
+def flush_all(**kwargs):
+    """Drain every writer; also runs when a Celery worker process exits"""
+    ai_audit_log.flush()
@@ -0,0 +1,175 @@
+import os
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .models import CustomUser, FoodDonation, FoodRequest
+
+
+def measure(fn, repeat=5, warmup=1):
+    """Time `fn` over `repeat` runs after `warmup` runs; DB queries are counted on the last run"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        queries = len(captured)
+    times_ms = np.array(times) * 1000
+    return {
+        'repeat': repeat,
+        'min_ms': float(times_ms.min()),
+        'mean_ms': float(times_ms.mean()),
+        'p50_ms': float(np.percentile(times_ms, 50)),
+        'p95_ms': float(np.percentile(times_ms, 95)),
+        'db_queries': queries,
+    }
+
+
+def bench_find_best_donations(repeat):
+    from .ai_engine.matching_engine import matching_engine
+
+    requests = list(FoodRequest.objects.select_related('requester', 'category', 'location')[:5])
+    if not requests:
+        return {'skipped': 'no food requests'}
+
+    def run():
+        for request in requests:
+            matching_engine.find_best_donations(request, top_k=3)
+
+    result = measure(run, repeat)
+    result['calls_per_run'] = len(requests)
+    result['candidates'] = FoodDonation.objects.filter(status='pending').count()
+    return result
+
+
+def bench_extract_features(repeat, pairs=1000):
+    from .ai_engine.matching_engine import matching_engine
+
+    donations = list(FoodDonation.objects.select_related('donor', 'category', 'location')[:pairs])
+    requests = list(FoodRequest.objects.select_related('requester', 'category', 'location')[:pairs])
+    if not donations or not requests:
+        return {'skipped': 'no donations or requests'}
+    pairs = [(donations[i % len(donations)], requests[i % len(requests)]) for i in range(pairs)]
+    extractor = matching_engine.feature_extractor
+    stats = {'total_donations': 10, 'successful_donations': 7}
+
+    def run():
+        for donation, request in pairs:
+            extractor.extract_features(donation, request, stats, stats)
+
+    result = measure(run, repeat)
+    result['pairs_per_run'] = len(pairs)
+    result['us_per_pair'] = result['p50_ms'] * 1000 / len(pairs)
+    return result
+
+
+def bench_train_model_from_feedback(repeat):
+    from .ai_engine.matching_engine import SmartMatchingEngine
+    from .ai_engine.online_learning import OnlineMatchingModel
+
+    # Train into a scratch directory so the live model is untouched
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = SmartMatchingEngine(
+            model_path=os.path.join(tmp, 'model.pkl'),
+            scaler_path=os.path.join(tmp, 'scaler.pkl'),
+        )
+        engine.online_model = OnlineMatchingModel(path=os.path.join(tmp, 'online.pkl'))
+        result = measure(engine.train_model_from_feedback, repeat, warmup=0)
+        result['phases'] = engine.last_training_timings
+    return result
+
+
+def bench_forecast_demand(repeat):
+    from demand.utils import forecast_demand, trained_cities
+
+    cities = trained_cities()
+    if not cities:
+        return {'skipped': 'no trained demand models'}
+
+    def run():
+        for city in cities:
+            forecast_demand(city, 7)
+
+    result = measure(run, repeat)
+    result['cities'] = cities
+    return result
+
+
+def bench_list_endpoints(repeat):
+    from rest_framework.test import APIClient
+
+    user = CustomUser.objects.first()
+    if not user:
+        return {'skipped': 'no users'}
+    client = APIClient(raise_request_exception=False)
+    client.force_authenticate(user)
+    host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+
+    results = {}
+    for url in ['/api/donations/', '/api/donations/available/', '/api/requests/', '/api/claims/']:
+        status_code = client.get(url, HTTP_HOST=host).status_code
+        if status_code != 200:
+            results[url] = {'skipped': f'HTTP {status_code}'}
+            continue
+        results[url] = measure(lambda: client.get(url, HTTP_HOST=host), repeat)
+    return results
+
+
+BENCHMARKS = {
+    'find_best_donations': bench_find_best_donations,
+    'extract_features': bench_extract_features,
+    'train_model_from_feedback': bench_train_model_from_feedback,
+    'forecast_demand': bench_forecast_demand,
+    'list_endpoints': bench_list_endpoints,
+}
+
+
+def run_benchmarks(names=None, repeat=5):
+    results = {}
+    for name in names or BENCHMARKS:
+        print(f"Running benchmark: {name}")
+        results[name] = BENCHMARKS[name](repeat)
+    return {
+        'commit': current_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'dataset': {
+            'users': CustomUser.objects.count(),
+            'donations': FoodDonation.objects.count(),
+            'requests': FoodRequest.objects.count(),
+        },
+        'benchmarks': results,
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(baseline, current):
+    """p50 ratio (current / baseline) for every benchmark present in both runs"""
+    ratios = {}
+
+    def walk(prefix, old, new):
+        if 'p50_ms' in old and 'p50_ms' in new:
+            ratios[prefix] = new['p50_ms'] / old['p50_ms'] if old['p50_ms'] else None
+            return
+        for key in old:
+            if isinstance(old[key], dict) and isinstance(new.get(key), dict):
+                walk(f"{prefix}{key}" if not prefix else f"{prefix} {key}", old[key], new[key])
+
+    walk('', baseline['benchmarks'], current['benchmarks'])
+    return ratios
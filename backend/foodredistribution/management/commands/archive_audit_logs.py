@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from foodredistribution.archive import ARCHIVABLE_MODELS, archive_old_rows
+
+
+class Command(BaseCommand):
+    help = 'Move old audit log rows into compressed monthly archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'AUDIT_RETENTION_DAYS', 90),
+                            help='Keep rows newer than this many days in the database')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--table', choices=sorted(ARCHIVABLE_MODELS), action='append',
+                            help='Table to archive (default: all audit tables)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be archived')
+
+    def handle(self, *args, **options):
+        for name in options['table'] or sorted(ARCHIVABLE_MODELS):
+            result = archive_old_rows(
+                name, options['days'], batch_size=options['batch_size'], dry_run=options['dry_run']
+            )
+            verb = 'Would archive' if options['dry_run'] else 'Archived'
+            self.stdout.write(self.style.SUCCESS(
+                f"{verb} {result['archived']} {name} rows older than {options['days']} days "
+                f"({len(result['files'])} files)"
+            ))
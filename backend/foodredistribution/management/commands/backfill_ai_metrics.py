@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from foodredistribution.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily AIPerformanceMetrics rows for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day (default: first claim or feedback)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Day after the last one (default: tomorrow)')
+        parser.add_argument('--chunk-days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        written = backfill(options['start'], options['end'], chunk_days=options['chunk_days'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily metric rows'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from foodredistribution.ai_engine.dataset import TrainingDataset
+from foodredistribution.ai_engine.matching_engine import matching_engine
+
+
+class Command(BaseCommand):
+    help = 'Append new feedback rows to the on-disk matching training dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Dataset directory (default: MATCHING_DATASET_DIR)')
+        parser.add_argument('--partition-rows', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        dataset = TrainingDataset(options['path'])
+        before = dataset.read_manifest()['high_water_mark']
+
+        exported = dataset.export(matching_engine.feature_extractor, partition_rows=options['partition_rows'])
+
+        manifest = dataset.read_manifest()
+        total = sum(partition['rows'] for partition in manifest['partitions'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {exported} rows (feedback id {before} -> {manifest['high_water_mark']}); "
+            f"{total} rows in {len(manifest['partitions'])} partitions at {dataset.root}"
+        ))
@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from foodredistribution.synthetic import SyntheticDataGenerator, clear_synthetic_data
+
+
+class Command(BaseCommand):
+    help = 'Generate deterministic synthetic users, locations, donations, requests, claims and feedback'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000, help='Number of donations (1k to 1M)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--anchor', type=date.fromisoformat,
+                            help='Day the generated history ends on (default: today); fix it for identical datasets')
+        parser.add_argument('--days', type=int, default=90, help='Days of history to spread activity over')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated synthetic data first')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted = clear_synthetic_data()
+            self.stdout.write(f"Deleted {deleted} synthetic rows")
+
+        generator = SyntheticDataGenerator(
+            scale=options['scale'],
+            seed=options['seed'],
+            anchor=options['anchor'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+        )
+        counts = generator.generate()
+        for table, count in counts.items():
+            self.stdout.write(f"  {table}: {count}")
+        self.stdout.write(self.style.SUCCESS('Synthetic data generated'))
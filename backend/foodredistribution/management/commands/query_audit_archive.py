@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from foodredistribution.archive import ARCHIVABLE_MODELS, read_archive
+
+
+class Command(BaseCommand):
+    help = 'Print archived audit log rows as JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(ARCHIVABLE_MODELS))
+        parser.add_argument('--start', help='Inclusive start date/datetime (ISO 8601)')
+        parser.add_argument('--end', help='Exclusive end date/datetime (ISO 8601)')
+        parser.add_argument('--filter', action='append', default=[], metavar='FIELD=VALUE',
+                            help='Exact match on a field, e.g. action=donation_claimed or user_id=4')
+        parser.add_argument('--limit', type=int, default=None)
+
+    def handle(self, *args, **options):
+        filters = {}
+        for item in options['filter']:
+            if '=' not in item:
+                raise CommandError(f"Invalid filter '{item}', expected FIELD=VALUE")
+            key, value = item.split('=', 1)
+            filters[key] = value
+
+        rows = read_archive(options['table'], options['start'], options['end'], **filters)
+        for count, row in enumerate(rows, start=1):
+            self.stdout.write(json.dumps(row))
+            if options['limit'] and count >= options['limit']:
+                break
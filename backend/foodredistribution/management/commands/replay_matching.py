@@ -0,0 +1,41 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from foodredistribution.ai_engine.matching_engine import SmartMatchingEngine, matching_engine
+from foodredistribution.ai_engine.replay import build_replay_cases, replay
+
+
+class Command(BaseCommand):
+    help = 'Replay historical claims through the matching engine and report throughput and ranking quality'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='Only replay claims from this day on')
+        parser.add_argument('--until', type=date.fromisoformat, help='Only replay claims before this day')
+        parser.add_argument('--limit', type=int, help='Replay at most this many claims')
+        parser.add_argument('--top-k', type=int, default=3)
+        parser.add_argument('--model-path', help='Candidate model pickle (default: the live model)')
+        parser.add_argument('--scaler-path', help='Scaler pickle matching --model-path')
+        parser.add_argument('--rule-based', action='store_true', help='Score with the rule-based fallback only')
+        parser.add_argument('--output', help='Also write the report as JSON to this path')
+
+    def handle(self, *args, **options):
+        if options['model_path']:
+            engine = SmartMatchingEngine(model_path=options['model_path'], scaler_path=options['scaler_path'])
+            # In online mode the live online model would score ahead of the candidate
+            engine.online_model.disabled = True
+        else:
+            engine = matching_engine
+        if options['rule_based']:
+            engine = SmartMatchingEngine()
+            engine.model = None
+            engine.online_model.disabled = True
+
+        cases = build_replay_cases(options['since'], options['until'], options['limit'])
+        self.stdout.write(f"Replaying {len(cases)} historical claims...")
+        report = replay(engine, cases, top_k=options['top_k'])
+
+        self.stdout.write(json.dumps(report, indent=2))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
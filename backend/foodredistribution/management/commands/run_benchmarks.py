@@ -0,0 +1,35 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from foodredistribution.benchmarks import BENCHMARKS, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark matching, training, forecasting and list endpoints; results are saved as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(BENCHMARKS), action='append', help='Run only these benchmarks')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Result file (default: BENCHMARK_RESULTS_DIR/<commit>.json)')
+        parser.add_argument('--compare', help='Earlier result file to compare p50 timings against')
+
+    def handle(self, *args, **options):
+        report = run_benchmarks(options['only'], repeat=options['repeat'])
+
+        output = options['output'] or os.path.join(settings.BENCHMARK_RESULTS_DIR, f"{report['commit']}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(json.dumps(report['benchmarks'], indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            self.stdout.write(f"p50 vs {baseline['commit']} (>1.0 is slower):")
+            for name, ratio in compare(baseline, report).items():
+                label = f"{ratio:.2f}x" if ratio is not None else 'n/a'
+                style = self.style.WARNING if ratio and ratio > 1.1 else self.style.SUCCESS
+                self.stdout.write(style(f"  {name}: {label}"))
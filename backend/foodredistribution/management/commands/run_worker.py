@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from backend.celery import WORKER_ROLES, app
+
+
+class Command(BaseCommand):
+    help = 'Start a Celery worker for one workload role (its queues, concurrency and prefetch)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('role', choices=sorted(WORKER_ROLES))
+        parser.add_argument('--concurrency', type=int, help='Override the role default')
+        parser.add_argument('--loglevel', default='info')
+
+    def handle(self, *args, **options):
+        role = WORKER_ROLES[options['role']]
+        argv = [
+            'worker',
+            '--hostname', f"{options['role']}@%h",
+            '--queues', ','.join(role['queues']),
+            '--concurrency', str(options['concurrency'] or role['concurrency']),
+            '--prefetch-multiplier', str(role['prefetch_multiplier']),
+            '--loglevel', options['loglevel'],
+            # Hand tasks out to idle child processes only, so one long task can't sit on a prefetched queue
+            '-O', 'fair',
+        ]
+        if role.get('max_tasks_per_child'):
+            argv += ['--max-tasks-per-child', str(role['max_tasks_per_child'])]
+        self.stdout.write(f"Starting {options['role']} worker: celery {' '.join(argv)}")
+        app.worker_main(argv)
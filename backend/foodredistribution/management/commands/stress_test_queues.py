@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+from foodredistribution.stress import run_stress_test
+
+
+class Command(BaseCommand):
+    help = 'Measure reminder-queue latency while a training task runs, with shared vs isolated queues'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--busy-seconds', type=float, default=10.0, help='How long the training stand-in runs')
+        parser.add_argument('--probe-interval', type=float, default=0.25)
+        parser.add_argument(
+            '--real-retrain', action='store_true',
+            help='Queue demand.tasks.retrain_demand_models instead of the CPU-bound stand-in',
+        )
+
+    def handle(self, *args, **options):
+        results = run_stress_test(
+            busy_seconds=options['busy_seconds'],
+            probe_interval=options['probe_interval'],
+            busy_task_name='demand.tasks.retrain_demand_models' if options['real_retrain'] else None,
+        )
+        self.stdout.write(json.dumps(results, indent=2))
+
+        shared, isolated = results['shared_queue'], results['isolated_queues']
+        if 'p95_ms' in shared and 'p95_ms' in isolated:
+            self.stdout.write(self.style.SUCCESS(
+                f"Reminder p95 latency: {shared['p95_ms']:.0f} ms shared -> {isolated['p95_ms']:.0f} ms isolated"
+            ))
@@ -3,13 +3,19 @@ from foodredistribution.ai_engine.matching_engine import matching_engine
 
 class Command(BaseCommand):
     help = 'Train the AI matching model from existing feedback data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['db', 'store'], default='db',
+                            help="Read training rows from the database or the exported dataset (export_training_dataset)")
     
     def handle(self, *args, **options):
         self.stdout.write('Starting model training...')
         
-        success = matching_engine.train_model_from_feedback()
+        success = matching_engine.train_model_from_feedback(source=options['source'])
         
         if success:
+            for phase, seconds in matching_engine.last_training_timings.items():
+                self.stdout.write(f'  {phase}: {seconds:.2f}s')
             self.stdout.write(
                 self.style.SUCCESS('Model training completed successfully')
             )
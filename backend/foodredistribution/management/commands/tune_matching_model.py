@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from foodredistribution.ai_engine.dataset import TrainingDataset
+from foodredistribution.ai_engine.matching_engine import matching_engine
+from foodredistribution.ai_engine.tuning import pick_fastest_within, run_search
+
+
+class Command(BaseCommand):
+    help = 'Cross-validated hyperparameter search for the matching model with an accuracy/latency report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size (default: CPU count)')
+        parser.add_argument('--folds', type=int, default=5)
+        parser.add_argument('--grid', help='JSON grid, e.g. \'{"n_estimators": [20, 50], "max_depth": [5, 10]}\'')
+        parser.add_argument('--output', help='Write the full report as JSON to this path')
+        parser.add_argument('--promote', help="Candidate id from the report, or 'auto' for the fastest "
+                                              "Pareto candidate within --tolerance of the best MAE")
+        parser.add_argument('--tolerance', type=float, default=0.005, help='Allowed MAE loss for --promote auto')
+
+    def handle(self, *args, **options):
+        X, y = TrainingDataset().load()
+        if len(y) < options['folds'] * 2:
+            raise CommandError(f"Only {len(y)} rows in the exported dataset; run export_training_dataset first")
+
+        grid = json.loads(options['grid']) if options['grid'] else None
+        self.stdout.write(f"Searching on {len(y)} rows with {options['folds']}-fold CV...")
+        results = run_search(X, y, grid=grid, folds=options['folds'], workers=options['workers'])
+
+        self.stdout.write(f"{'id':>3} {'pareto':>6} {'mae':>8} {'row ms':>8} {'batch ms':>9}  params")
+        for result in results:
+            self.stdout.write(
+                f"{result['id']:>3} {'*' if result['pareto'] else '':>6} {result['mae']:>8.4f} "
+                f"{result['row_latency_ms']:>8.3f} {result['batch_latency_ms']:>9.2f}  {result['params']}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if options['promote']:
+            if options['promote'] == 'auto':
+                chosen = pick_fastest_within(results, options['tolerance'])
+            else:
+                matching = [r for r in results if str(r['id']) == options['promote']]
+                if not matching:
+                    raise CommandError(f"No candidate with id {options['promote']}")
+                chosen = matching[0]
+
+            self.stdout.write(f"Promoting candidate {chosen['id']}: {chosen['params']}")
+            if matching_engine.promote_params(chosen['params']):
+                self.stdout.write(self.style.SUCCESS('Promoted configuration and retrained the matching model'))
+            else:
+                self.stdout.write(self.style.WARNING('Saved configuration, but retraining failed'))
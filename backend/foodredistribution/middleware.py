@@ -0,0 +1,96 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from .profiling import ProfileStore, QueryRecorder, StackSampler
+
+
+class RequestProfilingMiddleware:
+    """
+    Profiles a single request when it carries `X-Profile: 1` (or
+    `?profile=1`); use `cpu` instead of `1` to add a sampling CPU profile.
+
+    Records wall time, DB query count, total SQL time and the most
+    duplicated queries (N+1 patterns), returns the headline numbers in
+    X-Profile-* response headers and saves the full profile to the
+    profile store (see /api/profiles/). Only staff users are profiled;
+    the flag is ignored for everyone else, before any recording starts.
+    """
+
+    MODES = ('1', 'cpu')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.store = ProfileStore()
+
+    def __call__(self, request):
+        mode = request.headers.get('X-Profile') or request.GET.get('profile')
+        if mode not in self.MODES or not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+            return self.get_response(request)
+        user = self._staff_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        sampler = None
+        if mode == 'cpu':
+            sampler = StackSampler(
+                threading.get_ident(), getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.005)
+            ).start()
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            wall = time.perf_counter() - start
+            if sampler:
+                sampler.stop()
+
+        profile = {
+            'id': uuid.uuid4().hex,
+            'timestamp': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'user': user.username,
+            'wall_ms': wall * 1000,
+            **recorder.summary(),
+        }
+        if sampler:
+            profile['cpu'] = sampler.summary()
+        self.store.save(profile)
+
+        response['X-Profile-Id'] = profile['id']
+        response['X-Profile-Wall-Ms'] = f"{profile['wall_ms']:.1f}"
+        response['X-Profile-Queries'] = str(profile['db_queries'])
+        response['X-Profile-SQL-Ms'] = f"{profile['sql_ms']:.1f}"
+        response['X-Profile-Duplicate-Queries'] = str(profile['duplicate_queries'])
+        return response
+
+    def _staff_user(self, request):
+        """
+        The staff user making the request, or None. API clients authenticate
+        inside DRF views, after middleware, so token/JWT headers are checked
+        here with the same authentication classes.
+        """
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user if user.is_staff else None
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            if issubclass(authentication_class, SessionAuthentication):
+                continue  # already covered by request.user
+            try:
+                result = authentication_class().authenticate(request)
+            except APIException:
+                return None
+            if result is not None:
+                return result[0] if result[0].is_staff else None
+        return None
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodredistribution', '0002_aiperformancemetrics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aiauditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='donationlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
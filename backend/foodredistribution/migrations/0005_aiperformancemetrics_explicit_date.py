@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodredistribution', '0004_audit_log_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aiperformancemetrics',
+            name='date',
+            field=models.DateField(),
+        ),
+    ]
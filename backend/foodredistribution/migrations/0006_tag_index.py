@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:26
+
+from django.db import migrations, models
+
+
+def _normalize(text):
+    return sorted({tag.strip().lower()[:50].strip() for tag in (text or '').split(',') if tag.strip()})
+
+
+def _tag_id(Tag, ids, name):
+    # Names the unique index folded together (MySQL's collation ignores case,
+    # accents and trailing spaces) aren't dict keys; ask the database instead
+    if name not in ids:
+        ids[name] = Tag.objects.filter(name=name).values_list('id', flat=True).get()
+    return ids[name]
+
+
+def build_tag_index(apps, schema_editor):
+    """Fill the vocabulary from existing tag text and set tag_ids on every row"""
+    Tag = apps.get_model('foodredistribution', 'Tag')
+    tables = [
+        (apps.get_model('foodredistribution', 'FoodDonation'), 'tags'),
+        (apps.get_model('foodredistribution', 'FoodRequest'), 'preferred_tags'),
+    ]
+    names = set()
+    for model, field in tables:
+        for text in model.objects.exclude(**{field: ''}).values_list(field, flat=True).distinct().iterator():
+            names.update(_normalize(text))
+    Tag.objects.bulk_create([Tag(name=name) for name in sorted(names)], ignore_conflicts=True)
+    ids = dict(Tag.objects.values_list('name', 'id'))
+
+    for model, field in tables:
+        batch = []
+        for row in model.objects.exclude(**{field: ''}).only('id', field).iterator(chunk_size=2000):
+            row.tag_ids = sorted({_tag_id(Tag, ids, name) for name in _normalize(getattr(row, field))})
+            batch.append(row)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, ['tag_ids'])
+                batch = []
+        model.objects.bulk_update(batch, ['tag_ids'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodredistribution', '0005_aiperformancemetrics_explicit_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='fooddonation',
+            name='tag_ids',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Sorted Tag ids of `tags`, set on save'),
+        ),
+        migrations.AddField(
+            model_name='foodrequest',
+            name='tag_ids',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Sorted Tag ids of `preferred_tags`, set on save'),
+        ),
+        migrations.RunPython(build_tag_index, migrations.RunPython.noop),
+    ]
@@ -24,6 +24,67 @@ class FoodCategory(models.Model):
         return self.name
 
 
+class Tag(models.Model):
+    """Normalized tag vocabulary; donations and requests store the ids of their tags"""
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def normalize(text):
+        """Comma-separated tags -> sorted, de-duplicated, lowercase names"""
+        # Strip again after truncating: MySQL's PAD SPACE collation ignores trailing spaces
+        return sorted({tag.strip().lower()[:50].strip() for tag in (text or '').split(',') if tag.strip()})
+
+    @classmethod
+    def lookup(cls, names):
+        """
+        {name: id} for the names already in the vocabulary. Names the first
+        query doesn't return verbatim are looked up one by one, so the
+        database's collation decides what matches: on MySQL's default
+        case- and accent-insensitive collation 'cafe' finds a stored 'café'.
+        """
+        ids = dict(cls.objects.filter(name__in=names).values_list('name', 'id'))
+        for name in names:
+            if name not in ids:
+                match = cls.objects.filter(name=name).values_list('id', flat=True).first()
+                if match is not None:
+                    ids[name] = match
+        return {name: ids[name] for name in names if name in ids}
+
+    @classmethod
+    def ids_for(cls, text):
+        """Sorted tag ids for `text`, adding new names to the vocabulary"""
+        names = cls.normalize(text)
+        if not names:
+            return []
+        known = cls.lookup(names)
+        missing = [name for name in names if name not in known]
+        if missing:
+            cls.objects.bulk_create([cls(name=name) for name in missing], ignore_conflicts=True)
+            known = cls.lookup(names)
+        return sorted(set(known.values()))
+
+    @classmethod
+    def resolve(cls, text):
+        """(sorted ids of the known tags in `text`, number of names not in the vocabulary); read-only"""
+        names = cls.normalize(text)
+        if not names:
+            return [], 0
+        known = cls.lookup(names)
+        return sorted(set(known.values())), len(names) - len(known)
+
+
+def _refresh_tag_ids(instance, text_field, kwargs):
+    """Recompute tag_ids from the tag text, unless save(update_fields=...) leaves the text alone"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or text_field in update_fields:
+        instance.tag_ids = Tag.ids_for(getattr(instance, text_field))
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'tag_ids'}
+
+
 class Location(models.Model):
     address_line = models.CharField(max_length=255, blank=True, null=True)
     city = models.CharField(max_length=100)
@@ -50,6 +111,7 @@ class FoodDonation(models.Model):
     description = models.TextField(blank=True)
     quantity = models.FloatField(help_text="Quantity in kilograms", validators=[MinValueValidator(0.1)])
     tags = models.CharField(max_length=255, blank=True, help_text="Comma-separated tags e.g., vegetarian,gluten-free")
+    tag_ids = models.JSONField(default=list, blank=True, editable=False, help_text="Sorted Tag ids of `tags`, set on save")
     location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True)
     donation_date = models.DateTimeField(auto_now_add=True)
     expiry_date = models.DateTimeField(null=True, blank=True)
@@ -72,6 +134,10 @@ class FoodDonation(models.Model):
         cat = self.category.name if self.category else "Uncategorized"
         return f"{self.quantity}kg {cat} by {self.donor.username}"
 
+    def save(self, *args, **kwargs):
+        _refresh_tag_ids(self, 'tags', kwargs)
+        super().save(*args, **kwargs)
+
     def is_expired(self):
         return self.expiry_date and timezone.now() > self.expiry_date
 
@@ -94,6 +160,11 @@ class FoodRequest(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     preferred_tags = models.CharField(max_length=255, blank=True, help_text="Comma-separated preferred tags")
+    tag_ids = models.JSONField(default=list, blank=True, editable=False, help_text="Sorted Tag ids of `preferred_tags`, set on save")
+
+    def save(self, *args, **kwargs):
+        _refresh_tag_ids(self, 'preferred_tags', kwargs)
+        super().save(*args, **kwargs)
 
     def _str_(self):
         cat = self.category.name if self.category else "Uncategorized"
@@ -135,7 +206,8 @@ class Feedback(models.Model):
 # --- AI AUDIT LOG MODEL ---
 class AIAuditLog(models.Model):
     # Log AI-related decisions/actions for traceability & compliance
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the buffered writer flushes it
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     action = models.CharField(max_length=100, help_text="AI action e.g., 'prediction', 'matching', 'flagged_for_review'")
     user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, help_text="User involved, if any")
     donation = models.ForeignKey(FoodDonation, on_delete=models.SET_NULL, null=True, blank=True)
@@ -152,7 +224,7 @@ class DonationLog(models.Model):
     donation = models.ForeignKey(FoodDonation, on_delete=models.CASCADE)
     action = models.CharField(max_length=50)  # e.g., 'claimed', 'cancelled', 'expired', 'matched_by_ai'
     performed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     notes = models.TextField(blank=True)
 
     def __str__(self):
@@ -161,7 +233,8 @@ class DonationLog(models.Model):
     
 # Add to your models or create a new monitoring model
 class AIPerformanceMetrics(models.Model):
-    date = models.DateField(auto_now_add=True)
+    # One row per day, written by foodredistribution.rollups
+    date = models.DateField()
     total_matches_generated = models.IntegerField(default=0)
     successful_matches = models.IntegerField(default=0)
     average_match_score = models.FloatField(default=0.0)
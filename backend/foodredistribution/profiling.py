@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+_NUMBER = re.compile(r'\b\d+(\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+def normalize_sql(sql):
+    """Collapse literals so the same query with different parameters groups together"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?...)', sql)
+    return ' '.join(sql.split())
+
+
+class QueryRecorder:
+    """connection.execute_wrapper hook that records every query and its duration"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def summary(self, top=10):
+        total = sum(duration for _, duration in self.queries)
+        groups = {}
+        for sql, duration in self.queries:
+            entry = groups.setdefault(normalize_sql(sql), {'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += duration
+        duplicates = sorted(
+            ({'sql': sql, 'count': entry['count'], 'ms': entry['seconds'] * 1000}
+             for sql, entry in groups.items() if entry['count'] > 1),
+            key=lambda item: item['count'],
+            reverse=True,
+        )
+        return {
+            'db_queries': len(self.queries),
+            'sql_ms': total * 1000,
+            'duplicate_queries': sum(item['count'] - 1 for item in duplicates),
+            'top_duplicates': duplicates[:top],
+        }
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a
+    background thread. Much cheaper than cProfile for slow requests, and
+    the result is statistical: counts are samples, not calls.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def summary(self, top=20):
+        inclusive = Counter()
+        leaf = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            leaf[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        return {
+            'samples': self.samples,
+            'interval_ms': self.interval * 1000,
+            'top_self': leaf.most_common(top),
+            'top_inclusive': inclusive.most_common(top),
+            # Collapsed stacks, ready for flamegraph.pl / speedscope
+            'collapsed': [f"{stack} {count}" for stack, count in self.stacks.most_common(200)],
+        }
+
+
+class ProfileStore:
+    """Keeps the most recent `max_profiles` request profiles as JSON files"""
+
+    def __init__(self, root=None, max_profiles=None):
+        self.root = Path(root or settings.PROFILE_STORE_DIR)
+        self.max_profiles = max_profiles or getattr(settings, 'PROFILE_STORE_MAX', 200)
+
+    def save(self, profile):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / f"{profile['id']}.json", 'w') as f:
+            json.dump(profile, f)
+        self._prune()
+
+    def _prune(self):
+        files = sorted(self.root.glob('*.json'), key=lambda path: path.stat().st_mtime)
+        for path in files[:-self.max_profiles]:
+            path.unlink(missing_ok=True)
+
+    def list(self):
+        if not self.root.exists():
+            return []
+        profiles = []
+        for path in sorted(self.root.glob('*.json'), key=lambda path: path.stat().st_mtime, reverse=True):
+            with open(path) as f:
+                profile = json.load(f)
+            profiles.append({key: profile.get(key) for key in (
+                'id', 'timestamp', 'method', 'path', 'status', 'wall_ms', 'db_queries', 'sql_ms', 'duplicate_queries'
+            )})
+        return profiles
+
+    def get(self, profile_id):
+        if not re.fullmatch(r'[0-9a-f]{32}', profile_id):
+            return None
+        path = self.root / f"{profile_id}.json"
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
@@ -0,0 +1,95 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AIPerformanceMetrics, ClaimedDonation, Feedback
+from .utils import upsert_options
+
+# A match counts as successful when its feedback rating is at least this
+SUCCESSFUL_RATING = 4
+
+
+def rollup_days(start, end):
+    """
+    Compute AIPerformanceMetrics rows for every day in [start, end) with
+    two grouped queries and upsert them.
+
+    Claims are bucketed by claim_date (total matches, average match score);
+    feedback is bucketed by submitted_at (successful matches, average
+    rating), so a closed day never changes when older claims get rated.
+    """
+    start_dt, end_dt = _day_start(start), _day_start(end)
+
+    claims = (
+        ClaimedDonation.objects
+        .filter(claim_date__gte=start_dt, claim_date__lt=end_dt)
+        .annotate(day=TruncDate('claim_date'))
+        .values('day')
+        .annotate(total=Count('id'), avg_score=Avg('ai_matching_score'))
+    )
+    feedback = (
+        Feedback.objects
+        .filter(submitted_at__gte=start_dt, submitted_at__lt=end_dt)
+        .annotate(day=TruncDate('submitted_at'))
+        .values('day')
+        .annotate(successful=Count('id', filter=Q(rating__gte=SUCCESSFUL_RATING)), avg_rating=Avg('rating'))
+    )
+
+    rows = {}
+    for row in claims:
+        metrics = rows.setdefault(row['day'], AIPerformanceMetrics(date=row['day']))
+        metrics.total_matches_generated = row['total']
+        metrics.average_match_score = row['avg_score'] or 0.0
+    for row in feedback:
+        metrics = rows.setdefault(row['day'], AIPerformanceMetrics(date=row['day']))
+        metrics.successful_matches = row['successful']
+        metrics.average_feedback_rating = row['avg_rating'] or 0.0
+
+    AIPerformanceMetrics.objects.bulk_create(
+        list(rows.values()),
+        **upsert_options(
+            unique_fields=['date'],
+            update_fields=[
+                'total_matches_generated', 'successful_matches',
+                'average_match_score', 'average_feedback_rating',
+            ],
+        )
+    )
+    return len(rows)
+
+
+def rollup_incremental():
+    """
+    Roll up everything since the last stored day. The last day is always
+    recomputed because it may have been rolled up while still in progress.
+    """
+    today = timezone.localdate()
+    last_day = AIPerformanceMetrics.objects.aggregate(last=Max('date'))['last']
+    start = last_day or _first_activity_day() or today
+    return rollup_days(start, today + timedelta(days=1))
+
+
+def backfill(start=None, end=None, chunk_days=30):
+    """Recompute history in chunks of `chunk_days` so each query stays bounded"""
+    start = start or _first_activity_day() or timezone.localdate()
+    end = end or timezone.localdate() + timedelta(days=1)
+
+    written = 0
+    while start < end:
+        chunk_end = min(start + timedelta(days=chunk_days), end)
+        written += rollup_days(start, chunk_end)
+        start = chunk_end
+    return written
+
+
+def _first_activity_day():
+    first_claim = ClaimedDonation.objects.aggregate(first=Min('claim_date'))['first']
+    first_feedback = Feedback.objects.aggregate(first=Min('submitted_at'))['first']
+    firsts = [timezone.localdate(value) for value in (first_claim, first_feedback) if value]
+    return min(firsts) if firsts else None
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
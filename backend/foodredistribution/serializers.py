@@ -2,7 +2,7 @@
 
 from rest_framework import serializers
 from .models import (
-    FoodDonation, FoodRequest, FoodCategory, Location, ClaimedDonation, Feedback
+    FoodDonation, FoodRequest, FoodCategory, Location, ClaimedDonation, Feedback, AIPerformanceMetrics
 )
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
@@ -156,6 +156,15 @@ class FeedbackSerializer(serializers.ModelSerializer):
         return value
     
 
+class AIPerformanceMetricsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AIPerformanceMetrics
+        fields = [
+            'date', 'total_matches_generated', 'successful_matches',
+            'average_match_score', 'average_feedback_rating'
+        ]
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     profile_image = serializers.ImageField(required=False, allow_null=True)
@@ -0,0 +1,97 @@
+import threading
+import time
+from contextlib import ExitStack
+
+import numpy as np
+from celery import shared_task
+from celery.contrib.testing.worker import start_worker
+
+from backend.celery import app
+
+_latencies = []
+_latency_lock = threading.Lock()
+
+
+@shared_task(name='foodredistribution.stress.probe')
+def probe_task(sent_at):
+    """Stand-in for a pickup reminder: records how long it waited to start"""
+    with _latency_lock:
+        _latencies.append(time.time() - sent_at)
+
+
+@shared_task(name='foodredistribution.stress.busy')
+def busy_task(seconds):
+    """Stand-in for a retrain: keeps its worker busy for `seconds`"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(1000))
+
+
+def run_scenario(isolated, busy_seconds=10.0, probe_interval=0.25, busy_task_name=None):
+    """
+    Start in-process workers on an in-memory broker, queue one long
+    training task, then send probes to the reminders queue for as long as
+    the training task runs.
+
+    isolated=True mirrors WORKER_ROLES (one worker per queue);
+    isolated=False is a single worker consuming every queue, like the old
+    single default queue setup.
+    """
+    _latencies.clear()
+    if isolated:
+        workers = [('training', ['training']), ('reminders', ['reminders'])]
+    else:
+        workers = [('shared', ['training', 'reminders'])]
+
+    with ExitStack() as stack:
+        for name, queues in workers:
+            stack.enter_context(start_worker(
+                app, pool='solo', concurrency=1, perform_ping_check=False,
+                hostname=f"stress-{name}@localhost", queues=queues, prefetch_multiplier=1,
+            ))
+
+        if busy_task_name:
+            app.send_task(busy_task_name, queue='training')
+        else:
+            busy_task.apply_async((busy_seconds,), queue='training')
+        # Let the training task get picked up first, as a nightly retrain would be
+        time.sleep(0.5)
+
+        sent = 0
+        deadline = time.perf_counter() + busy_seconds
+        while time.perf_counter() < deadline:
+            probe_task.apply_async((time.time(),), queue='reminders', priority=0)
+            sent += 1
+            time.sleep(probe_interval)
+
+        # Wait for the stragglers (bounded, so a starved run still reports)
+        wait_until = time.perf_counter() + busy_seconds + 10
+        while len(_latencies) < sent and time.perf_counter() < wait_until:
+            time.sleep(0.05)
+
+    latencies_ms = np.array(_latencies) * 1000
+    result = {'probes_sent': sent, 'probes_completed': len(latencies_ms)}
+    if len(latencies_ms):
+        result.update(
+            p50_ms=float(np.percentile(latencies_ms, 50)),
+            p95_ms=float(np.percentile(latencies_ms, 95)),
+            max_ms=float(latencies_ms.max()),
+        )
+    return result
+
+
+def run_stress_test(busy_seconds=10.0, probe_interval=0.25, busy_task_name=None):
+    # Everything runs in this process against kombu's in-memory transport.
+    # Settings come from Django with the CELERY_ namespace, so override those keys.
+    app.conf.update(
+        CELERY_BROKER_URL='memory://',
+        CELERY_RESULT_BACKEND=None,
+        CELERY_TASK_ALWAYS_EAGER=False,
+    )
+    # The virtual transports poll once a second by default, which would swamp the measurement
+    app.conf.broker_transport_options = {**app.conf.broker_transport_options, 'polling_interval': 0.01}
+
+    return {
+        'shared_queue': run_scenario(False, busy_seconds, probe_interval, busy_task_name),
+        'isolated_queues': run_scenario(True, busy_seconds, probe_interval, busy_task_name),
+    }
@@ -0,0 +1,257 @@
+import random
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from demand.models import DemandDataPoint
+from .models import (
+    CustomUser, FoodCategory, Location, FoodDonation, FoodRequest, ClaimedDonation, Feedback, Tag
+)
+
+USERNAME_PREFIX = 'synthetic_'
+
+# City centres that donations and requests cluster around
+CITIES = [
+    ('Indore', 'Madhya Pradesh', 22.7196, 75.8577),
+    ('Bhopal', 'Madhya Pradesh', 23.2599, 77.4126),
+    ('Mumbai', 'Maharashtra', 19.0760, 72.8777),
+    ('Pune', 'Maharashtra', 18.5204, 73.8567),
+    ('Delhi', 'Delhi', 28.7041, 77.1025),
+    ('Bengaluru', 'Karnataka', 12.9716, 77.5946),
+    ('Hyderabad', 'Telangana', 17.3850, 78.4867),
+    ('Chennai', 'Tamil Nadu', 13.0827, 80.2707),
+]
+CATEGORIES = ['Cooked Meals', 'Bakery', 'Fruits', 'Vegetables', 'Dairy', 'Grains', 'Packaged Food']
+TAGS = ['vegetarian', 'vegan', 'gluten-free', 'halal', 'jain', 'dairy-free', 'nut-free', 'spicy']
+DONATION_STATUSES = ['pending', 'collected', 'cancelled', 'expired']
+DONATION_STATUS_WEIGHTS = [0.40, 0.45, 0.05, 0.10]
+
+
+class SyntheticDataGenerator:
+    """
+    Deterministic city-scale test data. The same seed, anchor day and batch
+    size always produce the same rows; `scale` is the number of donations,
+    and every other table is sized from it:
+
+        users        scale / 10 (min 20), half donors, half requesters
+        locations    scale / 20 (min 40), gaussian clusters around CITIES
+        requests     scale / 2
+        claims       every 'collected' donation
+        feedback     ~70% of claims, rating driven by category fit and distance
+        demand data  one DemandDataPoint per city per day, weekly seasonality
+    """
+
+    def __init__(self, scale=1000, seed=42, anchor=None, days=90, batch_size=5000):
+        self.scale = scale
+        self.seed = seed
+        self.days = days
+        self.batch_size = batch_size
+        anchor = anchor or timezone.localdate()
+        self.anchor = timezone.make_aware(datetime.combine(anchor, time.min))
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.RandomState(seed)
+
+    def generate(self):
+        counts = {}
+        categories = self._categories()
+        # bulk_create skips save(), so tag_ids are filled in from this
+        self.tag_index = {name: Tag.ids_for(name)[0] for name in TAGS}
+        locations = self._locations(max(40, self.scale // 20))
+        donors, requesters = self._users(max(20, self.scale // 10))
+        counts.update(users=len(donors) + len(requesters), locations=len(locations), categories=len(categories))
+
+        # Each requester mostly asks for one category; feedback depends on it
+        preferred_category = {user.id: self.rng.choice(categories) for user in requesters}
+        counts['requests'] = self._requests(self.scale // 2, requesters, categories, locations, preferred_category)
+        counts['demand_data_points'] = self._demand_points(donors)
+
+        counts.update(donations=0, claims=0, feedback=0)
+        for start in range(0, self.scale, self.batch_size):
+            size = min(self.batch_size, self.scale - start)
+            donations, claims, feedback = self._donation_batch(
+                size, donors, requesters, categories, locations, preferred_category
+            )
+            counts['donations'] += donations
+            counts['claims'] += claims
+            counts['feedback'] += feedback
+        return counts
+
+    # --- support tables ---
+
+    def _categories(self):
+        return [FoodCategory.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+
+    def _locations(self, count):
+        rows = []
+        for i in range(count):
+            city, state, lat, lng = CITIES[i % len(CITIES)]
+            rows.append(Location(
+                address_line=f"{USERNAME_PREFIX}{self.seed}_{i}",
+                city=city,
+                state=state,
+                zipcode=f"{self.rng.randint(100000, 999999)}",
+                latitude=round(lat + self.np_rng.normal(0, 0.05), 6),
+                longitude=round(lng + self.np_rng.normal(0, 0.05), 6),
+            ))
+        return bulk_insert(Location, rows, self.batch_size)
+
+    def _users(self, count):
+        rows = []
+        for i in range(count):
+            is_donor = i % 2 == 0
+            rows.append(CustomUser(
+                username=f"{USERNAME_PREFIX}{self.seed}_{i}",
+                email=f"{USERNAME_PREFIX}{self.seed}_{i}@example.com",
+                password=UNUSABLE_PASSWORD_PREFIX + 'synthetic',
+                is_donor=is_donor,
+                is_requester=not is_donor,
+                organization_name=f"NGO {i}" if not is_donor and self.rng.random() < 0.4 else None,
+            ))
+        users = bulk_insert(CustomUser, rows, self.batch_size)
+        return [u for u in users if u.is_donor], [u for u in users if u.is_requester]
+
+    def _random_tags(self):
+        return ','.join(self.rng.sample(TAGS, self.rng.choice([0, 1, 1, 2, 3])))
+
+    def _tag_ids(self, tags):
+        return sorted(self.tag_index[name] for name in tags.split(',') if name)
+
+    def _random_moment(self):
+        return self.anchor - timedelta(seconds=self.rng.uniform(0, self.days * 86400))
+
+    # --- activity tables ---
+
+    def _requests(self, count, requesters, categories, locations, preferred_category):
+        rows = []
+        dates = []
+        for _ in range(count):
+            requester = self.rng.choice(requesters)
+            category = preferred_category[requester.id] if self.rng.random() < 0.7 else self.rng.choice(categories)
+            rows.append(FoodRequest(
+                requester=requester,
+                category=category,
+                quantity=round(float(self.np_rng.lognormal(1.5, 0.6)), 1) + 0.1,
+                location=self.rng.choice(locations),
+                status=self.rng.choice(['pending', 'fulfilled', 'fulfilled', 'cancelled']),
+                preferred_tags=self._random_tags(),
+            ))
+            dates.append(self._random_moment())
+        for row in rows:
+            row.tag_ids = self._tag_ids(row.preferred_tags)
+
+        with transaction.atomic():
+            created = bulk_insert(FoodRequest, rows, self.batch_size)
+            # auto_now_add fields can only be backdated after insert
+            for request, moment in zip(created, dates):
+                request.request_date = moment
+            FoodRequest.objects.bulk_update(created, ['request_date'], batch_size=self.batch_size)
+        return len(created)
+
+    def _demand_points(self, donors):
+        rows = []
+        for city, _, _, _ in CITIES:
+            base = self.rng.uniform(20, 200)
+            weekly = self.np_rng.uniform(0.7, 1.3, size=7)
+            for offset in range(self.days * 2):
+                day = (self.anchor - timedelta(days=offset)).date()
+                volume = base * weekly[day.weekday()] * (1 + 0.002 * (self.days * 2 - offset))
+                rows.append(DemandDataPoint(
+                    city=city,
+                    date=day,
+                    donation_volume=max(0, int(self.np_rng.normal(volume * 0.8, volume * 0.1))),
+                    request_volume=max(0, int(self.np_rng.normal(volume, volume * 0.1))),
+                    submitted_by=self.rng.choice(donors),
+                ))
+        return len(bulk_insert(DemandDataPoint, rows, self.batch_size))
+
+    def _donation_batch(self, size, donors, requesters, categories, locations, preferred_category):
+        donations = []
+        moments = []
+        for _ in range(size):
+            status = self.rng.choices(DONATION_STATUSES, DONATION_STATUS_WEIGHTS)[0]
+            # Shelf life: mostly hours to a couple of days
+            shelf_life = timedelta(hours=float(self.np_rng.gamma(2.0, 9.0)) + 1)
+            if status == 'pending':
+                # Still open at the anchor, so there is something to match against
+                moment = self.anchor - timedelta(hours=self.rng.uniform(0, 12))
+                shelf_life += timedelta(hours=12)
+            else:
+                moment = self._random_moment()
+            donations.append(FoodDonation(
+                donor=self.rng.choice(donors),
+                category=self.rng.choice(categories),
+                description='Synthetic donation',
+                quantity=round(float(self.np_rng.lognormal(1.6, 0.7)), 1) + 0.1,
+                tags=self._random_tags(),
+                location=self.rng.choice(locations),
+                expiry_date=moment + shelf_life,
+                status=status,
+            ))
+            moments.append(moment)
+        for donation in donations:
+            donation.tag_ids = self._tag_ids(donation.tags)
+
+        with transaction.atomic():
+            created = bulk_insert(FoodDonation, donations, self.batch_size)
+            for donation, moment in zip(created, moments):
+                donation.donation_date = moment
+                donation.updated_at = moment
+            FoodDonation.objects.bulk_update(created, ['donation_date', 'updated_at'], batch_size=self.batch_size)
+
+            claims = []
+            claim_moments = []
+            for donation in created:
+                if donation.status != 'collected':
+                    continue
+                requester = self.rng.choice(requesters)
+                window = (donation.expiry_date - donation.donation_date).total_seconds()
+                claims.append(ClaimedDonation(
+                    donation=donation,
+                    claimed_by=requester,
+                    ai_matching_score=round(self.rng.random(), 3),
+                    distance_km=round(float(self.np_rng.exponential(8.0)), 2),
+                ))
+                claim_moments.append(donation.donation_date + timedelta(seconds=self.rng.uniform(0, window * 0.8)))
+            claims = bulk_insert(ClaimedDonation, claims, self.batch_size)
+            for claim, moment in zip(claims, claim_moments):
+                claim.claim_date = moment
+            ClaimedDonation.objects.bulk_update(claims, ['claim_date'], batch_size=self.batch_size)
+
+            feedback = []
+            feedback_moments = []
+            for claim in claims:
+                if self.rng.random() > 0.7:
+                    continue
+                fit = 1.5 if claim.donation.category_id == preferred_category[claim.claimed_by_id].id else 0.0
+                rating = 2.5 + fit - claim.distance_km / 15.0 + self.np_rng.normal(0, 0.8)
+                feedback.append(Feedback(claimed_donation=claim, rating=int(min(5, max(1, round(rating))))))
+                feedback_moments.append(claim.claim_date + timedelta(hours=self.rng.uniform(1, 48)))
+            feedback = bulk_insert(Feedback, feedback, self.batch_size)
+            for item, moment in zip(feedback, feedback_moments):
+                item.submitted_at = moment
+            Feedback.objects.bulk_update(feedback, ['submitted_at'], batch_size=self.batch_size)
+
+        return len(created), len(claims), len(feedback)
+
+
+def bulk_insert(model, objs, batch_size):
+    """
+    bulk_create that always leaves primary keys set on `objs`. MySQL can't
+    return ids from a bulk insert, so there ids are assigned up front.
+    """
+    if not connection.features.can_return_rows_from_bulk_insert:
+        next_id = (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        for offset, obj in enumerate(objs):
+            obj.id = next_id + offset
+    return model.objects.bulk_create(objs, batch_size=batch_size)
+
+
+def clear_synthetic_data():
+    """Delete synthetic users (cascading to their activity) and locations"""
+    users = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).delete()[0]
+    locations = Location.objects.filter(address_line__startswith=USERNAME_PREFIX).delete()[0]
+    return users + locations
@@ -3,6 +3,57 @@ from django.utils.timezone import now, localtime, timedelta
 from .models import ClaimedDonation
 from .utils import send_notification_email  # 👈 Import your custom function 
 
+@shared_task
+def write_audit_records_task(model_label, rows):
+    from .audit import write_audit_records
+    return write_audit_records(model_label, rows)
+
+@shared_task
+def archive_audit_logs_task(days=None):
+    from django.conf import settings
+    from .archive import ARCHIVABLE_MODELS, archive_old_rows
+
+    days = days or settings.AUDIT_RETENTION_DAYS
+    return {name: archive_old_rows(name, days)['archived'] for name in ARCHIVABLE_MODELS}
+
+@shared_task
+def rollup_ai_metrics_task():
+    from .rollups import rollup_incremental
+    return rollup_incremental()
+
+@shared_task
+def scan_cancellation_anomalies_task():
+    from .utils import scan_cancellation_anomalies
+    return scan_cancellation_anomalies()
+
+@shared_task
+def update_online_model_task(feedback_id):
+    from .models import Feedback
+    from .ai_engine.matching_engine import matching_engine
+
+    feedback = Feedback.objects.select_related(
+        'claimed_donation__donation__donor', 'claimed_donation__donation__category',
+        'claimed_donation__donation__location', 'claimed_donation__claimed_by',
+    ).filter(id=feedback_id).first()
+    if not feedback:
+        return None
+    return matching_engine.learn_from_feedback(feedback)
+
+@shared_task
+def export_training_dataset_task():
+    from .ai_engine.dataset import TrainingDataset
+    from .ai_engine.matching_engine import matching_engine
+    return TrainingDataset().export(matching_engine.feature_extractor)
+
+@shared_task
+def train_matching_model_task():
+    from .ai_engine.dataset import TrainingDataset
+    from .ai_engine.matching_engine import matching_engine
+
+    # Bring the offline dataset up to date, then train from a local scan
+    TrainingDataset().export(matching_engine.feature_extractor)
+    return matching_engine.train_model_from_feedback(source='store')
+
 @shared_task
 def notify_fallback_receivers_task(donation_id):
     from .models import FoodDonation, CustomUser
@@ -1,3 +1,553 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from backend import tracing
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .ai_engine.dataset import TrainingDataset
+from .ai_engine.feature_extractor import FeatureExtractor, tag_bitsets
+from .ai_engine.instrumentation import MetricsRegistry
+from .ai_engine.matching_engine import SmartMatchingEngine
+from .ai_engine.replay import build_replay_cases, candidates_at, replay
+from .ai_engine.training import build_training_matrix, request_from_claim
+from .ai_engine.tuning import candidate_grid, mark_pareto_front, pick_fastest_within, run_search
+from .archive import archive_old_rows, read_archive
+from .audit import BufferedAuditWriter
+from .middleware import RequestProfilingMiddleware
+from .profiling import ProfileStore, normalize_sql
+from .rollups import _day_start, rollup_incremental
+from .utils import (
+    CANCELLATION_KEY, detect_cancellation_anomaly, filter_has_tags, flag_cancellation_anomaly,
+    recent_cancellation_count, record_cancellation, scan_cancellation_anomalies,
+)
+from .models import AIAuditLog, AIPerformanceMetrics, ClaimedDonation, CustomUser, FoodDonation, FoodRequest, Feedback, Tag
+
+def set_jaccard(donation_tags, request_tags):
+    """The set-based score tag_similarities() replaced"""
+    donation_tags = set(tag.strip().lower() for tag in donation_tags.split(',') if tag.strip())
+    request_tags = set(tag.strip().lower() for tag in request_tags.split(',') if tag.strip())
+    if not donation_tags and not request_tags:
+        return 0.5
+    if not donation_tags or not request_tags:
+        return 0.3
+    return len(donation_tags & request_tags) / len(donation_tags | request_tags)
+
+
+class TagSimilarityTests(TestCase):
+    TAGS = ['vegetarian,gluten-free', 'Vegan, halal', 'halal', '', 'vegetarian, VEGAN ,nuts', 'dairy,spicy']
+
+    def setUp(self):
+        # A large id so the bitsets would be wide without renumbering
+        Tag.objects.create(id=1_000_000, name='spicy')
+        self.donor = CustomUser.objects.create_user(username='donor', password='x', is_donor=True)
+        self.requester = CustomUser.objects.create_user(username='ngo', password='x', is_requester=True)
+        self.donations = [FoodDonation.objects.create(donor=self.donor, quantity=1, tags=tags) for tags in self.TAGS]
+        self.extractor = FeatureExtractor()
+
+    def assert_matches_set_jaccard(self, request, preferred_tags):
+        scores = self.extractor.tag_similarities(self.donations, request)
+        expected = [set_jaccard(tags, preferred_tags) for tags in self.TAGS]
+        self.assertEqual(len(scores), len(expected))
+        for score, want in zip(scores, expected):
+            self.assertAlmostEqual(float(score), want)
+
+    def test_saved_requests_score_like_set_jaccard(self):
+        for preferred_tags in ['vegetarian, vegan', 'halal', '', 'spicy,dairy,nuts']:
+            request = FoodRequest.objects.create(requester=self.requester, quantity=1, preferred_tags=preferred_tags)
+            self.assert_matches_set_jaccard(request, preferred_tags)
+
+    def test_unknown_request_tags_still_count_towards_the_union(self):
+        # Stand-in requests aren't saved, so names outside the vocabulary are never looked up as ids
+        preferred_tags = 'halal,kosher'
+        self.assert_matches_set_jaccard(SimpleNamespace(preferred_tags=preferred_tags), preferred_tags)
+
+    def test_bitset_width_follows_the_tags_present(self):
+        self.assertEqual(tag_bitsets([[1_000_000, 3], [3]]).shape, (2, 1))
+
+
+class TagVocabularyTests(TestCase):
+    def test_names_are_stripped_after_truncating(self):
+        self.assertEqual(Tag.normalize('a' * 49 + ' b, x'), ['a' * 49, 'x'])
+
+    def test_names_folded_together_by_the_collation_share_one_id(self):
+        # What MySQL's case- and accent-insensitive unique index does to 'cafe' and 'café'
+        tag = Tag.objects.create(name='café')
+        folded = {'cafe': tag.id, 'café': tag.id}
+        with mock.patch.object(Tag, 'lookup', return_value=folded):
+            self.assertEqual(Tag.ids_for('cafe, café'), [tag.id])
+            self.assertEqual(Tag.resolve('cafe, café'), ([tag.id], 0))
+            donation = FoodDonation.objects.create(
+                donor=CustomUser.objects.create_user(username='donor', password='x'), quantity=1, tags='café',
+            )
+            self.assertEqual(list(filter_has_tags(FoodDonation.objects.all(), ['cafe', 'café'])), [donation])
+
+
+class TagIndexMigrationTests(TransactionTestCase):
+    before = [('foodredistribution', '0005_aiperformancemetrics_explicit_date')]
+    after = [('foodredistribution', '0006_tag_index')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_backfills_the_vocabulary_and_tag_ids(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model('foodredistribution', 'CustomUser').objects.create(username='donor')
+        FoodDonation = apps.get_model('foodredistribution', 'FoodDonation')
+        FoodRequest = apps.get_model('foodredistribution', 'FoodRequest')
+        donation = FoodDonation.objects.create(donor=user, quantity=1, tags='Vegan, halal,vegan')
+        untagged = FoodDonation.objects.create(donor=user, quantity=1, tags='')
+        request = FoodRequest.objects.create(requester=user, quantity=1, preferred_tags=' halal ,nuts')
+
+        apps = self.migrate(self.after)
+        ids = dict(apps.get_model('foodredistribution', 'Tag').objects.values_list('name', 'id'))
+        self.assertEqual(sorted(ids), ['halal', 'nuts', 'vegan'])
+        FoodDonation = apps.get_model('foodredistribution', 'FoodDonation')
+        FoodRequest = apps.get_model('foodredistribution', 'FoodRequest')
+        self.assertEqual(FoodDonation.objects.get(id=donation.id).tag_ids, sorted([ids['halal'], ids['vegan']]))
+        self.assertEqual(FoodDonation.objects.get(id=untagged.id).tag_ids, [])
+        self.assertEqual(FoodRequest.objects.get(id=request.id).tag_ids, sorted([ids['halal'], ids['nuts']]))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    ADMINS=[('Admin', 'admin@example.com')],
+)
+@mock.patch('foodredistribution.audit.ai_audit_log')
+class CancellationAnomalyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.donor = CustomUser.objects.create(username='donor', email='donor@example.com')
+
+    def test_counter_sums_the_daily_buckets_in_the_window(self, audit_log):
+        for _ in range(4):
+            record_cancellation(self.donor.id)
+        yesterday = (timezone.localdate() - timedelta(days=1)).strftime('%Y%m%d')
+        too_old = (timezone.localdate() - timedelta(days=30)).strftime('%Y%m%d')
+        cache.set(CANCELLATION_KEY.format(user_id=self.donor.id, day=yesterday), 2)
+        cache.set(CANCELLATION_KEY.format(user_id=self.donor.id, day=too_old), 5)
+        self.assertEqual(recent_cancellation_count(self.donor.id), 6)
+        self.assertEqual(recent_cancellation_count(self.donor.id, days=1), 4)
+        self.assertTrue(detect_cancellation_anomaly(self.donor, threshold=5))
+        self.assertFalse(detect_cancellation_anomaly(self.donor, threshold=6))
+
+    def test_a_user_is_flagged_once_a_day(self, audit_log):
+        self.assertTrue(flag_cancellation_anomaly(self.donor))
+        self.assertFalse(flag_cancellation_anomaly(self.donor))
+        self.assertEqual(audit_log.add.call_count, 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+        cache.delete(f"cancellation_anomaly_flagged:{self.donor.id}")  # the day is over
+        self.assertTrue(flag_cancellation_anomaly(self.donor))
+
+    def test_scan_rebuilds_the_counters_and_flags_once(self, audit_log):
+        other = CustomUser.objects.create(username='other')
+        for donor, cancelled in ((self.donor, 4), (other, 1)):
+            for _ in range(cancelled):
+                FoodDonation.objects.create(donor=donor, quantity=1, status='cancelled')
+        FoodDonation.objects.create(donor=self.donor, quantity=1, status='available')
+
+        self.assertEqual(scan_cancellation_anomalies(), {'anomalous_users': 1, 'newly_flagged': 1})
+        self.assertEqual(recent_cancellation_count(self.donor.id), 4)
+        self.assertEqual(recent_cancellation_count(other.id), 1)
+        self.assertEqual(scan_cancellation_anomalies(), {'anomalous_users': 1, 'newly_flagged': 0})
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class MetricsRegistryTests(TestCase):
+    def test_stages_count_queries_and_fill_the_breakdown(self):
+        metrics = MetricsRegistry()
+        with metrics.collect() as breakdown:
+            for _ in range(2):
+                with metrics.stage('stats'):
+                    list(CustomUser.objects.all())
+            with metrics.stage('scoring', count_queries=False):
+                list(CustomUser.objects.all())
+        with metrics.stage('stats'):  # outside collect(): registry only
+            list(CustomUser.objects.all())
+
+        self.assertEqual({name: (entry['calls'], entry['db_queries']) for name, entry in breakdown.items()},
+                         {'stats': (2, 2), 'scoring': (1, 0)})
+        text = metrics.render_prometheus()
+        self.assertIn('foodredistribution_matching_stage_db_queries_total{stage="stats"} 3\n', text)
+        self.assertIn('foodredistribution_matching_stage_seconds_count{stage="stats"} 3\n', text)
+        self.assertIn('foodredistribution_matching_stage_seconds_count{stage="scoring"} 1\n', text)
+        self.assertNotIn('matching_stage_db_queries_total{stage="scoring"}', text)
+
+    def test_label_values_are_escaped(self):
+        metrics = MetricsRegistry()
+        metrics.inc('errors_total', view='say "hi"\\')
+        self.assertEqual(metrics.render_prometheus(), (
+            '# TYPE foodredistribution_errors_total counter\n'
+            'foodredistribution_errors_total{view="say \\"hi\\"\\\\"} 1\n'
+        ))
+
+
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        self.staff = CustomUser.objects.create(username='staff', is_staff=True)
+        self.user = CustomUser.objects.create(username='user')
+
+    def view(self, request):
+        for user_id in (self.staff.id, self.user.id, self.staff.id):
+            CustomUser.objects.filter(id=user_id).exists()
+        return HttpResponse('ok')
+
+    def get(self, user, **headers):
+        request = RequestFactory().get('/api/donations/', headers=headers)
+        request.user = user
+        with self.settings(REQUEST_PROFILING_ENABLED=True, PROFILE_STORE_DIR=self.root):
+            return RequestProfilingMiddleware(self.view)(request)
+
+    def test_staff_request_is_profiled_and_stored(self):
+        response = self.get(self.staff, X_Profile='1')
+        self.assertEqual(response['X-Profile-Queries'], '3')
+        self.assertEqual(response['X-Profile-Duplicate-Queries'], '2')
+        profile = ProfileStore(self.root).get(response['X-Profile-Id'])
+        self.assertEqual((profile['user'], profile['top_duplicates'][0]['count']), ('staff', 3))
+
+    def test_flag_is_ignored_for_other_users_and_when_disabled(self):
+        self.assertNotIn('X-Profile-Id', self.get(self.user, X_Profile='1'))
+        self.assertNotIn('X-Profile-Id', self.get(self.staff))
+        request = RequestFactory().get('/api/donations/', headers={'X-Profile': '1'})
+        request.user = self.staff
+        with self.settings(REQUEST_PROFILING_ENABLED=False, PROFILE_STORE_DIR=self.root):
+            self.assertNotIn('X-Profile-Id', RequestProfilingMiddleware(self.view)(request))
+        self.assertEqual(ProfileStore(self.root).list(), [])
+
+    def test_store_keeps_the_newest_and_rejects_bad_ids(self):
+        store = ProfileStore(self.root, max_profiles=2)
+        for n in range(3):
+            store.save({'id': f'{n:032x}', 'path': f'/{n}'})
+            os.utime(f'{self.root}/{n:032x}.json', (n, n))  # distinct mtimes, oldest first
+        self.assertEqual(sorted(p['path'] for p in store.list()), ['/1', '/2'])
+        self.assertIsNone(store.get('../../etc/passwd'))
+
+    def test_normalize_sql_groups_literals(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 12 AND b = 'x''y' AND c IN (?, ?, ?)"),
+            "SELECT * FROM t WHERE a = ? AND b = ? AND c IN (?...)",
+        )
+
+
+class TracingTests(TestCase):
+    PARENT = '00-' + 'a' * 32 + '-' + 'b' * 16 + '-01'
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(TRACING_ENABLED=True, TRACE_EXPORT_FILE=f'{root.name}/spans.jsonl')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.path = f'{root.name}/spans.jsonl'
+
+    def spans(self):
+        tracing.flush()
+        with open(self.path) as f:
+            return {record['name']: record for record in map(json.loads, f)}
+
+    def test_request_trace_continues_into_child_spans_and_tasks(self):
+        headers = {}
+
+        def view(request):
+            with tracing.span('matching.score'):
+                tracing.inject_trace_header(headers=headers)
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/api/donations/', headers={'traceparent': self.PARENT})
+        response = tracing.TracingMiddleware(view)(request)
+        self.assertEqual(response['X-Trace-Id'], 'a' * 32)
+
+        # The worker side, with the header the publish hook added
+        task = SimpleNamespace(name='notify', request=SimpleNamespace(traceparent=None, headers=headers))
+        tracing.start_task_span(task_id='t1', task=task)
+        with tracing.span('email.send_mail'):
+            pass
+        tracing.finish_task_span(task_id='t1', state='SUCCESS')
+
+        spans = self.spans()
+        self.assertEqual({record['trace_id'] for record in spans.values()}, {'a' * 32})
+        self.assertEqual(spans['http.request']['parent_id'], 'b' * 16)
+        self.assertEqual(spans['matching.score']['parent_id'], spans['http.request']['span_id'])
+        self.assertEqual(spans['celery.task']['parent_id'], spans['matching.score']['span_id'])
+        self.assertEqual(spans['email.send_mail']['parent_id'], spans['celery.task']['span_id'])
+        self.assertEqual(spans['celery.task']['attributes']['state'], 'SUCCESS')
+        self.assertIsNone(tracing.current_span())
+
+    def test_nothing_is_traced_when_disabled(self):
+        with self.settings(TRACING_ENABLED=False):
+            response = tracing.TracingMiddleware(lambda request: HttpResponse('ok'))(RequestFactory().get('/'))
+        self.assertNotIn('traceparent', response)
+        with tracing.span('outside.a.trace') as current:
+            self.assertIsNone(current)
+        self.assertEqual(tracing.flush(), 0)
+
+
+class OnlineLearningTests(TestCase):
+    def test_online_update_and_full_refit_use_the_same_features(self):
+        donor = CustomUser.objects.create_user(username='donor', password='x', is_donor=True)
+        requester = CustomUser.objects.create_user(username='ngo', password='x', organization_name='NGO')
+        donation = FoodDonation.objects.create(donor=donor, quantity=5, tags='vegan', status='collected')
+        # What the claim was scored with at the time, including the real request's distance and tags
+        stored = dict.fromkeys(FeatureExtractor().feature_names, 0.9)
+        claim = ClaimedDonation.objects.create(donation=donation, claimed_by=requester, ml_match_features=stored)
+        feedback = Feedback.objects.create(claimed_donation=claim, rating=4)
+
+        engine = SmartMatchingEngine()
+        with mock.patch.object(engine.online_model, 'partial_fit') as partial_fit:
+            engine.learn_from_feedback(feedback)
+        X, y, _ = build_training_matrix(engine.feature_extractor)
+
+        online_vector, target = partial_fit.call_args.args
+        np.testing.assert_allclose(online_vector, X[0], rtol=1e-6)
+        self.assertEqual(target, y[0])
+
+
+class ReplayTests(TestCase):
+    def setUp(self):
+        self.moment = timezone.now() - timedelta(days=1)
+        donor = CustomUser.objects.create_user(username='donor', password='x')
+        self.requester = CustomUser.objects.create_user(username='ngo', password='x')
+        self.open = [FoodDonation.objects.create(donor=donor, quantity=i + 1) for i in range(3)]
+        closed = [
+            FoodDonation.objects.create(donor=donor, quantity=1, status='cancelled'),
+            FoodDonation.objects.create(donor=donor, quantity=1, expiry_date=self.moment - timedelta(hours=1)),
+            FoodDonation.objects.create(donor=donor, quantity=1),  # claimed earlier
+        ]
+        FoodDonation.objects.create(donor=donor, quantity=1)  # posted later
+        posted = self.moment - timedelta(days=1)
+        FoodDonation.objects.filter(pk__in=[d.pk for d in self.open + closed]).update(donation_date=posted)
+
+        earlier = ClaimedDonation.objects.create(donation=closed[2], claimed_by=self.requester)
+        self.claim = ClaimedDonation.objects.create(donation=self.open[1], claimed_by=self.requester)
+        ClaimedDonation.objects.filter(pk=earlier.pk).update(claim_date=self.moment - timedelta(hours=2))
+        ClaimedDonation.objects.filter(pk=self.claim.pk).update(claim_date=self.moment)
+        Feedback.objects.create(claimed_donation=self.claim, rating=5)
+
+    def test_candidates_are_the_donations_open_at_the_moment(self):
+        self.assertEqual(set(candidates_at(self.moment)), set(self.open))
+
+    def test_cases_fall_back_to_a_stand_in_request(self):
+        case = build_replay_cases(since=self.moment)[0]
+        self.assertEqual((case['claimed_donation_id'], case['rating']), (self.open[1].id, 5))
+        self.assertEqual(case['request'].quantity, self.open[1].quantity)
+
+        request = FoodRequest.objects.create(requester=self.requester, quantity=9)
+        FoodRequest.objects.filter(pk=request.pk).update(request_date=self.moment - timedelta(hours=1))
+        self.assertEqual(build_replay_cases(since=self.moment)[0]['request'], request)
+
+    def test_ranking_quality(self):
+        # Ranks open donations by id, so the claimed one comes second
+        engine = SimpleNamespace(find_best_donations=lambda request, top_k, candidates, now: [
+            {'donation': donation} for donation in candidates.order_by('id')
+        ])
+        report = replay(engine, build_replay_cases(since=self.moment), top_k=1)
+        self.assertEqual((report['cases'], report['hit_rate_at_1'], report['mrr']), (1, 0.0, 0.5))
+        self.assertEqual(report['rating_weighted_hit_rate_at_1'], 0.0)
+        self.assertEqual(replay(engine, build_replay_cases(since=self.moment), top_k=2)['hit_rate_at_2'], 1.0)
+
+
+class TrainingMatrixTests(TestCase):
+    def test_one_row_per_feedback_with_its_rating_and_grouped_stats(self):
+        donors = [CustomUser.objects.create_user(username=f'donor{i}', password='x') for i in range(2)]
+        requesters = [CustomUser.objects.create_user(username=f'ngo{i}', password='x') for i in range(2)]
+        claims = {}
+        for i, rating in enumerate([1, 2, 3, 4, 5, None]):
+            donation = FoodDonation.objects.create(
+                donor=donors[i % 2], quantity=i + 1, status='collected' if i % 3 else 'claimed',
+            )
+            claim = ClaimedDonation.objects.create(donation=donation, claimed_by=requesters[i // 3])
+            if rating is not None:
+                Feedback.objects.create(claimed_donation=claim, rating=rating)
+                claims[(rating - 1) / 4.0] = claim
+        FoodDonation.objects.create(donor=donors[0], quantity=1)  # never claimed, still counts for the donor
+
+        engine = SmartMatchingEngine()
+        extractor = engine.feature_extractor
+        X, y, timings = build_training_matrix(extractor, chunk_size=2)
+
+        self.assertEqual(len(y), Feedback.objects.count())
+        self.assertEqual(X.shape, (Feedback.objects.count(), len(extractor.feature_names)))
+        self.assertEqual(sorted(y), sorted(claims))
+        self.assertEqual(set(timings), {'stats', 'extract'})
+        # Same vector as the per-claim queries the engine uses online
+        for row, target in zip(X, y):
+            claim = claims[target]
+            features = extractor.extract_features(
+                claim.donation, request_from_claim(claim),
+                engine._get_donor_stats(claim.donation.donor), engine._get_requester_stats(claim.claimed_by),
+            )
+            np.testing.assert_allclose(row, [features[name] for name in extractor.feature_names], rtol=1e-6)
+
+
+class TrainingDatasetTests(TestCase):
+    def test_export_appends_only_new_feedback(self):
+        donor = CustomUser.objects.create_user(username='donor', password='x')
+        requester = CustomUser.objects.create_user(username='ngo', password='x')
+        for rating in (2, 5):
+            donation = FoodDonation.objects.create(donor=donor, quantity=5)
+            claim = ClaimedDonation.objects.create(donation=donation, claimed_by=requester)
+            Feedback.objects.create(claimed_donation=claim, rating=rating)
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        dataset = TrainingDataset(root.name)
+
+        self.assertEqual(dataset.export(FeatureExtractor()), 2)
+        with mock.patch('foodredistribution.ai_engine.dataset.collect_user_stats') as collect_user_stats:
+            self.assertEqual(dataset.export(FeatureExtractor()), 0)
+        collect_user_stats.assert_not_called()
+        X, y = dataset.load()
+        self.assertEqual(X.shape, (2, len(FeatureExtractor().feature_names)))
+        self.assertEqual(sorted(y), [0.25, 1.0])
+
+
+class TuningTests(TestCase):
+    def test_pareto_front_and_fastest_within_tolerance(self):
+        results = [
+            {'mae': 0.10, 'row_latency_ms': 5.0},
+            {'mae': 0.11, 'row_latency_ms': 1.0},
+            {'mae': 0.12, 'row_latency_ms': 2.0},  # slower and worse than the one above
+            {'mae': 0.20, 'row_latency_ms': 0.5},
+        ]
+        front = mark_pareto_front(results)
+        self.assertEqual([r['row_latency_ms'] for r in front], [5.0, 1.0, 0.5])
+        self.assertEqual(pick_fastest_within(results, 0.0)['mae'], 0.10)
+        self.assertEqual(pick_fastest_within(results, 0.05)['mae'], 0.11)
+        self.assertEqual(pick_fastest_within(results, 0.5)['mae'], 0.20)
+
+    def test_search_scores_every_candidate(self):
+        grid = {'n_estimators': [5], 'max_depth': [2, None], 'min_samples_leaf': [1, 2]}
+        self.assertEqual(len(candidate_grid(grid)), 4)
+        X = np.random.RandomState(0).rand(40, 3)
+        results = run_search(X, X.sum(axis=1), grid=grid, folds=2, workers=2)
+        self.assertEqual(sorted(r['id'] for r in results), [0, 1, 2, 3])
+        self.assertEqual([r['mae'] for r in results], sorted(r['mae'] for r in results))
+        self.assertTrue(any(r['pareto'] for r in results))
+
+
+class BufferedAuditWriterTests(TestCase):
+    def test_a_bad_row_does_not_drop_the_rest_of_the_batch(self):
+        writer = BufferedAuditWriter('foodredistribution.AIAuditLog', max_size=10, max_age=60)
+        writer.add(action='prediction', details={'score': 0.5})
+        writer.add(action='prediction', details={'score': object()})  # not JSON serializable
+        writer.add(action='matching', details={'score': 0.7})
+        with self.assertLogs('foodredistribution.audit', level='ERROR'):
+            self.assertEqual(writer.flush(), 3)
+        self.assertEqual(sorted(AIAuditLog.objects.values_list('action', flat=True)), ['matching', 'prediction'])
+
+
+class AuditArchiveTests(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        self.archive_dir = archive_dir.name
+        override = override_settings(AUDIT_ARCHIVE_DIR=self.archive_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def log(self, action, *day):
+        return AIAuditLog.objects.create(action=action, timestamp=datetime(*day, 12, tzinfo=dt_timezone.utc))
+
+    def test_rows_round_trip_by_month(self):
+        self.log('prediction', 2024, 1, 10)
+        self.log('matching', 2024, 1, 20)
+        self.log('prediction', 2024, 2, 5)
+        recent = AIAuditLog.objects.create(action='prediction')
+
+        result = archive_old_rows('aiauditlog', days=90, batch_size=2)
+
+        self.assertEqual(result['archived'], 3)
+        self.assertEqual(list(AIAuditLog.objects.values_list('id', flat=True)), [recent.id])
+        january = list(read_archive('aiauditlog', date(2024, 1, 1), date(2024, 2, 1)))
+        self.assertEqual([row['action'] for row in january], ['prediction', 'matching'])
+        self.assertEqual(len(list(read_archive('aiauditlog', action='prediction'))), 2)
+        with mock.patch('foodredistribution.archive.gzip.open', wraps=gzip.open) as opened:
+            list(read_archive('aiauditlog', date(2024, 2, 1), date(2024, 3, 1)))
+        self.assertEqual(opened.call_count, 1)  # the January partition isn't opened
+
+    def test_second_run_appends_to_an_existing_month(self):
+        self.log('prediction', 2024, 1, 10)
+        call_command('archive_audit_logs', days=90, table=['aiauditlog'], stdout=io.StringIO())
+        self.log('matching', 2024, 1, 20)
+        call_command('archive_audit_logs', days=90, table=['aiauditlog'], stdout=io.StringIO())
+
+        rows = list(read_archive('aiauditlog'))
+        self.assertEqual(sorted(row['action'] for row in rows), ['matching', 'prediction'])
+        self.assertFalse(AIAuditLog.objects.exists())
+
+    def test_nothing_is_deleted_when_the_partition_cannot_be_written(self):
+        self.log('prediction', 2024, 1, 10)
+        with mock.patch('foodredistribution.archive.os.fsync', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                archive_old_rows('aiauditlog', days=90)
+        self.assertEqual(AIAuditLog.objects.count(), 1)
+        self.assertEqual(list(read_archive('aiauditlog')), [])
+
+
+class MetricsRollupTests(TestCase):
+    def setUp(self):
+        self.donor = CustomUser.objects.create_user(username='donor', password='x')
+        self.requester = CustomUser.objects.create_user(username='ngo', password='x')
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def claim(self, day, score, rating=None):
+        donation = FoodDonation.objects.create(donor=self.donor, quantity=1)
+        claim = ClaimedDonation.objects.create(donation=donation, claimed_by=self.requester, ai_matching_score=score)
+        ClaimedDonation.objects.filter(id=claim.id).update(claim_date=_day_start(day) + timedelta(hours=1))
+        if rating:
+            feedback = Feedback.objects.create(claimed_donation=claim, rating=rating)
+            Feedback.objects.filter(id=feedback.id).update(submitted_at=_day_start(day) + timedelta(hours=2))
+
+    def metrics(self):
+        return {
+            row.date: (row.total_matches_generated, row.successful_matches,
+                       round(row.average_match_score, 6), round(row.average_feedback_rating, 6))
+            for row in AIPerformanceMetrics.objects.all()
+        }
+
+    def test_rerunning_over_a_day_replaces_its_row(self):
+        self.claim(self.yesterday, 0.4)
+        self.claim(self.yesterday, 0.8)
+        self.claim(self.today, 0.6, rating=5)
+        self.claim(self.today, 0.2, rating=2)
+        rollup_incremental()
+        self.assertEqual(self.metrics(), {
+            self.yesterday: (2, 0, 0.6, 0.0),
+            self.today: (2, 1, 0.4, 3.5),
+        })
+
+        # Today is recomputed on the next run, not added to
+        self.claim(self.today, 0.7, rating=4)
+        rollup_incremental()
+        incremental = self.metrics()
+        self.assertEqual(incremental, {
+            self.yesterday: (2, 0, 0.6, 0.0),
+            self.today: (3, 2, 0.5, round(11 / 3, 6)),
+        })
+
+        AIPerformanceMetrics.objects.all().delete()
+        call_command('backfill_ai_metrics', chunk_days=1, stdout=io.StringIO())
+        self.assertEqual(self.metrics(), incremental)
@@ -13,6 +13,10 @@ from .views import (
     RegisterView,
     UserDetailView,
     available_donations,
+    ai_metrics_view,
+    metrics_view,
+    profile_list_view,
+    profile_detail_view,
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -42,6 +46,10 @@ urlpatterns = [
     path('requests/<int:request_id>/matches/', request_matches_view, name='request_matches'),
     path('donations/<int:donation_id>/claim/', claim_donation_view, name='claim_donation'),
     path('donations/available/', available_donations),
+    path('ai-metrics/', ai_metrics_view, name='ai_metrics'),
+    path('metrics/', metrics_view, name='metrics'),
+    path('profiles/', profile_list_view, name='profile_list'),
+    path('profiles/<str:profile_id>/', profile_detail_view, name='profile_detail'),
 
     # Trigger tasks
     path('trigger-reminder/', trigger_reminders),
@@ -3,9 +3,15 @@ from django.template.loader import render_to_string
 import logging
 from datetime import timedelta
 from django.utils import timezone
+from django.db import connection
+from django.core.cache import cache
+from django.core.mail import send_mail
+from django.conf import settings
+from backend.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
+@traced('email.send_notification')
 def send_notification_email(subject, context, recipient_list):
     try:
         html_content = render_to_string('emails/notification.html', context)
@@ -25,15 +31,117 @@ def send_notification_email(subject, context, recipient_list):
         logger.error(f"Failed to send email: {e}")
         print(f"Failed to send email: {e}")
 
+CANCELLATION_KEY = "cancellations:{user_id}:{day}"
+
+def _cancellation_keys(user_id, days):
+    today = timezone.localdate()
+    return [
+        CANCELLATION_KEY.format(user_id=user_id, day=(today - timedelta(days=offset)).strftime('%Y%m%d'))
+        for offset in range(days)
+    ]
+
+def record_cancellation(user_id, days=30):
+    """Bump today's cancellation bucket for a user; buckets expire after the window"""
+    key = _cancellation_keys(user_id, 1)[0]
+    cache.add(key, 0, timeout=(days + 1) * 86400)
+    cache.incr(key)
+
+def recent_cancellation_count(user_id, days=30):
+    """Sum the user's daily cancellation buckets in one cache round trip"""
+    return sum(cache.get_many(_cancellation_keys(user_id, days)).values())
+
 def detect_cancellation_anomaly(user, threshold=3, days=30):
     """
     Returns True if the user has cancelled more than threshold donations in the last days days.
     """
-    from .models import FoodDonation
+    return recent_cancellation_count(user.id, days) > threshold
+
+def flag_cancellation_anomaly(user, threshold=3, days=30):
+    """Audit-log and email admins about a user, at most once a day per user"""
+    from .audit import ai_audit_log
+
+    if not cache.add(f"cancellation_anomaly_flagged:{user.id}", True, timeout=86400):
+        return False
+
+    print(f"Anomaly detected: User {user.username} has excessive cancellations.")
+    ai_audit_log.add(
+        user_id=user.id,
+        action="anomaly_detected",
+        details=f"User has cancelled more than {threshold} donations in the last {days} days."
+    )
+    # Notify admins
+    subject = "Anomaly Detected: Excessive Cancellations"
+    message = (
+        f"User {user.username} has cancelled more than {threshold} donations in the last {days} days.\n"
+        f"User email: {user.email}"
+    )
+    admin_emails = [email for name, email in getattr(settings, 'ADMINS', [])]
+    if admin_emails:
+        print("Sending anomaly email to admins:", admin_emails)
+        with span('email.send_mail', recipients=len(admin_emails)):
+            send_mail(subject, message, None, admin_emails)
+    return True
+
+def scan_cancellation_anomalies(threshold=3, days=30):
+    """
+    Rebuild every user's cancellation buckets from one grouped query and
+    flag all users over the threshold. Also repairs counters after a cache flush.
+    """
+    from django.db.models import Count
+    from django.db.models.functions import TruncDate
+    from .models import CustomUser, FoodDonation
+
     since = timezone.now() - timedelta(days=days)
-    cancelled_count = FoodDonation.objects.filter(
-        donor=user,
-        status='cancelled',
-        updated_at__gte=since
-    ).count()
-    return cancelled_count > threshold
\ No newline at end of file
+    buckets = (
+        FoodDonation.objects
+        .filter(status='cancelled', updated_at__gte=since)
+        .annotate(day=TruncDate('updated_at'))
+        .values('donor_id', 'day')
+        .annotate(cancelled=Count('id'))
+    )
+
+    counters = {}
+    totals = {}
+    for row in buckets:
+        key = CANCELLATION_KEY.format(user_id=row['donor_id'], day=row['day'].strftime('%Y%m%d'))
+        counters[key] = row['cancelled']
+        totals[row['donor_id']] = totals.get(row['donor_id'], 0) + row['cancelled']
+    cache.set_many(counters, timeout=(days + 1) * 86400)
+
+    anomalous_ids = [user_id for user_id, total in totals.items() if total > threshold]
+    flagged = 0
+    for user in CustomUser.objects.filter(id__in=anomalous_ids):
+        flagged += flag_cancellation_anomaly(user, threshold, days)
+    return {'anomalous_users': len(anomalous_ids), 'newly_flagged': flagged}
+
+def upsert_options(unique_fields, update_fields):
+    """
+    bulk_create kwargs for an upsert. MySQL upserts on any unique key and
+    rejects unique_fields, while SQLite/PostgreSQL require them.
+    """
+    options = {'update_conflicts': True, 'update_fields': update_fields}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    return options
+
+def filter_has_tags(queryset, tags):
+    """
+    Donations/requests carrying every tag in `tags` (comma-separated
+    strings), matched on the normalized tag_ids.
+    """
+    from .models import Tag
+
+    names = Tag.normalize(','.join(tags))
+    if not names:
+        return queryset
+    known = Tag.lookup(names)
+    if len(known) < len(names):
+        return queryset.none()  # A tag nobody has used yet
+    ids = sorted(set(known.values()))
+    if connection.features.supports_json_field_contains:
+        return queryset.filter(tag_ids__contains=ids)
+    # SQLite can't test JSON containment in SQL, so compare the id lists here
+    wanted = set(ids)
+    return queryset.filter(pk__in=[
+        pk for pk, tag_ids in queryset.values_list('pk', 'tag_ids') if wanted.issubset(tag_ids)
+    ])
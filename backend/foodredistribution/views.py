@@ -4,7 +4,7 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import get_user_model
 from django.http import HttpRequest
-from .models import FoodDonation, FoodRequest, FoodCategory, Location, ClaimedDonation, Feedback, AIAuditLog
+from .models import FoodDonation, FoodRequest, FoodCategory, Location, ClaimedDonation, Feedback, AIPerformanceMetrics
 from django.conf import settings
 from .serializers import (
     FoodDonationSerializer,
@@ -15,15 +15,23 @@ from .serializers import (
     FeedbackSerializer,
     RegisterSerializer,
     UserSerializer,
+    AIPerformanceMetricsSerializer,
 )
-from .utils import send_notification_email, detect_cancellation_anomaly
+from .utils import send_notification_email, detect_cancellation_anomaly, record_cancellation, flag_cancellation_anomaly, filter_has_tags
+from .audit import ai_audit_log
 from rest_framework.decorators import api_view, permission_classes
 from django.core.mail import send_mail
 from .ai_engine.matching_engine import matching_engine
+from .ai_engine.instrumentation import metrics
+from .profiling import ProfileStore
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
 from django.shortcuts import get_object_or_404, render, redirect
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .tasks import notify_fallback_receivers_task, send_pickup_reminders, send_feedback_reminders
-from datetime import timedelta
+from .tasks import notify_fallback_receivers_task, send_pickup_reminders, send_feedback_reminders, update_online_model_task
+from django.db import transaction
+from datetime import date, timedelta
+from django.utils import timezone
 
 
 CustomUser = get_user_model()
@@ -38,6 +46,10 @@ class FoodDonationViewSet(viewsets.ModelViewSet):
     ordering_fields = ['expiry_date', 'quantity']
     ordering = ['expiry_date']
 
+    def get_queryset(self):
+        # ?tag=vegan&tag=halal (or ?tag=vegan,halal): only donations with all of them
+        return filter_has_tags(super().get_queryset(), self.request.query_params.getlist('tag'))
+
     def perform_create(self, serializer):
         donation = serializer.save(donor=self.request.user)
         receivers = CustomUser.objects.exclude(id=self.request.user.id)
@@ -66,24 +78,15 @@ class FoodDonationViewSet(viewsets.ModelViewSet):
 
             send_notification_email(subject, context, emails)
 
-        # Anomaly detection example
-        if detect_cancellation_anomaly(self.request.user):
-            print(f"Anomaly detected: User {self.request.user.username} has excessive cancellations.")
-            AIAuditLog.objects.create(
-                user=self.request.user,
-                action="anomaly_detected",
-                details="User has cancelled more than 3 donations in the last 30 days."
-            )
-            # Notify admins
-            subject = "Anomaly Detected: Excessive Cancellations"
-            message = (
-                f"User {self.request.user.username} has cancelled more than 3 donations in the last 30 days.\n"
-                f"User email: {self.request.user.email}"
-            )
-            admin_emails = [email for name, email in getattr(settings, 'ADMINS', [])]
-            if admin_emails:
-                print("Sending anomaly email to admins:", admin_emails)
-                send_mail(subject, message, None, admin_emails)
+    def perform_update(self, serializer):
+        previous_status = serializer.instance.status
+        donation = serializer.save()
+
+        # Anomaly detection runs when a cancellation happens, against rolling counters
+        if donation.status == 'cancelled' and previous_status != 'cancelled':
+            record_cancellation(donation.donor_id)
+            if detect_cancellation_anomaly(donation.donor):
+                flag_cancellation_anomaly(donation.donor)
 
 class FoodRequestViewSet(viewsets.ModelViewSet):
     queryset = FoodRequest.objects.all()
@@ -96,7 +99,8 @@ class FoodRequestViewSet(viewsets.ModelViewSet):
     ordering = ['-request_date']  # default ordering
 
     def get_queryset(self):
-        return FoodRequest.objects.filter(requester=self.request.user)
+        queryset = FoodRequest.objects.filter(requester=self.request.user)
+        return filter_has_tags(queryset, self.request.query_params.getlist('tag'))
 
     def perform_create(self, serializer):
         serializer.save(requester=self.request.user)
@@ -115,27 +119,43 @@ class LocationViewSet(viewsets.ReadOnlyModelViewSet):
 def calculate_ai_match_score(donation, user, request_data=None):
     """Shared AI matching logic for both views"""
     try:
-        dummy_request = type('obj', (object,), {
-            'requester': user,
-            'category': donation.category,
-            'quantity': donation.quantity,
-            'location': None,
-            'preferred_tags': request_data.get('preferred_tags', '') if request_data else ''
-        })
-        
-        features = matching_engine.feature_extractor.extract_features(
-            donation, dummy_request,
-            matching_engine._get_donor_stats(donation.donor),
-            matching_engine._get_requester_stats(user)
-        )
-        
-        match_score = matching_engine._calculate_match_score(features)
+        with metrics.stage('calculate_ai_match_score'):
+            dummy_request = type('obj', (object,), {
+                'requester': user,
+                'category': donation.category,
+                'quantity': donation.quantity,
+                'location': None,
+                'preferred_tags': request_data.get('preferred_tags', '') if request_data else ''
+            })
+
+            with metrics.stage('stats'):
+                donor_stats = matching_engine._get_donor_stats(donation.donor)
+                requester_stats = matching_engine._get_requester_stats(user)
+
+            with metrics.stage('feature_extraction', count_queries=False):
+                features = matching_engine.feature_extractor.extract_features(
+                    donation, dummy_request, donor_stats, requester_stats
+                )
+
+            with metrics.stage('scoring', count_queries=False):
+                match_score = matching_engine._calculate_match_score(features)
         return match_score, features
     except Exception as e:
         # Log error and return default values
         print(f"AI matching error: {e}")
+        metrics.inc('matching_errors_total', view='calculate_ai_match_score')
         return 0.0, {}
 
+def audit_details(match_score, features, breakdown):
+    """AIAuditLog details for a claim, with per-stage timings if enabled"""
+    details = {
+        'ai_match_score': match_score,
+        'features': features
+    }
+    if getattr(settings, 'MATCHING_METRICS_IN_AUDIT_LOG', False):
+        details['timings'] = breakdown
+    return details
+
 # API ViewSet for claimed donations (REST API)
 class ClaimedDonationViewSet(viewsets.ModelViewSet):
     queryset = ClaimedDonation.objects.all()
@@ -146,7 +166,8 @@ class ClaimedDonationViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         donation = serializer.validated_data.get('donation')
-        match_score, features = calculate_ai_match_score(donation, self.request.user)
+        with metrics.collect() as breakdown:
+            match_score, features = calculate_ai_match_score(donation, self.request.user)
         
         claim = serializer.save(
             claimed_by=self.request.user,
@@ -159,16 +180,13 @@ class ClaimedDonationViewSet(viewsets.ModelViewSet):
         donation.status = 'collected'
         donation.save()
         
-        # Log AI action for API claims
-        AIAuditLog.objects.create(
+        # Log AI action for API claims (buffered, written in bulk)
+        ai_audit_log.add(
             action='donation_claimed',
-            donation=donation,
-            claimed_donation=claim,
-            user=self.request.user,
-            details={
-                'ai_match_score': match_score,
-                'features': features
-            }
+            donation_id=donation.id,
+            claimed_donation_id=claim.id,
+            user_id=self.request.user.id,
+            details=audit_details(match_score, features, breakdown)
         )
 
 class FeedbackViewSet(viewsets.ModelViewSet):
@@ -180,7 +198,11 @@ class FeedbackViewSet(viewsets.ModelViewSet):
         return self.queryset.filter(claimed_donation__claimed_by=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save()
+        feedback = serializer.save()
+
+        # Online learning: fold the new rating into the model within seconds
+        if matching_engine.online_model.enabled:
+            transaction.on_commit(lambda: update_online_model_task.delay(feedback.id))
 
 
 
@@ -248,7 +270,8 @@ def claim_donation_view(request, donation_id):
     if donation.status == 'collected':
         return Response({"error": "This donation has already been claimed."}, status=status.HTTP_400_BAD_REQUEST)
 
-    match_score, features = calculate_ai_match_score(donation, request.user, request.data)
+    with metrics.collect() as breakdown:
+        match_score, features = calculate_ai_match_score(donation, request.user, request.data)
 
     # Create claim record
     claim = ClaimedDonation.objects.create(
@@ -263,16 +286,13 @@ def claim_donation_view(request, donation_id):
     donation.status = 'collected'
     donation.save()
 
-    # Log AI action
-    AIAuditLog.objects.create(
+    # Log AI action (buffered, written in bulk)
+    ai_audit_log.add(
         action='donation_claimed',
-        donation=donation,
-        claimed_donation=claim,
-        user=request.user,
-        details={
-            'ai_match_score': match_score,
-            'features': features
-        }
+        donation_id=donation.id,
+        claimed_donation_id=claim.id,
+        user_id=request.user.id,
+        details=audit_details(match_score, features, breakdown)
     )
 
     return Response({
@@ -318,6 +338,51 @@ def trigger_reminders(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def available_donations(request):
-    donations = FoodDonation.objects.filter(status='pending')
+    donations = filter_has_tags(FoodDonation.objects.filter(status='pending'), request.query_params.getlist('tag'))
     serializer = FoodDonationSerializer(donations, many=True)
     return Response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ai_metrics_view(request):
+    """
+    API View: Daily AI matching metrics from the precomputed rollups
+    (defaults to the last 30 days)
+    """
+    try:
+        end = date.fromisoformat(request.GET['end']) if 'end' in request.GET else timezone.localdate()
+        start = date.fromisoformat(request.GET['start']) if 'start' in request.GET else end - timedelta(days=30)
+    except ValueError:
+        return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+
+    metrics = AIPerformanceMetrics.objects.filter(date__gte=start, date__lte=end).order_by('date')
+    serializer = AIPerformanceMetricsSerializer(metrics, many=True)
+    return Response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """
+    Matching pipeline counters and stage timings in Prometheus text format
+    (for this process)
+    """
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_list_view(request):
+    """
+    API View: Most recent request profiles (newest first)
+    """
+    return Response(ProfileStore().list())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_detail_view(request, profile_id):
+    """
+    API View: Full profile for one request, including duplicate queries and CPU samples
+    """
+    profile = ProfileStore().get(profile_id)
+    if profile is None:
+        return Response({"error": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(profile)